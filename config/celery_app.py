@@ -34,6 +34,12 @@ app.autodiscover_tasks()
 @app.on_after_finalize.connect
 def setup_periodic_tasks(sender: Celery, **kwargs):
     from sbily.links.tasks import clean_up_analytics_data
+    from sbily.links.tasks import export_link_snapshot
+    from sbily.links.tasks import replay_click_spool
+    from sbily.monitoring.tasks import prune_request_profiles
+    from sbily.notifications.tasks import prune_read_notifications
+    from sbily.payments.tasks import reconcile_stripe_customers
+    from sbily.payments.tasks import requeue_stripe_events
     from sbily.users.tasks import reset_user_monthly_link_limits
 
     sender.add_periodic_task(
@@ -41,8 +47,38 @@ def setup_periodic_tasks(sender: Celery, **kwargs):
         reset_user_monthly_link_limits.s(),
         name="Reset Users Monthly Link Limits",
     )
+    sender.add_periodic_task(
+        crontab(minute="*/5"),
+        export_link_snapshot.s(),
+        name="Export Link Snapshot",
+    )
+    sender.add_periodic_task(
+        crontab(),
+        replay_click_spool.s(),
+        name="Replay Click Spool",
+    )
     sender.add_periodic_task(
         crontab(minute=0, hour=0),
         clean_up_analytics_data.s(),
         name="Clean Up Analytics Data",
     )
+    sender.add_periodic_task(
+        crontab(minute=30, hour=0),
+        prune_read_notifications.s(),
+        name="Prune Read Notifications",
+    )
+    sender.add_periodic_task(
+        crontab(minute=15),
+        reconcile_stripe_customers.s(),
+        name="Reconcile Stripe Customers",
+    )
+    sender.add_periodic_task(
+        crontab(minute="*/5"),
+        requeue_stripe_events.s(),
+        name="Requeue Stripe Events",
+    )
+    sender.add_periodic_task(
+        crontab(minute=45, hour=0),
+        prune_request_profiles.s(),
+        name="Prune Request Profiles",
+    )
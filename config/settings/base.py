@@ -7,6 +7,7 @@ import ssl
 from pathlib import Path
 
 import dj_database_url
+from decouple import Csv
 from decouple import config
 from django.contrib.messages import constants
 
@@ -34,6 +35,84 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/ref/contrib/gis/geoip2/
 GEOIP_PATH = BASE_DIR / "config" / "geoip"
 
+# CLICKS
+# ------------------------------------------------------------------------------
+# Extra networks (CIDR) whose clicks are counted as bots, e.g. monitoring probes
+CLICK_BOT_IP_RANGES = config("CLICK_BOT_IP_RANGES", default="", cast=Csv())
+# Seconds repeated clicks of a visitor on a link are collapsed into the first
+# one, links can override it and 0 records every click
+CLICK_DEDUP_WINDOW = config("CLICK_DEDUP_WINDOW", default=10, cast=int)
+# Clicks per minute above which a link only stores a weighted sample of its
+# clicks, keeping exact totals in counters. 0 stores every click.
+CLICK_SAMPLING_THRESHOLD = config("CLICK_SAMPLING_THRESHOLD", default=600, cast=int)
+# Directory clicks are spooled to while the database is unavailable, shared by
+# the web and Celery containers. Empty drops those clicks instead.
+CLICK_SPOOL_DIR = config("CLICK_SPOOL_DIR", default="")
+# Preallocated size of a spool segment file
+CLICK_SPOOL_SEGMENT_SIZE = config(
+    "CLICK_SPOOL_SEGMENT_SIZE",
+    default=4 * 1024 * 1024,
+    cast=int,
+)
+# Seconds a segment stays open before it is sealed and handed to the replay
+CLICK_SPOOL_SEGMENT_MAX_AGE = config(
+    "CLICK_SPOOL_SEGMENT_MAX_AGE",
+    default=60,
+    cast=int,
+)
+# Clicks and seconds between syncs of a segment to disk
+CLICK_SPOOL_SYNC_EVERY = config("CLICK_SPOOL_SYNC_EVERY", default=100, cast=int)
+CLICK_SPOOL_SYNC_INTERVAL = config("CLICK_SPOOL_SYNC_INTERVAL", default=1.0, cast=float)
+# Seconds clicks go straight to the spool after the database failed to store one
+CLICK_SPOOL_RETRY_AFTER = config("CLICK_SPOOL_RETRY_AFTER", default=10, cast=int)
+# Seconds after which an unsealed segment is replayed as abandoned, e.g. by a
+# killed worker
+CLICK_SPOOL_ABANDONED_AFTER = config(
+    "CLICK_SPOOL_ABANDONED_AFTER",
+    default=3600,
+    cast=int,
+)
+
+# LINKS
+# ------------------------------------------------------------------------------
+# Seconds redirects cache a link, edits invalidate it
+LINK_CACHE_TIMEOUT = config("LINK_CACHE_TIMEOUT", default=60, cast=int)
+# Seconds redirects remember that no link has a path
+LINK_MISSING_CACHE_TIMEOUT = config(
+    "LINK_MISSING_CACHE_TIMEOUT",
+    default=10,
+    cast=int,
+)
+
+# LINK SNAPSHOT
+# ------------------------------------------------------------------------------
+# File the active links are exported to for redirects without a database
+# query, shared by the web and Celery containers. Empty disables the snapshot.
+LINK_SNAPSHOT_PATH = config("LINK_SNAPSHOT_PATH", default="")
+# Seconds between checks for a newly exported snapshot
+LINK_SNAPSHOT_CHECK_INTERVAL = config(
+    "LINK_SNAPSHOT_CHECK_INTERVAL",
+    default=5,
+    cast=int,
+)
+# False positive rate of the snapshot filter turning away unknown paths
+LINK_FILTER_FALSE_POSITIVE_RATE = config(
+    "LINK_FILTER_FALSE_POSITIVE_RATE",
+    default=0.01,
+    cast=float,
+)
+
+# RATE LIMITING
+# ------------------------------------------------------------------------------
+RATE_LIMIT_ENABLED = config("RATE_LIMIT_ENABLED", default=True, cast=bool)
+# "redis" shares the buckets through the default cache Redis, "memory" keeps
+# them in each process
+RATE_LIMIT_BACKEND = config("RATE_LIMIT_BACKEND", default="redis")
+# Rates per scope and key overriding or adding to the ones of the views, such
+# as "1200/m" for the "ip" key of the "redirect" scope. Redirects have no
+# per-link limit by default, a viral link must not turn its visitors away.
+RATE_LIMITS = {}
+
 # DATABASES
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#databases
@@ -44,6 +123,30 @@ DATABASES = {
     ),
 }
 DATABASES["default"]["ATOMIC_REQUESTS"] = True
+# Read replicas, used for analytics and redirect lookups through
+# sbily.utils.db.use_replica. Writes always go to the default database.
+DATABASE_REPLICAS = []
+for index, url in enumerate(
+    config("DATABASE_REPLICA_URLS", default="", cast=Csv()),
+):
+    alias = f"replica_{index}"
+    DATABASES[alias] = dj_database_url.parse(url, conn_max_age=1800)
+    DATABASES[alias]["TEST"] = {"MIRROR": "default"}
+    DATABASE_REPLICAS.append(alias)
+# https://docs.djangoproject.com/en/dev/ref/settings/#database-routers
+DATABASE_ROUTERS = ["sbily.utils.db.ReplicaRouter"]
+# Replicas lagging behind the primary by more than this many seconds are skipped
+DATABASE_REPLICA_MAX_LAG = config("DATABASE_REPLICA_MAX_LAG", default=5, cast=float)
+DATABASE_REPLICA_CHECK_INTERVAL = 10
+# Seconds a user (or link) reads from the primary after changing a link
+DATABASE_REPLICA_STICKY_SECONDS = 15
+# Pool size for independent queries run concurrently through
+# sbily.utils.db.gather_queries, every pool thread holds its own connection
+DATABASE_MAX_CONCURRENT_QUERIES = config(
+    "DATABASE_MAX_CONCURRENT_QUERIES",
+    default=4,
+    cast=int,
+)
 
 # URLS
 # ------------------------------------------------------------------------------
@@ -75,6 +178,7 @@ LOCAL_APPS = [
     "sbily.notifications",
     "sbily.payments",
     "sbily.dashboard",
+    "sbily.monitoring",
 ]
 # https://docs.djangoproject.com/en/dev/ref/settings/#installed-apps
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
@@ -112,6 +216,7 @@ AUTH_PASSWORD_VALIDATORS = [
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#middleware
 MIDDLEWARE = [
+    "sbily.monitoring.middleware.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -120,6 +225,7 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "sbily.users.middleware.TimezoneMiddleware",
+    "sbily.monitoring.middleware.ProfilingMiddleware",
 ]
 
 # STATIC
@@ -221,6 +327,37 @@ LOGGING = {
 REDIS_URL = config("REDIS_URL", default="redis://redis:6379/0")
 REDIS_SSL = REDIS_URL.startswith("rediss://")
 
+# METRICS
+# ------------------------------------------------------------------------------
+# Bearer token Prometheus uses to scrape /metrics/ (staff users can always read it)
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+# Directory shared by the processes of a container (gunicorn workers, Celery
+# pool processes), each one writes its metrics there for the others to sum up.
+# Empty keeps the metrics in process memory only.
+METRICS_MULTIPROC_DIR = config("METRICS_MULTIPROC_DIR", default="")
+METRICS_FLUSH_INTERVAL = 1
+# Port of the metrics endpoint served by Celery workers, 0 disables it
+CELERY_WORKER_METRICS_PORT = config("CELERY_WORKER_METRICS_PORT", default=0, cast=int)
+
+# PROFILING
+# ------------------------------------------------------------------------------
+# Profile 1 in N requests, 0 only profiles requests asking for it
+PROFILING_SAMPLE_RATE = config("PROFILING_SAMPLE_RATE", default=0, cast=int)
+# Local directory for raw profiles, kept out of the public media storage
+PROFILING_ROOT = config("PROFILING_ROOT", default=str(BASE_DIR / "profiles"))
+# Seconds a signed profiling token from the admin stays valid
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+PROFILING_RETENTION_DAYS = 7
+
+# SLOW QUERIES
+# ------------------------------------------------------------------------------
+# Statements slower than this many milliseconds are recorded, 0 disables it
+SLOW_QUERY_THRESHOLD = config("SLOW_QUERY_THRESHOLD", default=500, cast=int)
+# EXPLAIN (ANALYZE, BUFFERS) 1 in N slow SELECTs, which runs them again
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = 10
+SLOW_QUERY_EXPLAIN_TIMEOUT = 10
+SLOW_QUERY_MAX_ROWS = 10_000
+
 # Django messages
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#std:setting-MESSAGE_STORAGE
@@ -237,6 +374,16 @@ MESSAGE_TAGS = {
 STRIPE_SECRET_KEY = config("STRIPE_SECRET_KEY")
 STRIPE_WEBHOOK_SECRET = config("STRIPE_WEBHOOK_SECRET")
 STRIPE_API_VERSION = config("STRIPE_API_VERSION", default="2025-05-28.basil")
+# Seconds to wait for a connection to / a response from the Stripe API
+STRIPE_CONNECT_TIMEOUT = config("STRIPE_CONNECT_TIMEOUT", default=5, cast=float)
+STRIPE_READ_TIMEOUT = config("STRIPE_READ_TIMEOUT", default=20, cast=float)
+STRIPE_MAX_NETWORK_RETRIES = config("STRIPE_MAX_NETWORK_RETRIES", default=2, cast=int)
+# Upper bound on Stripe calls issued concurrently by a single process
+STRIPE_MAX_CONCURRENT_CALLS = config(
+    "STRIPE_MAX_CONCURRENT_CALLS",
+    default=8,
+    cast=int,
+)
 # PRICES
 # ------------------------------------------------------------------------------
 STRIPE_PREMIUM_MONTHLY_PRICE_ID = config("STRIPE_PREMIUM_MONTHLY_PRICE_ID")
@@ -280,6 +427,10 @@ CELERY_TASK_TIME_LIMIT = 5 * 60
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#task-soft-time-limit
 # TODO: set to whatever value is adequate in your circumstances
 CELERY_TASK_SOFT_TIME_LIMIT = 60
+# https://docs.celeryq.dev/en/stable/userguide/configuration.html#task-routes
+# Stripe webhook events run on their own queue so billing bursts never starve
+# the default queue.
+CELERY_TASK_ROUTES = {"process_stripe_event": {"queue": "stripe"}}
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#beat-scheduler
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#worker-send-task-events
@@ -23,11 +23,15 @@ LINK_BASE_URL = BASE_URL + LINK_PREFIX
 # https://docs.djangoproject.com/en/dev/ref/settings/#caches
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "BACKEND": "sbily.monitoring.cache.LocMemCache",
         "LOCATION": "",
     },
 }
 
+# RATE LIMITING
+# ------------------------------------------------------------------------------
+RATE_LIMIT_BACKEND = "memory"
+
 # EMAIL
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#email-host
@@ -21,13 +21,14 @@ LINK_BASE_URL = BASE_URL + LINK_PREFIX
 
 # DATABASES
 # ------------------------------------------------------------------------------
-DATABASES["default"]["CONN_MAX_AGE"] = config("CONN_MAX_AGE", default=60)
+for database in DATABASES.values():
+    database["CONN_MAX_AGE"] = config("CONN_MAX_AGE", default=60, cast=int)
 
 # CACHES
 # ------------------------------------------------------------------------------
 CACHES = {
     "default": {
-        "BACKEND": "django_redis.cache.RedisCache",
+        "BACKEND": "sbily.monitoring.cache.RedisCache",
         "LOCATION": REDIS_URL,
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
@@ -13,6 +13,11 @@ SECRET_KEY = config("DJANGO_SECRET_KEY", default="k*zpSb*jMcXatzx!hfmepS^k@^^@9$
 # https://docs.djangoproject.com/en/dev/ref/settings/#test-runner
 TEST_RUNNER = "django.test.runner.DiscoverRunner"
 
+# DATABASES
+# ------------------------------------------------------------------------------
+# Pool threads use their own connections and can't see TestCase transactions
+DATABASE_MAX_CONCURRENT_QUERIES = 1
+
 # PASSWORDS
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#password-hashers
@@ -23,6 +28,10 @@ PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
 # https://docs.djangoproject.com/en/dev/ref/settings/#email-backend
 EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
 
+# RATE LIMITING
+# ------------------------------------------------------------------------------
+RATE_LIMIT_BACKEND = "memory"
+
 # DEBUGGING FOR TEMPLATES
 # ------------------------------------------------------------------------------
 TEMPLATES[0]["OPTIONS"]["debug"] = True  # type: ignore[index]
@@ -13,6 +13,7 @@ urlpatterns = [
     path("dashboard/", include("sbily.dashboard.urls")),
     path("notifications/", include("sbily.notifications.urls")),
     path("payments/", include("sbily.payments.urls")),
+    path("metrics/", include("sbily.monitoring.urls")),
     # Media files
     *static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT),
 ]
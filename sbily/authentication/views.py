@@ -18,6 +18,7 @@ from sbily.users.tasks import send_password_reset_email
 from sbily.users.tasks import send_welcome_email
 from sbily.utils.errors import BadRequestError
 from sbily.utils.errors import bad_request_error
+from sbily.utils.ratelimit import rate_limit
 
 from .forms import ForgotPasswordForm
 from .forms import ResetPasswordForm
@@ -95,6 +96,7 @@ def sign_up(request: HttpRequest):
     return render(request, "sign_up.html", {"form": form, "sign_in_url": sign_in_url})
 
 
+@rate_limit("sign_in", methods=("POST",), ip="10/m")
 def sign_in(request: HttpRequest):
     if request.user.is_authenticated:
         return redirect("my_account")
@@ -130,6 +132,7 @@ def sign_in(request: HttpRequest):
     return render(request, "sign_in.html", {"form": form, "sign_up_url": sign_up_url})
 
 
+@rate_limit("sign_in_with_email", methods=("POST",), ip="5/m")
 def sign_in_with_email(request: HttpRequest):
     if request.user.is_authenticated:
         return redirect("my_account")
@@ -229,6 +232,7 @@ def verify_email(request: HttpRequest, token: str):
         return redirect(redirect_url_name)
 
 
+@rate_limit("forgot_password", methods=("POST",), ip="5/m")
 def forgot_password(request: HttpRequest):
     if request.method != "POST":
         email = request.GET.get("email", "")
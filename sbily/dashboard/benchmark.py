@@ -0,0 +1,337 @@
+"""
+Synthetic datasets and timings behind the `benchmark_dashboard` command.
+
+Clicks are spread over links with a Zipf-like popularity, so a few links get
+most of the traffic, and draw their browser, device, location and referrer
+from weighted tables close to what real traffic looks like.
+"""
+
+import ipaddress
+import itertools
+import random
+import statistics
+import time
+import tracemalloc
+from typing import TYPE_CHECKING
+
+from django.contrib.auth.models import Permission
+from django.db.models import QuerySet
+from django.test import RequestFactory
+from django.utils import timezone
+
+from sbily.links.models import LinkClick
+from sbily.links.models import ShortenedLink
+from sbily.monitoring.metrics import measure
+from sbily.monitoring.slow_queries import pause_capture
+from sbily.users.models import User
+from sbily.users.roles import UserRole
+
+from .utils import get_daily_click_counts
+from .views import as_date
+from .views import dashboard
+from .views import filter_clicks
+from .views import generate_advanced_statistics
+from .views import generate_basic_statistics
+from .views import link_statistics
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from collections.abc import Iterator
+
+USERNAME_PREFIX = "benchmark-"
+CHUNK_SIZE = 100_000
+# Exponent of the link popularity, 1 means the n-th link gets 1/n of the clicks
+POPULARITY_SKEW = 1.1
+# Clicks are dated up to a year back, most of them in the last weeks
+MAX_CLICK_AGE_DAYS = 365
+MEAN_CLICK_AGE_DAYS = 45
+# Share of clicks per hour of the day, quieter at night
+HOURLY_TRAFFIC = (
+    2, 1, 1, 1, 1, 2, 3, 5, 6, 6, 6, 6,
+    6, 6, 6, 6, 6, 6, 6, 6, 5, 5, 4, 3,
+)  # fmt: skip
+
+BROWSERS = {
+    "Chrome": 64,
+    "Safari": 19,
+    "Edge": 5,
+    "Firefox": 3,
+    "Samsung Internet": 3,
+    "Opera": 2,
+    "Other": 4,
+}
+OPERATING_SYSTEMS = {
+    "Android": 44,
+    "iOS": 27,
+    "Windows": 17,
+    "Mac OS X": 7,
+    "Linux": 2,
+    "Other": 3,
+}
+DEVICE_TYPES = {"mobile": 62, "desktop": 33, "tablet": 4, "other": 1}
+LOCATIONS = {
+    ("United States", "New York"): 9,
+    ("United States", "Los Angeles"): 6,
+    ("Brazil", "São Paulo"): 7,
+    ("Brazil", "Rio de Janeiro"): 4,
+    ("India", "Mumbai"): 6,
+    ("India", "Delhi"): 5,
+    ("United Kingdom", "London"): 4,
+    ("Germany", "Berlin"): 3,
+    ("France", "Paris"): 3,
+    ("Japan", "Tokyo"): 3,
+    ("Indonesia", "Jakarta"): 3,
+    ("Mexico", "Mexico City"): 3,
+    ("Nigeria", "Lagos"): 2,
+    ("Canada", "Toronto"): 2,
+    ("Unknown", "Unknown"): 5,
+}
+REFERRERS = {
+    "": 55,
+    "https://www.google.com/": 15,
+    "https://t.co/": 8,
+    "https://www.facebook.com/": 8,
+    "https://www.linkedin.com/": 4,
+    "https://www.reddit.com/": 4,
+    "https://mail.google.com/": 4,
+    "https://news.ycombinator.com/": 2,
+}
+CLICK_COLUMNS = (
+    "link_id",
+    "clicked_at",
+    "ip_address",
+    "country",
+    "city",
+    "browser",
+    "device_type",
+    "operating_system",
+    "referrer",
+    "weight",
+    "repeat_count",
+)
+
+
+class WeightedChoice:
+    """Draw values of a {value: weight} table."""
+
+    def __init__(self, rng: random.Random, table: dict):
+        self.rng = rng
+        self.values = list(table)
+        self.cum_weights = list(itertools.accumulate(table.values()))
+
+    def sample(self, k: int) -> list:
+        return self.rng.choices(self.values, cum_weights=self.cum_weights, k=k)
+
+
+class SyntheticDataset:
+    """
+    Benchmark users, links and clicks, grown in place to each requested size.
+
+    The first user owns the most popular link and has advanced statistics,
+    it is the one the dashboards are timed for.
+    """
+
+    def __init__(self, users: int, links: int, seed: int = 0):
+        self.user_count = users
+        self.link_count = links
+        self.rng = random.Random(seed)  # noqa: S311
+        self.click_count = 0
+        self.users: list[User] = []
+        self.links: list[ShortenedLink] = []
+
+    @property
+    def target_user(self) -> User:
+        return self.users[0]
+
+    @property
+    def target_link(self) -> ShortenedLink:
+        return self.links[0]
+
+    def create(self) -> None:
+        self.users = User.objects.bulk_create(
+            User(
+                username=f"{USERNAME_PREFIX}{index}",
+                email=f"{USERNAME_PREFIX}{index}@example.com",
+                password="!",  # noqa: S106
+                role=UserRole.ADVANCED.value,
+            )
+            for index in range(self.user_count)
+        )
+        self.target_user.user_permissions.add(
+            Permission.objects.get(codename="view_advanced_statistics"),
+        )
+        # Round robin, so the first user also owns a share of the long tail
+        self.links = ShortenedLink.objects.bulk_create(
+            ShortenedLink(
+                destination_url=f"https://example.com/{index}",
+                shortened_path=f"bm{index:x}",
+                user=self.users[index % self.user_count],
+            )
+            for index in range(self.link_count)
+        )
+
+    def grow(self, size: int) -> float:
+        """Add clicks until the dataset holds `size`, return the load time."""
+        started_at = time.perf_counter()
+        while self.click_count < size:
+            chunk = min(CHUNK_SIZE, size - self.click_count)
+            load_clicks(self.generate_clicks(chunk, total=size))
+            self.click_count += chunk
+        return time.perf_counter() - started_at
+
+    def generate_clicks(self, count: int, total: int) -> Iterator[tuple]:
+        rng = self.rng
+        link_ids = [link.pk for link in self.links]
+        popularity = WeightedChoice(
+            rng,
+            {
+                link_id: 1 / (rank**POPULARITY_SKEW)
+                for rank, link_id in enumerate(link_ids, start=1)
+            },
+        )
+        hours = WeightedChoice(rng, dict(enumerate(HOURLY_TRAFFIC)))
+        browsers = WeightedChoice(rng, BROWSERS)
+        operating_systems = WeightedChoice(rng, OPERATING_SYSTEMS)
+        device_types = WeightedChoice(rng, DEVICE_TYPES)
+        locations = WeightedChoice(rng, LOCATIONS)
+        referrers = WeightedChoice(rng, REFERRERS)
+        # About four clicks per visitor
+        visitors = max(1_000, total // 4)
+        now = timezone.localtime()
+        today = now.replace(minute=0, second=0, microsecond=0)
+
+        columns = zip(
+            popularity.sample(count),
+            hours.sample(count),
+            browsers.sample(count),
+            operating_systems.sample(count),
+            device_types.sample(count),
+            locations.sample(count),
+            referrers.sample(count),
+            strict=True,
+        )
+        for row in columns:
+            (
+                link_id,
+                hour,
+                browser,
+                operating_system,
+                device_type,
+                location,
+                referrer,
+            ) = row
+            age_days = min(
+                int(rng.expovariate(1 / MEAN_CLICK_AGE_DAYS)),
+                MAX_CLICK_AGE_DAYS,
+            )
+            clicked_at = today.replace(hour=hour) - timezone.timedelta(
+                days=age_days,
+                seconds=rng.randrange(3600),
+            )
+            if clicked_at > now:
+                clicked_at -= timezone.timedelta(days=1)
+            ip_address = ipaddress.IPv4Address(0x0B000000 + rng.randrange(visitors))
+            yield (
+                link_id,
+                clicked_at,
+                str(ip_address),
+                *location,
+                browser,
+                device_type,
+                operating_system,
+                referrer,
+                1,
+                0,
+            )
+
+    def delete(self) -> None:
+        users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+        # A single DELETE instead of collecting millions of clicks to cascade
+        LinkClick.objects.filter(link__user__in=users).delete()
+        users.delete()
+
+
+def load_clicks(rows: Iterator[tuple]) -> None:
+    columns = zip(*rows, strict=True)
+    LinkClick.bulk_load(dict(zip(CLICK_COLUMNS, map(list, columns), strict=True)))
+
+
+def get_targets(dataset: SyntheticDataset) -> dict[str, Callable[[], object]]:
+    """The views and statistics functions to time, as argument-less calls."""
+    factory = RequestFactory()
+    user = dataset.target_user
+    link = dataset.target_link
+
+    def get_request(path: str = "/"):
+        request = factory.get(path)
+        request.user = user
+        return request
+
+    def basic_statistics():
+        request = get_request()
+        clicks, from_date, to_date = filter_clicks(request, link)
+        sampled_clicks = get_daily_click_counts(
+            link.sampled_clicks.all(),
+            user,
+            as_date(from_date),
+            as_date(to_date),
+        )
+        return generate_basic_statistics(
+            clicks,
+            link,
+            from_date,
+            to_date,
+            sampled_clicks,
+        )
+
+    def advanced_statistics():
+        request = get_request()
+        clicks, _, _ = filter_clicks(request, link)
+        return {
+            name: list(value) if isinstance(value, QuerySet) else value
+            for name, value in generate_advanced_statistics(request, clicks).items()
+        }
+
+    return {
+        "dashboard": lambda: dashboard(get_request()),
+        "link_statistics": lambda: link_statistics(
+            get_request(),
+            link.shortened_path,
+        ),
+        "generate_basic_statistics": basic_statistics,
+        "generate_advanced_statistics": advanced_statistics,
+    }
+
+
+def time_target(name: str, target: Callable[[], object], repeat: int) -> dict:
+    """Time a target after a warm-up call, then trace its peak memory once."""
+    durations = []
+    sql_counts = []
+    sql_times = []
+    with pause_capture():
+        target()
+        for _ in range(repeat):
+            with measure("benchmark", name) as measurement:
+                started_at = time.perf_counter()
+                target()
+                durations.append(time.perf_counter() - started_at)
+            sql_counts.append(measurement.sql_count)
+            sql_times.append(measurement.sql_time)
+
+        tracemalloc.start()
+        try:
+            target()
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "target": name,
+        "runs": repeat,
+        "min_ms": round(min(durations) * 1000, 2),
+        "median_ms": round(statistics.median(durations) * 1000, 2),
+        "max_ms": round(max(durations) * 1000, 2),
+        "sql_count": max(sql_counts),
+        "sql_median_ms": round(statistics.median(sql_times) * 1000, 2),
+        "peak_memory_kib": round(peak_memory / 1024, 1),
+    }
@@ -0,0 +1,139 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connection
+from django.utils import timezone
+
+from sbily.dashboard.benchmark import USERNAME_PREFIX
+from sbily.dashboard.benchmark import SyntheticDataset
+from sbily.dashboard.benchmark import get_targets
+from sbily.dashboard.benchmark import time_target
+from sbily.users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the dashboard views and statistics functions against growing "
+        "synthetic click datasets and save the results as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[10_000, 100_000, 1_000_000],
+            help="Click counts to benchmark at, up to 10^8.",
+        )
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--links", type=int, default=1_000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--output",
+            type=Path,
+            help="JSON file for the results, defaults to a timestamped name.",
+        )
+        parser.add_argument(
+            "--compare",
+            type=Path,
+            help="Results of a previous run to compare median timings with.",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the synthetic data once done.",
+        )
+        parser.add_argument(
+            "--clean",
+            action="store_true",
+            help="Only delete synthetic data left by a previous run.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Run even when DEBUG is off.",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["force"]:
+            msg = "Refusing to load synthetic data with DEBUG off, use --force."
+            raise CommandError(msg)
+
+        dataset = SyntheticDataset(options["users"], options["links"], options["seed"])
+        if options["clean"]:
+            dataset.delete()
+            self.stdout.write("Synthetic data deleted.")
+            return
+        if User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            msg = "Synthetic data of a previous run exists, remove it with --clean."
+            raise CommandError(msg)
+
+        report = {
+            "created_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "users": options["users"],
+            "links": options["links"],
+            "repeat": options["repeat"],
+            "seed": options["seed"],
+            "results": [],
+        }
+
+        dataset.create()
+        try:
+            for size in sorted(options["sizes"]):
+                self.stdout.write(self.style.MIGRATE_HEADING(f"{size:,} clicks"))
+                load_seconds = dataset.grow(size)
+                self.stdout.write(f"  loaded in {load_seconds:.1f}s")
+
+                targets = []
+                for name, target in get_targets(dataset).items():
+                    timing = time_target(name, target, options["repeat"])
+                    targets.append(timing)
+                    self.stdout.write(
+                        f"  {name}: {timing['median_ms']} ms median, "
+                        f"{timing['sql_count']} queries, "
+                        f"{timing['peak_memory_kib']} KiB peak",
+                    )
+                report["results"].append(
+                    {
+                        "size": size,
+                        "load_seconds": round(load_seconds, 2),
+                        "targets": targets,
+                    },
+                )
+        finally:
+            if not options["keep"]:
+                dataset.delete()
+
+        output = options["output"] or Path(
+            f"benchmark-dashboard-{timezone.now():%Y%m%d-%H%M%S}.json",
+        )
+        output.write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Results saved to {output}"))
+
+        if options["compare"]:
+            self.compare(report, json.loads(options["compare"].read_text()))
+
+    def compare(self, report: dict, baseline: dict) -> None:
+        baseline_medians = {
+            (result["size"], timing["target"]): timing["median_ms"]
+            for result in baseline["results"]
+            for timing in result["targets"]
+        }
+        self.stdout.write(self.style.MIGRATE_HEADING("Median change from baseline"))
+        for result in report["results"]:
+            for timing in result["targets"]:
+                before = baseline_medians.get((result["size"], timing["target"]))
+                if not before:
+                    continue
+                change = (timing["median_ms"] - before) / before * 100
+                style = self.style.ERROR if change > 0 else self.style.SUCCESS
+                self.stdout.write(
+                    f"  {result['size']:,} {timing['target']}: "
+                    f"{before} -> {timing['median_ms']} ms "
+                    + style(f"({change:+.1f}%)"),
+                )
@@ -1,36 +1,38 @@
 from typing import TYPE_CHECKING
 
+from django.db.models import Count
+from django.db.models import Q
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.db.models.functions import TruncDay
 from django.utils import timezone
 
 from sbily.links.models import LinkClick
-from sbily.users.roles import UserRole
+from sbily.links.models import SampledClickCount
 
 if TYPE_CHECKING:
+    from collections.abc import Callable
+    from datetime import date
+    from typing import Any
+
     from django.db.models import QuerySet
 
+    from sbily.links.models import DailyClickCount
+    from sbily.links.models import ShortenedLink
     from sbily.users.models import User
 
 
 def filter_clicks_by_plan(clicks: QuerySet[LinkClick], user: User):
     """Filter clicks based on the user plan."""
 
-    if user.role == UserRole.ADMIN.value:
+    retention_days = user.entitlements.retention_days
+    if retention_days is None:
         return clicks  # No filtering for admin users
 
     current_time = timezone.now()
-    thirty_days = 30
-    one_year = 365
-
-    time_mapping = {
-        UserRole.PREMIUM.value: one_year,
-        UserRole.BUSINESS.value: one_year * 3,
-        UserRole.ADVANCED.value: one_year * 5,
-    }
-
-    # Default to 30 days for free users
-    time = time_mapping.get(user.role, thirty_days)
-
-    return clicks.filter(clicked_at__gte=current_time - timezone.timedelta(days=time))
+    return clicks.filter(
+        clicked_at__gte=current_time - timezone.timedelta(days=retention_days),
+    )
 
 
 def get_user_clicks(user: User):
@@ -41,3 +43,131 @@ def get_user_clicks(user: User):
 
     clicks = LinkClick.objects.filter(link__user=user)
     return filter_clicks_by_plan(clicks, user)
+
+
+def get_user_sampled_clicks(user: User):
+    """Counters of the clicks left out of the sample of the user's hot links."""
+
+    sampled_clicks = SampledClickCount.objects.filter(link__user=user)
+    retention_days = user.entitlements.retention_days
+    if retention_days is not None:
+        sampled_clicks = sampled_clicks.filter(
+            day__gte=timezone.localdate() - timezone.timedelta(days=retention_days),
+        )
+    return sampled_clicks
+
+
+def merge_daily_clicks(
+    daily_clicks_data: list[dict],
+    extra_clicks: dict[date, int],
+) -> list[dict]:
+    counts = {item["date"]: item["count"] for item in daily_clicks_data}
+    for day, count in extra_clicks.items():
+        key = day.strftime("%Y-%m-%d")
+        counts[key] = counts.get(key, 0) + count
+    return [{"date": key, "count": counts[key]} for key in sorted(counts)]
+
+
+def get_daily_click_counts(
+    counts: QuerySet[DailyClickCount],
+    user: User,
+    from_date: date | None,
+    to_date: date | None,
+) -> dict[date, int]:
+    """Daily click counters of a link per day, within the user plan."""
+
+    retention_days = user.entitlements.retention_days
+    if retention_days is not None:
+        counts = counts.filter(
+            day__gte=timezone.localdate() - timezone.timedelta(days=retention_days),
+        )
+    if from_date:
+        counts = counts.filter(day__gte=from_date)
+    if to_date:
+        counts = counts.filter(day__lte=to_date)
+
+    return dict(counts.values_list("day", "count"))
+
+
+def get_dashboard_query_units(
+    links: QuerySet[ShortenedLink],
+    clicks: QuerySet[LinkClick],
+    sampled_clicks: QuerySet[SampledClickCount],
+    *,
+    advanced_statistics: bool = False,
+) -> dict[str, Callable[[], Any]]:
+    """
+    Build the independent queries behind the dashboard, keyed by context name.
+    Each unit fully evaluates its query so they can run concurrently.
+    Totals add the clicks left out of the sample of hot links, breakdowns
+    weigh the sampled clicks instead.
+    """
+
+    current_time = timezone.now()
+    clicks_last_30_days = clicks.filter(
+        clicked_at__gte=current_time - timezone.timedelta(days=30),
+    )
+    seven_days_ago = current_time - timezone.timedelta(days=7)
+
+    def daily_clicks():
+        daily_clicks = (
+            clicks_last_30_days.annotate(day=TruncDay("clicked_at"))
+            .values("day")
+            .annotate(count=Count("id"))
+            .order_by("day")
+        )
+        sampled_out = sampled_clicks.filter(
+            day__gte=(current_time - timezone.timedelta(days=30)).date(),
+        )
+        # Format dates for JSON serialization
+        return merge_daily_clicks(
+            [
+                {"date": item["day"].strftime("%Y-%m-%d"), "count": item["count"]}
+                for item in daily_clicks
+            ],
+            dict(
+                sampled_out.values("day")
+                .annotate(count=Sum("count"))
+                .values_list("day", "count"),
+            ),
+        )
+
+    def total_clicks():
+        sampled_out = sampled_clicks.aggregate(total=Coalesce(Sum("count"), 0))
+        return clicks.count() + sampled_out["total"]
+
+    units = {
+        "total_clicks": total_clicks,
+        "unique_visitors": clicks.values("ip_address").distinct().count,
+        "links_count": links.count,
+        "active_links": links.filter(is_active=True).count,
+        "expired_links": links.filter(expires_at__lt=current_time).count,
+        "daily_clicks_data": daily_clicks,
+        "top_links": lambda: list(
+            links.annotate(
+                click_count=Coalesce(Sum("clicks__weight"), 0),
+            ).order_by("-click_count")[:5],
+        ),
+        "latest_links": lambda: list(links.order_by("-created_at")[:10]),
+        # Most active links (most clicks in last 7 days)
+        "active_links_data": lambda: list(
+            links.annotate(
+                recent_clicks=Coalesce(
+                    Sum(
+                        "clicks__weight",
+                        filter=Q(clicks__clicked_at__gte=seven_days_ago),
+                    ),
+                    0,
+                ),
+            ).order_by("-recent_clicks")[:5],
+        ),
+    }
+
+    if advanced_statistics:
+        units["country_distribution"] = lambda: list(
+            clicks_last_30_days.values("country")
+            .annotate(count=Sum("weight"))
+            .order_by("-count")[:5],
+        )
+
+    return units
@@ -1,10 +1,11 @@
 import contextlib
 import json
+from datetime import date
 from typing import TYPE_CHECKING
 
 from django.contrib.auth.decorators import login_required
 from django.db.models import Count
-from django.db.models import Q
+from django.db.models import Sum
 from django.db.models.functions import TruncDay
 from django.db.models.functions import TruncHour
 from django.shortcuts import get_object_or_404
@@ -12,79 +13,49 @@ from django.shortcuts import render
 from django.utils import timezone
 
 from sbily.links.models import ShortenedLink
+from sbily.utils.db import gather_queries
+from sbily.utils.db import replica_reads
 
 from .utils import filter_clicks_by_plan
+from .utils import get_daily_click_counts
+from .utils import get_dashboard_query_units
 from .utils import get_user_clicks
+from .utils import get_user_sampled_clicks
+from .utils import merge_daily_clicks
 
 if TYPE_CHECKING:
     from django.http import HttpRequest
 
 
 @login_required
+@replica_reads
 def dashboard(request: HttpRequest):
     user = request.user
     links = ShortenedLink.objects.filter(user=user)
-
     clicks = get_user_clicks(user)
-    total_clicks = clicks.count()
-    unique_visitors = clicks.values("ip_address").distinct().count()
-    active_links = links.filter(is_active=True).count()
-    expired_links = links.filter(expires_at__lt=timezone.now()).count()
-
-    thirty_days_ago = timezone.now() - timezone.timedelta(days=30)
-    clicks_last_30_days = clicks.filter(clicked_at__gte=thirty_days_ago)
 
-    daily_clicks = (
-        clicks_last_30_days.annotate(day=TruncDay("clicked_at"))
-        .values("day")
-        .annotate(count=Count("id"))
-        .order_by("day")
+    context = gather_queries(
+        get_dashboard_query_units(
+            links,
+            clicks,
+            get_user_sampled_clicks(user),
+            advanced_statistics=user.entitlements.advanced_statistics,
+        ),
     )
-    # Format dates for JSON serialization
-    daily_clicks_data = [
-        {"date": item["day"].strftime("%Y-%m-%d"), "count": item["count"]}
-        for item in daily_clicks
-    ]
-
-    top_links = links.annotate(click_count=Count("clicks")).order_by("-click_count")[:5]
-    latest_links = links.order_by("-created_at")[:10]
-
-    # Calculate most active links (most clicks in last 7 days)
-    seven_days_ago = timezone.now() - timezone.timedelta(days=7)
-    active_links_data = links.annotate(
-        recent_clicks=Count("clicks", filter=Q(clicks__clicked_at__gte=seven_days_ago)),
-    ).order_by("-recent_clicks")[:5]
-
-    context = {
-        "total_clicks": total_clicks,
-        "unique_visitors": unique_visitors,
-        "links_count": links.count(),
-        "active_links": active_links,
-        "expired_links": expired_links,
-        "daily_clicks_data": json.dumps(daily_clicks_data),
-        "top_links": top_links,
-        "latest_links": latest_links,
-        "active_links_data": active_links_data,
-    }
-
-    if request.user.has_perm("links.view_advanced_statistics"):
-        country_distribution = (
-            clicks_last_30_days.values("country")
-            .annotate(count=Count("id"))
-            .order_by("-count")[:5]
-        )
-        context["country_distribution"] = list(country_distribution)
+    context["daily_clicks_data"] = json.dumps(context["daily_clicks_data"])
 
     return render(request, "dashboard.html", context)
 
 
 @login_required
+@replica_reads
 def links(request: HttpRequest):
     links = ShortenedLink.objects.filter(user=request.user)
     return render(request, "links.html", {"links": links})
 
 
 @login_required
+@replica_reads
 def link_statistics(request: HttpRequest, shortened_path: str):
     link = get_object_or_404(
         ShortenedLink,
@@ -93,9 +64,22 @@ def link_statistics(request: HttpRequest, shortened_path: str):
     )
 
     clicks, from_date, to_date = filter_clicks(request, link)
-    context = generate_basic_statistics(clicks, link, from_date, to_date)
+    # Clicks left out of the sample of a hot link are only counted per day
+    sampled_clicks = get_daily_click_counts(
+        link.sampled_clicks.all(),
+        request.user,
+        as_date(from_date),
+        as_date(to_date),
+    )
+    context = generate_basic_statistics(
+        clicks,
+        link,
+        from_date,
+        to_date,
+        sampled_clicks,
+    )
 
-    if request.user.has_perm("links.view_advanced_statistics"):
+    if request.user.entitlements.advanced_statistics:
         context.update(generate_advanced_statistics(request, clicks))
 
     daily_clicks = (
@@ -108,11 +92,27 @@ def link_statistics(request: HttpRequest, shortened_path: str):
         {"date": item["day"].strftime("%Y-%m-%d"), "count": item["count"]}
         for item in daily_clicks
     ]
+    daily_clicks_data = merge_daily_clicks(daily_clicks_data, sampled_clicks)
+
+    # Bots are only counted per day, they never match the advanced filters
+    include_bots = request.GET.get("include_bots") == "on"
+    if include_bots:
+        bot_clicks = get_daily_click_counts(
+            link.bot_clicks.all(),
+            request.user,
+            as_date(from_date),
+            as_date(to_date),
+        )
+        context["bot_clicks"] = sum(bot_clicks.values())
+        context["total_clicks"] += context["bot_clicks"]
+        context["clicks_today"] += bot_clicks.get(timezone.localdate(), 0)
+        daily_clicks_data = merge_daily_clicks(daily_clicks_data, bot_clicks)
+    context["include_bots"] = include_bots
 
     hourly_clicks = (
         clicks.annotate(hour=TruncHour("clicked_at"))
         .values("hour")
-        .annotate(count=Count("id"))
+        .annotate(count=Sum("weight"))
         .order_by("hour")
     )
     hourly_clicks_data = [
@@ -130,6 +130,11 @@ def link_statistics(request: HttpRequest, shortened_path: str):
     return render(request, "link.html", context)
 
 
+def as_date(value) -> date | None:
+    """Dates from `filter_clicks`, which leaves invalid input untouched."""
+    return value if isinstance(value, date) else None
+
+
 def filter_clicks(request: HttpRequest, link: ShortenedLink):
     thirty_days_ago = timezone.now() - timezone.timedelta(days=30)
     from_date = request.GET.get("from-date", str(thirty_days_ago.date()))
@@ -149,24 +154,25 @@ def filter_clicks(request: HttpRequest, link: ShortenedLink):
     if to_date:
         with contextlib.suppress(ValueError):
             to_date = timezone.datetime.strptime(to_date, "%Y-%m-%d")
-            to_date = timezone.make_aware(to_date) + timezone.timedelta(days=1)
-            to_date = min(to_date, timezone.localtime())
-            clicks = clicks.filter(clicked_at__lte=to_date)
-            to_date = to_date.date()
+            end = timezone.make_aware(to_date) + timezone.timedelta(days=1)
+            clicks = clicks.filter(clicked_at__lt=min(end, timezone.localtime()))
+            # The last day of the range, the daily counters include it
+            to_date = min(to_date.date(), timezone.localdate())
 
     return clicks, from_date, to_date
 
 
-def generate_basic_statistics(clicks, link, from_date, to_date):
-    total_clicks = clicks.count()
-    clicks_today = clicks.filter(clicked_at__date=timezone.localdate())
+def generate_basic_statistics(clicks, link, from_date, to_date, sampled_clicks):
+    today = timezone.localdate()
+    total_clicks = clicks.count() + sum(sampled_clicks.values())
+    clicks_today = clicks.filter(clicked_at__date=today)
     unique_visitors = clicks.values("ip_address").distinct().count()
     unique_visitors_today = clicks_today.values("ip_address").distinct().count()
 
     return {
         "link": link,
         "total_clicks": total_clicks,
-        "clicks_today": clicks_today.count(),
+        "clicks_today": clicks_today.count() + sampled_clicks.get(today, 0),
         "unique_visitors": unique_visitors,
         "unique_visitors_today": unique_visitors_today,
         "from_date": from_date,
@@ -203,35 +209,35 @@ def generate_advanced_statistics(request, clicks):
     countries_and_cities = (
         clicks.exclude(country="", city="")
         .values("country", "city")
-        .annotate(count=Count("id"))
+        .annotate(count=Sum("weight"))
         .order_by("-count")
     )
 
     devices = (
         clicks.exclude(device_type="")
         .values("device_type")
-        .annotate(count=Count("id"))
+        .annotate(count=Sum("weight"))
         .order_by("-count")
     )
 
     browsers = (
         clicks.exclude(browser="")
         .values("browser")
-        .annotate(count=Count("id"))
+        .annotate(count=Sum("weight"))
         .order_by("-count")[:10]
     )
 
     operating_systems = (
         clicks.exclude(operating_system="")
         .values("operating_system")
-        .annotate(count=Count("id"))
+        .annotate(count=Sum("weight"))
         .order_by("-count")[:10]
     )
 
     referrers = (
         clicks.exclude(referrer="")
         .values("referrer")
-        .annotate(count=Count("id"))
+        .annotate(count=Sum("weight"))
         .order_by("-count")[:10]
     )
 
@@ -1,11 +1,16 @@
 from django.contrib import admin
 
+from sbily.utils.admin import ReplicaChangelistMixin
+
+from .models import BotClickCount
 from .models import LinkClick
+from .models import RepeatClickCount
+from .models import SampledClickCount
 from .models import ShortenedLink
 
 
 @admin.register(ShortenedLink)
-class ShortenedLinkAdmin(admin.ModelAdmin):
+class ShortenedLinkAdmin(ReplicaChangelistMixin):
     list_display = [
         "destination_url",
         "shortened_path",
@@ -19,7 +24,7 @@ class ShortenedLinkAdmin(admin.ModelAdmin):
 
 
 @admin.register(LinkClick)
-class LinkClickAdmin(admin.ModelAdmin):
+class LinkClickAdmin(ReplicaChangelistMixin):
     list_display = [
         "link",
         "clicked_at",
@@ -28,6 +33,8 @@ class LinkClickAdmin(admin.ModelAdmin):
         "browser",
         "device_type",
         "operating_system",
+        "weight",
+        "repeat_count",
     ]
     list_filter = [
         "clicked_at",
@@ -38,3 +45,11 @@ class LinkClickAdmin(admin.ModelAdmin):
         "operating_system",
     ]
     search_fields = ["link__destination_url", "ip_address", "referrer"]
+
+
+@admin.register(BotClickCount, RepeatClickCount, SampledClickCount)
+class DailyClickCountAdmin(ReplicaChangelistMixin):
+    list_display = ["link", "day", "count"]
+    list_filter = ["day"]
+    search_fields = ["link__shortened_path", "link__destination_url"]
+    date_hierarchy = "day"
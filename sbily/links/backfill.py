@@ -0,0 +1,320 @@
+"""
+Recover clicks lost by the redirect view from the Traefik access logs.
+
+Links are split in partitions processed by worker processes. Each worker
+streams every log, oldest first, in batches so memory stays flat whatever the
+size of the logs, and keeps the lines of its links. The requests of a visitor
+are then all de-duplicated by the same worker, in the order they were made.
+"""
+
+import bisect
+import gzip
+import ipaddress
+import json
+import re
+import zlib
+from collections import Counter
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import UTC
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from .bots import classify_click
+from .enrichment import ClickEvent
+from .enrichment import enrich_clicks
+from .enrichment import parse_user_agent
+from .models import LinkClick
+from .models import SampledClickCount
+from .models import ShortenedLink
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+CLF_TIME_FORMAT = "%d/%b/%Y:%H:%M:%S %z"
+# Traefik common log format, the fields after the user agent are ignored
+CLF_PATTERN = re.compile(
+    r'^(?P<ip>\S+) \S+ \S+ \[(?P<time>[^\]]+)\] "(?P<method>\S+) (?P<path>\S+)'
+    r' [^"]*" (?P<status>\d{3}) \S+ "(?P<referrer>[^"]*)" "(?P<user_agent>[^"]*)"',
+)
+
+
+@dataclass(slots=True)
+class LogEntry:
+    ip_address: str
+    time: datetime
+    method: str
+    path: str
+    status: int
+    referrer: str
+    user_agent: str
+    location: str | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class BackfillOptions:
+    batch_size: int = 5_000
+    # Seconds between the proxy logging a request and the view storing it
+    tolerance: int = 5
+    since: datetime | None = None
+    until: datetime | None = None
+    dry_run: bool = False
+    # Links are spread over this many workers
+    partitions: int = 1
+
+
+def read_lines(path: str) -> Iterator[bytes]:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as log:
+        yield from log
+
+
+def sort_log_files(paths: list[Path]) -> list[str]:
+    """Order logs by their first request, rotated logs before the live one."""
+
+    def first_request_at(path: Path) -> datetime:
+        for line in read_lines(str(path)):
+            if (entry := parse_line(line)) is not None:
+                return entry.time
+        return datetime.max.replace(tzinfo=UTC)
+
+    return [str(path) for path in sorted(paths, key=first_request_at)]
+
+
+def get_partition(shortened_path: str, partitions: int) -> int:
+    return zlib.crc32(shortened_path.encode()) % partitions
+
+
+def parse_line(line: bytes) -> LogEntry | None:
+    """Parse a Traefik JSON or common log format line."""
+    text = line.decode("utf-8", errors="replace").strip()
+    if not text:
+        return None
+
+    if text.startswith("{"):
+        try:
+            data = json.loads(text)
+            forwarded_for = data.get("request_X-Forwarded-For", "")
+            return LogEntry(
+                # The view keeps the first X-Forwarded-For address, Traefik
+                # adds the client address when there is none
+                ip_address=forwarded_for.split(",")[0].strip() or data["ClientHost"],
+                time=datetime.fromisoformat(data["StartUTC"]),
+                method=data["RequestMethod"],
+                path=data["RequestPath"],
+                status=int(data["DownstreamStatus"]),
+                referrer=data.get("request_Referer", ""),
+                user_agent=data.get("request_User-Agent", ""),
+                location=data.get("downstream_Location"),
+            )
+        except KeyError, ValueError:
+            return None
+
+    if match := CLF_PATTERN.match(text):
+        try:
+            time = datetime.strptime(match["time"], CLF_TIME_FORMAT)  # noqa: DTZ007
+        except ValueError:
+            return None
+        return LogEntry(
+            ip_address=match["ip"],
+            time=time,
+            method=match["method"],
+            path=match["path"],
+            status=int(match["status"]),
+            referrer="" if match["referrer"] == "-" else match["referrer"],
+            user_agent="" if match["user_agent"] == "-" else match["user_agent"],
+        )
+    return None
+
+
+def get_redirect_pattern() -> re.Pattern:
+    prefix = re.escape(getattr(settings, "LINK_PREFIX", "") or "")
+    return re.compile(rf"^/{prefix}(?P<shortened_path>[\w-]+)/(?:\?.*)?$")
+
+
+class Backfill:
+    """Turn the log entries of a partition into the clicks missing for them."""
+
+    def __init__(self, options: BackfillOptions, partition: int = 0):
+        self.options = options
+        self.partition = partition
+        self.stats = Counter()
+        self.redirect_pattern = get_redirect_pattern()
+        self.home_url = reverse("home")
+        # shortened_path -> (link id, de-duplication window, active), None if
+        # unknown
+        self.links: dict[str, tuple[int, int, bool] | None] = {}
+
+    def run(self, paths: list[str]) -> Counter:
+        """Backfill logs given in the order they were written."""
+        batch = []
+        for path in paths:
+            for line in read_lines(path):
+                if (entry := self.match(line)) is not None:
+                    batch.append(entry)
+                if len(batch) >= self.options.batch_size:
+                    self.process(batch)
+                    batch = []
+        if batch:
+            self.process(batch)
+        return self.stats
+
+    def match(self, line: bytes) -> tuple[str, LogEntry] | None:
+        # Lines not parsed are counted by each worker, count them once
+        counted = self.partition == 0
+        self.stats["lines"] += counted
+        entry = parse_line(line)
+        if entry is None:
+            self.stats["unparsed"] += counted
+            return None
+        if not self.in_range(entry):
+            return None
+        match = self.redirect_pattern.match(entry.path)
+        if match is None or not self.owns(match["shortened_path"]):
+            return None
+        try:
+            # Compare addresses the way the database stores them
+            entry.ip_address = str(ipaddress.ip_address(entry.ip_address))
+        except ValueError:
+            self.stats["unparsed"] += 1
+            return None
+        if classify_click(entry.ip_address, entry.user_agent):
+            self.stats["bots"] += 1
+            return None
+        return match["shortened_path"], entry
+
+    def owns(self, shortened_path: str) -> bool:
+        """Whether the link is backfilled by this worker."""
+        partition = get_partition(shortened_path, self.options.partitions)
+        return partition == self.partition
+
+    def in_range(self, entry: LogEntry) -> bool:
+        """Successful redirects in the backfilled period."""
+        # Missing and inactive links also redirect, but to the home page
+        if entry.method != "GET" or entry.status != 302:  # noqa: PLR2004
+            return False
+        if entry.location is not None and entry.location == self.home_url:
+            return False
+        if self.options.since and entry.time < self.options.since:
+            return False
+        return not (self.options.until and entry.time >= self.options.until)
+
+    def resolve_links(self, shortened_paths: set[str]) -> None:
+        unknown = shortened_paths - self.links.keys()
+        if not unknown:
+            return
+        self.links.update(dict.fromkeys(unknown))
+        for pk, shortened_path, window, is_active in ShortenedLink.objects.filter(
+            shortened_path__in=unknown,
+        ).values_list("pk", "shortened_path", "click_dedup_window", "is_active"):
+            self.links[shortened_path] = (
+                pk,
+                settings.CLICK_DEDUP_WINDOW if window is None else window,
+                is_active,
+            )
+
+    def process(self, batch: list[tuple[str, LogEntry]]) -> None:
+        self.resolve_links({shortened_path for shortened_path, _ in batch})
+        entries = []
+        for shortened_path, entry in batch:
+            if (link := self.links[shortened_path]) is None:
+                self.stats["unknown_links"] += 1
+                continue
+            link_id, window, is_active = link
+            # Without the Location of JSON logs, redirects of inactive links
+            # to the home page look like clicks
+            if entry.location is None and not is_active:
+                self.stats["inactive_links"] += 1
+                continue
+            entries.append((link_id, window, entry))
+        if not entries:
+            return
+        self.stats["matched"] += len(entries)
+
+        events = self.find_missing(entries)
+        self.stats["missing"] += len(events)
+        if events and not self.options.dry_run:
+            with transaction.atomic():
+                LinkClick.bulk_load(enrich_clicks(events))
+
+    def find_missing(self, entries: list[tuple[int, int, LogEntry]]) -> list:
+        """
+        Drop the entries stored as a click, within the tolerance, or collapsed
+        into one by the link de-duplication window, and the ones of days the
+        link was sampled, as their clicks are already counted.
+
+        Visitors are told apart by IP address and user agent like the redirect
+        does, clicks only keep the browser, system and device the user agent
+        was parsed into.
+        """
+        tolerance = timezone.timedelta(seconds=self.options.tolerance)
+        link_ids = {link_id for link_id, _, _ in entries}
+        max_window = timezone.timedelta(seconds=max(w for _, w, _ in entries))
+        first = min(entry.time for _, _, entry in entries) - max_window - tolerance
+        last = max(entry.time for _, _, entry in entries) + tolerance
+
+        seen = defaultdict(list)
+        for link_id, ip_address, *user_agent, clicked_at in LinkClick.objects.filter(
+            link_id__in=link_ids,
+            clicked_at__range=(first, last),
+        ).values_list(
+            "link_id",
+            "ip_address",
+            "browser",
+            "operating_system",
+            "device_type",
+            "clicked_at",
+        ):
+            seen[link_id, ip_address, *user_agent].append(clicked_at)
+        for times in seen.values():
+            times.sort()
+        sampled_days = set(
+            SampledClickCount.objects.filter(
+                link_id__in=link_ids,
+                day__range=(timezone.localdate(first), timezone.localdate(last)),
+            ).values_list("link_id", "day"),
+        )
+
+        user_agents = {
+            user_agent: parse_user_agent(user_agent)
+            for user_agent in {entry.user_agent for _, _, entry in entries}
+        }
+        events = []
+        for link_id, window, entry in sorted(entries, key=lambda item: item[2].time):
+            if (link_id, timezone.localdate(entry.time)) in sampled_days:
+                self.stats["sampled"] += 1
+                continue
+
+            times = seen[link_id, entry.ip_address, *user_agents[entry.user_agent]]
+            since = entry.time - timezone.timedelta(seconds=window) - tolerance
+            index = bisect.bisect_left(times, since)
+            if index < len(times) and times[index] <= entry.time + tolerance:
+                self.stats["duplicates"] += 1
+                continue
+
+            bisect.insort(times, entry.time)
+            events.append(
+                ClickEvent(
+                    link_id=link_id,
+                    ip_address=entry.ip_address,
+                    user_agent=entry.user_agent,
+                    referrer=entry.referrer,
+                    clicked_at=entry.time,
+                ),
+            )
+        return events
+
+
+def backfill_partition(
+    paths: list[str],
+    options: BackfillOptions,
+    partition: int = 0,
+) -> Counter:
+    """Entry point of the worker processes, started with `django.setup`."""
+    return Backfill(options, partition).run(paths)
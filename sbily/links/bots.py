@@ -0,0 +1,58 @@
+import functools
+import ipaddress
+import re
+
+from django.conf import settings
+from user_agents import parse
+
+# Link unfurlers, crawlers, uptime checkers and HTTP libraries. Matched before
+# the full user agent parse, which is much more expensive. Crawlers name
+# themselves "<name>bot" followed by a version or a comment, a bare "bot" is
+# also in human user agents such as CUBOT phones.
+KNOWN_BOT_PATTERN = re.compile(
+    r"\w+bot(?:[/-]|\s+\(|\s+\d)|crawl|spider|slurp|facebot|"
+    r"facebookexternalhit|facebookcatalog|embedly|quora link preview|"
+    r"skypeuripreview|whatsapp/|vkshare|pinterest/0\.|outbrain|nuzzel|"
+    r"google-inspectiontool|uptime|pingdom|statuscake|site24x7|"
+    r"headlesschrome|phantomjs|python-requests|python-urllib|aiohttp|httpx|"
+    r"go-http-client|okhttp|java/|curl/|wget/|libwww-perl|axios/|node-fetch",
+    re.IGNORECASE,
+)
+
+
+@functools.cache
+def get_bot_networks() -> tuple[ipaddress.IPv4Network | ipaddress.IPv6Network, ...]:
+    return tuple(
+        ipaddress.ip_network(network, strict=False)
+        for network in settings.CLICK_BOT_IP_RANGES
+    )
+
+
+@functools.lru_cache(maxsize=4096)
+def is_bot_user_agent(user_agent: str) -> bool:
+    """Classify a User-Agent header, cached as a few UAs make most traffic."""
+    if not user_agent:
+        return True
+    if KNOWN_BOT_PATTERN.search(user_agent):
+        return True
+    return parse(user_agent).is_bot
+
+
+def is_bot_ip(ip_address: str) -> bool:
+    networks = get_bot_networks()
+    if not networks or not ip_address:
+        return False
+    try:
+        address = ipaddress.ip_address(ip_address)
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
+
+
+def classify_click(ip_address: str, user_agent: str) -> str | None:
+    """Return why a click comes from a bot, or None for a human visitor."""
+    if is_bot_user_agent(user_agent):
+        return "user_agent"
+    if is_bot_ip(ip_address):
+        return "ip"
+    return None
@@ -0,0 +1,126 @@
+import functools
+import logging
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from django.contrib.gis.geoip2 import GeoIP2
+from django.utils import timezone
+from user_agents import parse
+
+from sbily.monitoring.metrics import track_enrichment
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from collections.abc import Sequence
+    from datetime import datetime
+
+logger = logging.getLogger("links.enrichment")
+
+UNKNOWN = "Unknown"
+COLUMNS = (
+    "link_id",
+    "clicked_at",
+    "ip_address",
+    "country",
+    "city",
+    "browser",
+    "device_type",
+    "operating_system",
+    "referrer",
+    "weight",
+)
+
+
+@dataclass(slots=True)
+class ClickEvent:
+    """A raw click, as seen by the redirect or read back from logs."""
+
+    link_id: int
+    ip_address: str = ""
+    user_agent: str = ""
+    referrer: str = ""
+    clicked_at: datetime | None = None
+    weight: int = 1
+
+
+@functools.cache
+def get_geoip() -> GeoIP2:
+    # The reader memory-maps the database, open it once per process
+    return GeoIP2()
+
+
+def parse_user_agent(user_agent_string: str) -> tuple[str, str, str]:
+    """Return the browser, operating system and device type of a UA."""
+    user_agent = parse(user_agent_string)
+
+    if user_agent.is_mobile:
+        device_type = "mobile"
+    elif user_agent.is_tablet:
+        device_type = "tablet"
+    elif user_agent.is_pc:
+        device_type = "desktop"
+    else:
+        device_type = "other"
+
+    return user_agent.get_browser(), user_agent.get_os(), device_type
+
+
+def lookup_locations(ip_addresses: Iterable[str]) -> dict[str, tuple[str, str]]:
+    """Return the country and city of each IP address that could be located."""
+    try:
+        geoip = get_geoip()
+    except Exception as e:
+        logger.exception("Error getting geo data.", exc_info=e)
+        return {}
+
+    locations = {}
+    for ip_address in ip_addresses:
+        try:
+            geo_data = geoip.city(ip_address)
+        # Private and unknown addresses raise geoip2 errors, skip them
+        except Exception as e:  # noqa: BLE001
+            logger.warning("No geo data for %s: %s", ip_address, e)
+            continue
+        locations[ip_address] = (
+            geo_data.get("country_name") or "",
+            geo_data.get("city") or "",
+        )
+    return locations
+
+
+def enrich_clicks(events: Sequence[ClickEvent]) -> dict[str, list]:
+    """
+    Enrich click events with user agent and GeoIP data, parsing every distinct
+    UA and locating every distinct IP address only once.
+
+    Returns one list per name in `COLUMNS`, aligned with `events`, ready to
+    build `LinkClick` rows or to feed a COPY. Events without a timestamp are
+    dated now.
+    """
+    now = timezone.now()
+    with track_enrichment("user_agent"):
+        user_agents = {
+            user_agent: parse_user_agent(user_agent)
+            for user_agent in {event.user_agent for event in events}
+        }
+    with track_enrichment("geoip"):
+        locations = lookup_locations(
+            {event.ip_address for event in events if event.ip_address},
+        )
+
+    columns = {name: [] for name in COLUMNS}
+    for event in events:
+        browser, operating_system, device_type = user_agents[event.user_agent]
+        country, city = locations.get(event.ip_address, (UNKNOWN, UNKNOWN))
+
+        columns["link_id"].append(event.link_id)
+        columns["clicked_at"].append(event.clicked_at or now)
+        columns["ip_address"].append(event.ip_address or None)
+        columns["country"].append(country)
+        columns["city"].append(city)
+        columns["browser"].append(browser)
+        columns["device_type"].append(device_type)
+        columns["operating_system"].append(operating_system)
+        columns["referrer"].append(event.referrer)
+        columns["weight"].append(event.weight)
+    return columns
@@ -0,0 +1,67 @@
+"""Link resolution for redirects, from the snapshot, the cache or the database."""
+
+import functools
+
+from django.conf import settings
+
+from sbily.utils.cache import delete_on_commit
+from sbily.utils.cache import get_or_load
+from sbily.utils.db import use_replica
+
+from .models import ShortenedLink
+from .snapshot import get_snapshot_link
+from .snapshot import publish_link_edits
+
+LINK_CACHE_KEY = "links:link:{shortened_path}"
+# What redirects and their clicks read from a link
+LINK_FIELDS = (
+    "id",
+    "shortened_path",
+    "destination_url",
+    "expires_at",
+    "is_active",
+    "click_dedup_window",
+)
+
+
+def _load_link(shortened_path: str) -> dict | None:
+    with use_replica(f"link:{shortened_path}"):
+        return (
+            ShortenedLink.objects.filter(shortened_path=shortened_path)
+            .values(*LINK_FIELDS)
+            .first()
+        )
+
+
+def get_link(shortened_path: str) -> ShortenedLink:
+    """
+    Return the link of a redirect, only partially loaded. Paths the snapshot
+    filter has never seen are turned away without a query, and missing links
+    are cached for a short while, until a link takes their path.
+
+    Raises:
+        ShortenedLink.DoesNotExist: No link has this path.
+    """
+    if (link := get_snapshot_link(shortened_path)) is not None:
+        return link
+
+    fields = get_or_load(
+        LINK_CACHE_KEY.format(shortened_path=shortened_path),
+        functools.partial(_load_link, shortened_path),
+        settings.LINK_CACHE_TIMEOUT,
+        name="link",
+        # Kept short, scanners try many paths once
+        missing_timeout=settings.LINK_MISSING_CACHE_TIMEOUT,
+    )
+    if fields is None:
+        raise ShortenedLink.DoesNotExist
+    return ShortenedLink(**fields)
+
+
+def invalidate_links(*shortened_paths: str | None) -> None:
+    """Forget cached and snapshot links once their edit is committed."""
+    paths = [path for path in shortened_paths if path]
+    delete_on_commit(
+        *(LINK_CACHE_KEY.format(shortened_path=path) for path in paths),
+    )
+    publish_link_edits(*paths)
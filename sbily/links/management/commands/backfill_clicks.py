@@ -0,0 +1,114 @@
+import multiprocessing
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from sbily.links.backfill import BackfillOptions
+from sbily.links.backfill import backfill_partition
+from sbily.links.backfill import sort_log_files
+
+
+def parse_aware_datetime(value: str):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        msg = f"Invalid date and time: {value}"
+        raise ValueError(msg)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill clicks missing from the database out of Traefik access logs "
+        "(JSON or common log format, optionally gzipped)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", type=Path)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help=(
+                "Worker processes, each one backfilling a share of the links. "
+                "1 processes the logs in this process."
+            ),
+        )
+        parser.add_argument("--batch-size", type=int, default=5_000)
+        parser.add_argument(
+            "--tolerance",
+            type=int,
+            default=5,
+            help="Seconds a stored click may lag behind the logged request.",
+        )
+        parser.add_argument("--since", type=parse_aware_datetime)
+        parser.add_argument("--until", type=parse_aware_datetime)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Count the missing clicks without storing them.",
+        )
+
+    def handle(self, *args, **options):
+        missing = [str(path) for path in options["paths"] if not path.is_file()]
+        if missing:
+            msg = f"Log files not found: {', '.join(missing)}"
+            raise CommandError(msg)
+
+        workers = max(1, options["workers"])
+        backfill_options = BackfillOptions(
+            batch_size=options["batch_size"],
+            tolerance=options["tolerance"],
+            since=options["since"],
+            until=options["until"],
+            dry_run=options["dry_run"],
+            partitions=workers,
+        )
+        # Rotated logs first, so the requests of a visitor are de-duplicated
+        # in the order they were made
+        paths = sort_log_files(options["paths"])
+        stats = Counter()
+
+        if workers == 1:
+            stats.update(backfill_partition(paths, backfill_options))
+        else:
+            # Workers open their own connections, don't share ours with them
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=django.setup,
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        backfill_partition,
+                        paths,
+                        backfill_options,
+                        partition,
+                    )
+                    for partition in range(workers)
+                ]
+                for future in as_completed(futures):
+                    stats.update(future.result())
+
+        action = "would be backfilled" if options["dry_run"] else "backfilled"
+        self.stdout.write(
+            f"{stats['lines']} lines, {stats['unparsed']} unparsed, "
+            f"{stats['bots']} bots, {stats['unknown_links']} unknown links, "
+            f"{stats['inactive_links']} inactive links, "
+            f"{stats['matched']} link redirects: {stats['duplicates']} already "
+            f"stored, {stats['sampled']} on sampled days.",
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"{stats['missing']} missing clicks {action}."),
+        )
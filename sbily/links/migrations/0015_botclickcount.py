@@ -0,0 +1,29 @@
+# Generated by Django 6.0.6 on 2026-10-19 17:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('links', '0014_make_destination_url_required'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BotClickCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True, verbose_name='Day')),
+                ('count', models.PositiveIntegerField(default=0, help_text='Requests from bots and crawlers on this day', verbose_name='Count')),
+                ('link', models.ForeignKey(help_text='The shortened link that was requested', on_delete=django.db.models.deletion.CASCADE, related_name='bot_clicks', to='links.shortenedlink')),
+            ],
+            options={
+                'verbose_name': 'Bot Click Count',
+                'verbose_name_plural': 'Bot Click Counts',
+                'ordering': ['-day'],
+                'constraints': [models.UniqueConstraint(fields=('link', 'day'), name='unique_link_bot_click_day')],
+            },
+        ),
+    ]
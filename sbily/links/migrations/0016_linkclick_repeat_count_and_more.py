@@ -0,0 +1,23 @@
+# Generated by Django 6.0.6 on 2026-10-19 17:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('links', '0015_botclickcount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='linkclick',
+            name='repeat_count',
+            field=models.PositiveIntegerField(default=0, help_text='Repeated clicks of the visitor collapsed into this one', verbose_name='Repeat Count'),
+        ),
+        migrations.AddField(
+            model_name='shortenedlink',
+            name='click_dedup_window',
+            field=models.PositiveIntegerField(blank=True, help_text='Seconds during which repeated clicks of a visitor count as one, empty uses the default and 0 records every click', null=True, verbose_name='Click De-duplication Window'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.6 on 2026-10-19 17:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('links', '0016_linkclick_repeat_count_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='linkclick',
+            name='weight',
+            field=models.PositiveIntegerField(default=1, help_text='Clicks this one stands for when the link is sampled', verbose_name='Weight'),
+        ),
+        migrations.CreateModel(
+            name='SampledClickCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True, verbose_name='Day')),
+                ('count', models.PositiveIntegerField(default=0, help_text='Clicks on this day left out of the stored sample', verbose_name='Count')),
+                ('link', models.ForeignKey(help_text='The shortened link that was clicked', on_delete=django.db.models.deletion.CASCADE, related_name='sampled_clicks', to='links.shortenedlink')),
+            ],
+            options={
+                'verbose_name': 'Sampled Click Count',
+                'verbose_name_plural': 'Sampled Click Counts',
+                'ordering': ['-day'],
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('link', 'day'), name='unique_link_sampled_click_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.6 on 2026-10-19 17:15
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('links', '0017_linkclick_weight_sampledclickcount'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='linkclick',
+            name='clicked_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False, help_text='When this link was clicked', verbose_name='Clicked At'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.6 on 2026-10-19 17:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('links', '0018_alter_linkclick_clicked_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RepeatClickCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True, verbose_name='Day')),
+                ('count', models.PositiveIntegerField(default=0, help_text='Repeated clicks on this day of visitors without a stored click', verbose_name='Count')),
+                ('link', models.ForeignKey(help_text='The shortened link that was clicked', on_delete=django.db.models.deletion.CASCADE, related_name='repeat_clicks', to='links.shortenedlink')),
+            ],
+            options={
+                'verbose_name': 'Repeat Click Count',
+                'verbose_name_plural': 'Repeat Click Counts',
+                'ordering': ['-day'],
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('link', 'day'), name='unique_link_repeat_click_day')],
+            },
+        ),
+    ]
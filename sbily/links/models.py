@@ -1,24 +1,38 @@
+import hashlib
 import logging
+import math
+import random
 import secrets
+import time
 from typing import TYPE_CHECKING
 from urllib.parse import urljoin
 
 from django.conf import settings
-from django.contrib.gis.geoip2 import GeoIP2
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
 from django.db import IntegrityError
+from django.db import connections
 from django.db import models
 from django.db import transaction
+from django.db.models import F
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.timesince import timesince
 from django.utils.translation import gettext_lazy as _
-from user_agents import parse
 
+from sbily.monitoring.metrics import BOT_CLICKS
 from sbily.users.models import User
+from sbily.utils.db import pin_to_primary
+from sbily.utils.http import get_client_ip
+
+from .bots import classify_click
+from .enrichment import ClickEvent
+from .enrichment import enrich_clicks
 
 if TYPE_CHECKING:
+    from datetime import date
+
     from django.http import HttpRequest
 
 SITE_BASE_URL = getattr(settings, "BASE_URL", "")
@@ -103,6 +117,15 @@ class ShortenedLink(models.Model):
         related_name="shortened_links",
         help_text=_("User who created this shortened link"),
     )
+    click_dedup_window = models.PositiveIntegerField(
+        _("Click De-duplication Window"),
+        null=True,
+        blank=True,
+        help_text=_(
+            "Seconds during which repeated clicks of a visitor count as one, "
+            "empty uses the default and 0 records every click",
+        ),
+    )
 
     class Meta:
         verbose_name = _("Shortened Link")
@@ -117,6 +140,8 @@ class ShortenedLink(models.Model):
 
     @transaction.atomic
     def save(self, *args, **kwargs) -> None:
+        from .lookup import invalidate_links  # noqa: PLC0415
+
         if self.expires_at:
             current_timezone = timezone.get_current_timezone()
             self.expires_at = self.expires_at.replace(tzinfo=current_timezone)
@@ -128,12 +153,21 @@ class ShortenedLink(models.Model):
             self.user.monthly_limit_links_used += 1
             self.user.save(update_fields=["monthly_limit_links_used"])
         super().save(*args, **kwargs)
+        pin_to_primary(f"user:{self.user_id}", f"link:{self.shortened_path}")
+        invalidate_links(self.shortened_path)
 
     def get_absolute_url(self) -> str:
         """Returns the absolute URL for this shortened link"""
         path = reverse("redirect_link", kwargs={"shortened_path": self.shortened_path})
         return urljoin(SITE_BASE_URL, path)
 
+    def delete(self, *args, **kwargs):
+        from .lookup import invalidate_links  # noqa: PLC0415
+
+        pin_to_primary(f"user:{self.user_id}", f"link:{self.shortened_path}")
+        invalidate_links(self.shortened_path)
+        return super().delete(*args, **kwargs)
+
     def clean(self) -> None:
         super().clean()
         if self.pk is None and not self.user.can_create_link():
@@ -167,6 +201,11 @@ class ShortenedLink(models.Model):
                         ).format(self.MAX_RETRIES),
                     ) from e
 
+    def get_click_dedup_window(self) -> int:
+        if self.click_dedup_window is None:
+            return settings.CLICK_DEDUP_WINDOW
+        return self.click_dedup_window
+
     def is_expired(self) -> bool:
         """Check if the link has expired based on expires_at timestamp"""
         return bool(self.expires_at and self.expires_at <= timezone.now())
@@ -196,7 +235,8 @@ class LinkClick(models.Model):
     )
     clicked_at = models.DateTimeField(
         _("Clicked At"),
-        auto_now_add=True,
+        default=timezone.now,
+        editable=False,
         db_index=True,
         help_text=_("When this link was clicked"),
     )
@@ -242,6 +282,16 @@ class LinkClick(models.Model):
         blank=True,
         help_text=_("Website that referred the visitor"),
     )
+    weight = models.PositiveIntegerField(
+        _("Weight"),
+        default=1,
+        help_text=_("Clicks this one stands for when the link is sampled"),
+    )
+    repeat_count = models.PositiveIntegerField(
+        _("Repeat Count"),
+        default=0,
+        help_text=_("Repeated clicks of the visitor collapsed into this one"),
+    )
 
     class Meta:
         verbose_name = _("Link Click")
@@ -259,53 +309,243 @@ class LinkClick(models.Model):
 
     @classmethod
     def create_from_request(cls, link: ShortenedLink, request: HttpRequest):
-        """Create a new LinkClick instance from a request object"""
+        """
+        Create a new LinkClick instance from a request object.
+        Bots, repeats and clicks left out of the sample of a hot link are only
+        counted, None is returned for them.
+        """
         headers = request.headers
-        x_forwarded_for = headers.get("X-Forwarded-For")
-        ip_address = (
-            x_forwarded_for.split(",")[0]
-            if x_forwarded_for
-            else request.META.get("REMOTE_ADDR", "")
+        ip_address = get_client_ip(request)
+        user_agent_string = headers.get("User-Agent", "")
+
+        # Skip the enrichment of link previews, crawlers and uptime checks
+        if reason := classify_click(ip_address, user_agent_string):
+            BOT_CLICKS.inc(reason=reason)
+            BotClickCount.increment(link.pk)
+            return None
+
+        if cls._collapse_repeat(link, ip_address, user_agent_string):
+            return None
+
+        weight = cls._get_sampling_rate(link)
+        if weight > 1 and random.randrange(weight):  # noqa: S311
+            SampledClickCount.increment(link.pk)
+            return None
+
+        columns = enrich_clicks(
+            [
+                ClickEvent(
+                    link_id=link.pk,
+                    ip_address=ip_address,
+                    user_agent=user_agent_string,
+                    referrer=headers.get("Referer", ""),
+                    weight=weight,
+                ),
+            ],
         )
+        (click,) = cls.from_columns(columns)
+        click.link = link
+        click.save(force_insert=True)
+        if window := link.get_click_dedup_window():
+            # Let repeats within the window find the click they belong to
+            cache.set(
+                cls._dedup_key(link, ip_address, user_agent_string),
+                click.pk,
+                timeout=window,
+            )
+        return click
 
-        # Get referrer
-        referrer = headers.get("Referer", "")
+    @classmethod
+    def from_columns(cls, columns: dict[str, list]) -> list[LinkClick]:
+        """Build unsaved clicks from `enrich_clicks` columns for bulk_create."""
+        return [
+            cls(**dict(zip(columns, row, strict=True)))
+            for row in zip(*columns.values(), strict=True)
+        ]
 
-        user_agent_string = headers.get("User-Agent", "")
-        # Parse user agent
-        user_agent = parse(user_agent_string)
-        browser = user_agent.get_browser()
-        operating_system = user_agent.get_os()
-
-        if user_agent.is_mobile:
-            device_type = "mobile"
-        elif user_agent.is_tablet:
-            device_type = "tablet"
-        elif user_agent.is_pc:
-            device_type = "desktop"
-        else:
-            device_type = "other"
-
-        # Get country and city info
-        country = "Unknown"
-        city = "Unknown"
-
-        if ip_address:
-            try:
-                g = GeoIP2()
-                geo_data = g.city(ip_address)
-                country = geo_data.get("country_name")
-                city = geo_data.get("city")
-            except Exception as e:
-                logger.exception("Error getting geo data.", exc_info=e)
-
-        return cls.objects.create(
-            link=link,
-            ip_address=ip_address,
-            country=country,
-            city=city,
-            browser=browser,
-            device_type=device_type,
-            operating_system=operating_system,
-            referrer=referrer,
+    @classmethod
+    def bulk_load(cls, columns: dict[str, list], using: str = "default") -> None:
+        """Insert clicks given as columns, streamed through COPY on PostgreSQL."""
+        connection = connections[using]
+        if connection.vendor != "postgresql":
+            cls.objects.using(using).bulk_create(
+                cls.from_columns(columns),
+                batch_size=5_000,
+            )
+            return
+
+        columns = {"repeat_count": [0] * len(columns["link_id"]), **columns}
+        with (
+            connection.cursor() as cursor,
+            cursor.cursor.copy(
+                f"COPY {cls._meta.db_table} ({', '.join(columns)}) FROM STDIN",
+            ) as copy,
+        ):
+            for row in zip(*columns.values(), strict=True):
+                copy.write_row(row)
+
+    @staticmethod
+    def _get_sampling_rate(link: ShortenedLink) -> int:
+        """
+        Return N to store 1 in N clicks of the link. N grows with the clicks
+        of the current minute once they pass CLICK_SAMPLING_THRESHOLD, so a
+        viral link stores about that many full clicks per minute.
+        """
+        threshold = settings.CLICK_SAMPLING_THRESHOLD
+        if not threshold:
+            return 1
+
+        key = f"clicks:rate:{link.pk}:{int(time.time() // 60)}"
+        cache.add(key, 0, timeout=120)
+        try:
+            rate = cache.incr(key)
+        except ValueError:
+            # Expired between add and incr
+            return 1
+        return max(1, math.ceil(rate / threshold))
+
+    @staticmethod
+    def _dedup_key(link: ShortenedLink, ip_address: str, user_agent: str) -> str:
+        visitor = hashlib.sha1(
+            f"{ip_address}|{user_agent}".encode(),
+            usedforsecurity=False,
+        ).hexdigest()
+        return f"clicks:dedup:{link.pk}:{visitor}"
+
+    @classmethod
+    def _collapse_repeat(
+        cls,
+        link: ShortenedLink,
+        ip_address: str,
+        user_agent: str,
+    ) -> bool:
+        """
+        Claim the visitor's de-duplication window for this link (SET NX EX on
+        Redis). When it is already taken the click is a repeat (double
+        clicks, prefetching) and only increments the first click's counter,
+        or the link's daily repeat counter when that click has no row.
+        """
+        window = link.get_click_dedup_window()
+        if not window:
+            return False
+
+        key = cls._dedup_key(link, ip_address, user_agent)
+        if cache.add(key, None, timeout=window):
+            return False
+
+        # None while the first click is being enriched, or for good when it
+        # was sampled out or could not be saved
+        if not (click_pk := cache.get(key)) or not cls.objects.filter(
+            pk=click_pk,
+        ).update(repeat_count=F("repeat_count") + 1):
+            RepeatClickCount.increment(link.pk)
+        return True
+
+
+class DailyClickCount(models.Model):
+    """Per-link daily counter of clicks that are not stored as a LinkClick."""
+
+    day = models.DateField(_("Day"), db_index=True)
+
+    class Meta:
+        abstract = True
+        ordering = ["-day"]
+
+    @classmethod
+    def increment(cls, link_id: int, day: date | None = None, count: int = 1) -> None:
+        day = day or timezone.localdate()
+        counts = cls.objects.filter(link_id=link_id, day=day)
+        if counts.update(count=F("count") + count):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(link_id=link_id, day=day, count=count)
+        except IntegrityError:
+            # Another request created the day's row first
+            counts.update(count=F("count") + count)
+
+
+class BotClickCount(DailyClickCount):
+    link = models.ForeignKey(
+        ShortenedLink,
+        on_delete=models.CASCADE,
+        related_name="bot_clicks",
+        help_text=_("The shortened link that was requested"),
+    )
+    count = models.PositiveIntegerField(
+        _("Count"),
+        default=0,
+        help_text=_("Requests from bots and crawlers on this day"),
+    )
+
+    class Meta(DailyClickCount.Meta):
+        verbose_name = _("Bot Click Count")
+        verbose_name_plural = _("Bot Click Counts")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["link", "day"],
+                name="unique_link_bot_click_day",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.count} bot clicks on {self.link.shortened_path} on {self.day}"
+
+
+class SampledClickCount(DailyClickCount):
+    link = models.ForeignKey(
+        ShortenedLink,
+        on_delete=models.CASCADE,
+        related_name="sampled_clicks",
+        help_text=_("The shortened link that was clicked"),
+    )
+    count = models.PositiveIntegerField(
+        _("Count"),
+        default=0,
+        help_text=_("Clicks on this day left out of the stored sample"),
+    )
+
+    class Meta(DailyClickCount.Meta):
+        verbose_name = _("Sampled Click Count")
+        verbose_name_plural = _("Sampled Click Counts")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["link", "day"],
+                name="unique_link_sampled_click_day",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return (
+            f"{self.count} sampled out clicks on {self.link.shortened_path} "
+            f"on {self.day}"
+        )
+
+
+class RepeatClickCount(DailyClickCount):
+    link = models.ForeignKey(
+        ShortenedLink,
+        on_delete=models.CASCADE,
+        related_name="repeat_clicks",
+        help_text=_("The shortened link that was clicked"),
+    )
+    count = models.PositiveIntegerField(
+        _("Count"),
+        default=0,
+        help_text=_("Repeated clicks on this day of visitors without a stored click"),
+    )
+
+    class Meta(DailyClickCount.Meta):
+        verbose_name = _("Repeat Click Count")
+        verbose_name_plural = _("Repeat Click Counts")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["link", "day"],
+                name="unique_link_repeat_click_day",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return (
+            f"{self.count} repeated clicks on {self.link.shortened_path} on {self.day}"
         )
@@ -0,0 +1,19 @@
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from sbily.users.models import User
+
+from .lookup import invalidate_links
+from .models import ShortenedLink
+
+
+@receiver(pre_delete, sender=User)
+def invalidate_user_links(sender, instance: User, **kwargs):
+    # Cascaded deletes skip ShortenedLink.delete, the links of a deleted
+    # account would keep redirecting from the snapshot and the cache
+    invalidate_links(
+        *ShortenedLink.objects.filter(user=instance).values_list(
+            "shortened_path",
+            flat=True,
+        ),
+    )
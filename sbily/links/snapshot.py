@@ -0,0 +1,410 @@
+"""
+Compiled snapshot of the active links, resolving redirects without a query.
+
+The `export_link_snapshot` task writes every active, unexpired link to
+`LINK_SNAPSHOT_PATH`: a header, fixed-width index entries sorted by shortened
+path, a Bloom filter of every existing path and a blob of destination URLs.
+Web workers map the file read-only, shared through the page cache, resolve a
+path with a binary search over the index and turn away paths the filter has
+never seen without querying the database.
+
+Links edited since the export are published on a Redis channel and recorded
+in a Redis sorted set, which a listener thread of every worker replays when
+it subscribes. Those paths are resolved from the database until a snapshot
+taken after the edit is loaded, as is anything missing from the snapshot.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from datetime import UTC
+from datetime import datetime
+from pathlib import Path
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from sbily.monitoring.metrics import LINK_SNAPSHOT_LOOKUPS
+
+from .models import ShortenedLink
+
+logger = logging.getLogger("links.snapshot")
+
+MAGIC = b"SBLS"
+VERSION = 2
+# Magic, version, key size, entry count, export time, and filter size in bits
+# and hash count
+HEADER = struct.Struct("<4sHHIdQH")
+# Link id, expiry timestamp (0 for none), de-duplication window (-1 for the
+# default), destination URL offset in the blob and length, after the key
+ENTRY_FIELDS = "QdiIH"
+DELTA_CHANNEL = "links:snapshot:edits"
+DELTA_KEY = "links:snapshot:edited"
+# Edits this long before an export are assumed to be in it, covering the
+# clock skew between containers
+CLOCK_SKEW_MARGIN = 60
+LISTENER_RETRY_DELAY = 5
+
+
+@dataclass(frozen=True, slots=True)
+class LinkTarget:
+    link_id: int
+    destination_url: str
+    expires_at: float | None
+    click_dedup_window: int | None
+
+    def to_link(self, shortened_path: str) -> ShortenedLink:
+        """An unsaved link carrying what the redirect and its click need."""
+        return ShortenedLink(
+            pk=self.link_id,
+            shortened_path=shortened_path,
+            destination_url=self.destination_url,
+            expires_at=(
+                datetime.fromtimestamp(self.expires_at, UTC)
+                if self.expires_at is not None
+                else None
+            ),
+            is_active=True,
+            click_dedup_window=self.click_dedup_window,
+        )
+
+
+def get_filter_hashes(key: bytes) -> tuple[int, int]:
+    """Two independent hashes, combined into the k hashes of the filter."""
+    digest = hashlib.blake2b(key, digest_size=16).digest()
+    first = int.from_bytes(digest[:8], "little")
+    # Odd, so the combined hashes don't cycle over a subset of the bits
+    second = int.from_bytes(digest[8:], "little") | 1
+    return first, second
+
+
+def build_filter(keys: list[bytes], false_positive_rate: float) -> tuple[bytes, int]:
+    """Return the bits and hash count of a Bloom filter of `keys`."""
+    count = max(len(keys), 1)
+    size = max(64, math.ceil(-count * math.log(false_positive_rate) / math.log(2) ** 2))
+    # Whole bytes, the file records the size in bits
+    size = math.ceil(size / 8) * 8
+    hashes = max(1, round(size / count * math.log(2)))
+    bits = bytearray(size // 8)
+    for key in keys:
+        first, second = get_filter_hashes(key)
+        for index in range(hashes):
+            bit = (first + index * second) % size
+            bits[bit >> 3] |= 1 << (bit & 7)
+    return bytes(bits), hashes
+
+
+def get_redis() -> redis.Redis:
+    options = {"ssl_cert_reqs": "none"} if settings.REDIS_SSL else {}
+    return redis.Redis.from_url(settings.REDIS_URL, **options)
+
+
+def export_snapshot(path: Path) -> int:
+    """Write the active links to `path` atomically, return their count."""
+    generated_at = time.time()
+    now = timezone.now()
+    key_size = ShortenedLink.SHORTENED_PATH_MAX_LENGTH
+    entry = struct.Struct(f"<{key_size}s{ENTRY_FIELDS}")
+
+    keys = []
+    entries = []
+    blob = bytearray()
+    for shortened_path, pk, destination_url, expires_at, is_active, window in (
+        ShortenedLink.objects.filter(shortened_path__isnull=False)
+        .order_by()
+        .values_list(
+            "shortened_path",
+            "pk",
+            "destination_url",
+            "expires_at",
+            "is_active",
+            "click_dedup_window",
+        )
+        .iterator(chunk_size=10_000)
+    ):
+        # Inactive and expired links still have a page, only the filter has them
+        key = shortened_path.encode()
+        keys.append(key)
+        if not is_active or (expires_at and expires_at <= now):
+            continue
+
+        url = destination_url.encode()
+        entries.append(
+            (
+                key.ljust(key_size, b"\0"),
+                pk,
+                expires_at.timestamp() if expires_at else 0,
+                -1 if window is None else window,
+                len(blob),
+                len(url),
+            ),
+        )
+        blob += url
+    entries.sort()
+    path_filter, filter_hashes = build_filter(
+        keys,
+        settings.LINK_FILTER_FALSE_POSITIVE_RATE,
+    )
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with temporary.open("wb") as snapshot:
+        snapshot.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                key_size,
+                len(entries),
+                generated_at,
+                len(path_filter) * 8,
+                filter_hashes,
+            ),
+        )
+        for values in entries:
+            snapshot.write(entry.pack(*values))
+        snapshot.write(path_filter)
+        snapshot.write(blob)
+        snapshot.flush()
+        os.fsync(snapshot.fileno())
+    # Workers keep reading the previous file until they map the new one
+    temporary.replace(path)
+
+    # Edits older than this snapshot no longer need replaying
+    get_redis().zremrangebyscore(DELTA_KEY, "-inf", generated_at - CLOCK_SKEW_MARGIN)
+    return len(entries)
+
+
+class LinkSnapshot:
+    """A read-only mapping of a snapshot file."""
+
+    def __init__(self, path: Path):
+        with path.open("rb") as snapshot:
+            self.buffer = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            version,
+            self.key_size,
+            self.count,
+            self.generated_at,
+            self.filter_size,
+            self.filter_hashes,
+        ) = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or version != VERSION:
+            msg = f"{path} is not a version {VERSION} link snapshot."
+            raise ValueError(msg)
+        self.entry = struct.Struct(f"<{self.key_size}s{ENTRY_FIELDS}")
+        self.filter_offset = HEADER.size + self.count * self.entry.size
+        self.blob_offset = self.filter_offset + self.filter_size // 8
+
+    def might_exist(self, shortened_path: str) -> bool:
+        """False only for paths no link had when the snapshot was exported."""
+        key = shortened_path.encode()
+        if len(key) > self.key_size:
+            return False
+        first, second = get_filter_hashes(key)
+        buffer, offset, size = self.buffer, self.filter_offset, self.filter_size
+        for index in range(self.filter_hashes):
+            bit = (first + index * second) % size
+            if not buffer[offset + (bit >> 3)] & (1 << (bit & 7)):
+                return False
+        return True
+
+    def get(self, shortened_path: str) -> LinkTarget | None:
+        key = shortened_path.encode()
+        if len(key) > self.key_size:
+            return None
+        key = key.ljust(self.key_size, b"\0")
+
+        buffer, size, key_size = self.buffer, self.entry.size, self.key_size
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            offset = HEADER.size + middle * size
+            current = buffer[offset : offset + key_size]
+            if current < key:
+                low = middle + 1
+            elif current > key:
+                high = middle
+            else:
+                _, link_id, expires_at, window, url_offset, url_length = (
+                    self.entry.unpack_from(buffer, offset)
+                )
+                start = self.blob_offset + url_offset
+                return LinkTarget(
+                    link_id=link_id,
+                    destination_url=buffer[start : start + url_length].decode(),
+                    expires_at=expires_at or None,
+                    click_dedup_window=None if window < 0 else window,
+                )
+        return None
+
+
+class SnapshotResolver:
+    """
+    The snapshot of the current process, remapped when a new one is exported,
+    and the paths edited since it was exported.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self._lock = threading.Lock()
+        self._snapshot: LinkSnapshot | None = None
+        self._file_id: tuple[int, int] | None = None
+        self._checked_at = float("-inf")
+        # shortened_path -> time of its last edit
+        self._edited: dict[str, float] = {}
+        self._listener: threading.Thread | None = None
+        self._listening = False
+
+    def resolve(self, shortened_path: str) -> LinkTarget | None:
+        """
+        The target of an active link, None when the database must decide.
+
+        Raises:
+            ShortenedLink.DoesNotExist: No link has this path.
+        """
+        if not settings.LINK_SNAPSHOT_PATH:
+            return None
+        if self._listener is None:
+            self._start_listener()
+        if time.monotonic() - self._checked_at >= settings.LINK_SNAPSHOT_CHECK_INTERVAL:
+            self._refresh()
+
+        snapshot = self._snapshot
+        # Without the edits channel the snapshot may be stale
+        if snapshot is None or not self._listening or shortened_path in self._edited:
+            LINK_SNAPSHOT_LOOKUPS.inc(result="bypass")
+            return None
+        if not snapshot.might_exist(shortened_path):
+            LINK_SNAPSHOT_LOOKUPS.inc(result="filtered")
+            raise ShortenedLink.DoesNotExist
+        target = snapshot.get(shortened_path)
+        # Expired since the export, the database renders the expired page
+        if target is None or (target.expires_at and target.expires_at <= time.time()):
+            LINK_SNAPSHOT_LOOKUPS.inc(result="miss")
+            return None
+        LINK_SNAPSHOT_LOOKUPS.inc(result="hit")
+        return target
+
+    def _refresh(self) -> None:
+        with self._lock:
+            if (
+                time.monotonic() - self._checked_at
+                < settings.LINK_SNAPSHOT_CHECK_INTERVAL
+            ):
+                return
+            self._checked_at = time.monotonic()
+            path = Path(settings.LINK_SNAPSHOT_PATH)
+            try:
+                stat = path.stat()
+                file_id = (stat.st_ino, stat.st_mtime_ns)
+                if file_id == self._file_id:
+                    return
+                snapshot = LinkSnapshot(path)
+            except FileNotFoundError:
+                return
+            except (OSError, ValueError, struct.error) as e:
+                logger.warning("Error loading the link snapshot: %s", e)
+                return
+
+            # The mapping being replaced is closed once no lookup uses it
+            self._snapshot, self._file_id = snapshot, file_id
+            reflected_before = snapshot.generated_at - CLOCK_SKEW_MARGIN
+            self._edited = {
+                shortened_path: edited_at
+                for shortened_path, edited_at in self._edited.items()
+                if edited_at >= reflected_before
+            }
+
+    def _start_listener(self) -> None:
+        with self._lock:
+            if self._listener is not None:
+                return
+            self._listener = threading.Thread(
+                target=self._listen,
+                name="link-snapshot-edits",
+                daemon=True,
+            )
+            self._listener.start()
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                client = get_redis()
+                pubsub = client.pubsub()
+                pubsub.subscribe(DELTA_CHANNEL)
+                for message in pubsub.listen():
+                    if message["type"] == "subscribe":
+                        # Catch up with the edits published before subscribing
+                        self._mark_edited(
+                            {
+                                path.decode(): edited_at
+                                for path, edited_at in client.zrange(
+                                    DELTA_KEY,
+                                    0,
+                                    -1,
+                                    withscores=True,
+                                )
+                            },
+                        )
+                        self._listening = True
+                    elif message["type"] == "message":
+                        edits = json.loads(message["data"])
+                        self._mark_edited(dict.fromkeys(edits["paths"], edits["at"]))
+            except (redis.RedisError, OSError, ValueError) as e:
+                logger.warning("Link snapshot edits listener failed: %s", e)
+            finally:
+                self._listening = False
+            time.sleep(LISTENER_RETRY_DELAY)
+
+    def _mark_edited(self, edits: dict[str, float]) -> None:
+        # Copied, lookups read the dictionary without the lock
+        with self._lock:
+            self._edited = self._edited | edits
+
+
+RESOLVER = SnapshotResolver()
+# The listener thread doesn't survive a fork, children start their own
+os.register_at_fork(after_in_child=RESOLVER.reset)
+
+
+def get_snapshot_link(shortened_path: str) -> ShortenedLink | None:
+    """
+    The active link of a path, None when the database must decide.
+
+    Raises:
+        ShortenedLink.DoesNotExist: No link has this path.
+    """
+    if (target := RESOLVER.resolve(shortened_path)) is None:
+        return None
+    return target.to_link(shortened_path)
+
+
+def _publish_edits(paths: list[str]) -> None:
+    edited_at = time.time()
+    try:
+        pipeline = get_redis().pipeline()
+        pipeline.zadd(DELTA_KEY, dict.fromkeys(paths, edited_at))
+        pipeline.publish(DELTA_CHANNEL, json.dumps({"at": edited_at, "paths": paths}))
+        pipeline.execute()
+    except redis.RedisError as e:
+        logger.warning("Error publishing link edits: %s", e)
+
+
+def publish_link_edits(*shortened_paths: str | None) -> None:
+    """Stop serving these paths from the snapshots once the edit is committed."""
+    paths = [path for path in shortened_paths if path]
+    if not settings.LINK_SNAPSHOT_PATH or not paths:
+        return
+    transaction.on_commit(lambda: _publish_edits(paths))
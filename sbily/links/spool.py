@@ -0,0 +1,382 @@
+"""
+Write-ahead spool of the clicks the database could not store.
+
+When inserting a click fails because the database is unreachable, the redirect
+appends the raw click to a segment file of its own process and keeps spooling
+without touching the database for `CLICK_SPOOL_RETRY_AFTER` seconds. Segments
+are preallocated and memory-mapped, so an append is a memory copy, and are
+synced to disk in batches. A segment is sealed once full, old or the database
+is back, then the `replay_click_spool` task loads it into the database. A
+thread of the process syncs and seals the segment once no more clicks come.
+
+A segment holds records made of a 4-byte big-endian length and a JSON click,
+ended by the zeroes the file was preallocated with.
+"""
+
+import atexit
+import contextlib
+import json
+import logging
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.db import InterfaceError
+from django.db import OperationalError
+from django.db import transaction
+from django.utils import timezone
+
+from sbily.monitoring.metrics import BOT_CLICKS
+from sbily.monitoring.metrics import SPOOLED_CLICKS
+from sbily.utils.http import get_client_ip
+
+from .bots import classify_click
+from .enrichment import ClickEvent
+from .enrichment import enrich_clicks
+from .models import BotClickCount
+from .models import LinkClick
+from .models import ShortenedLink
+
+if TYPE_CHECKING:
+    from django.http import HttpRequest
+
+logger = logging.getLogger("links.spool")
+
+ACTIVE_SUFFIX = ".active"
+SEALED_SUFFIX = ".seg"
+REPLAYING_SUFFIX = ".replaying"
+HEADER = struct.Struct(">I")
+
+
+class Segment:
+    """A preallocated, memory-mapped segment file being appended to."""
+
+    def __init__(self, path: Path, size: int):
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o640)
+        try:
+            os.ftruncate(fd, size)
+            self.buffer = mmap.mmap(fd, size)
+        finally:
+            # The mapping keeps its own reference to the file
+            os.close(fd)
+        self.offset = 0
+        self.created_at = time.monotonic()
+
+    def append(self, record: bytes) -> bool:
+        """Append a record, False when the segment is too full to hold it."""
+        start = self.offset + HEADER.size
+        end = start + len(record)
+        if end > len(self.buffer):
+            return False
+        self.buffer[start:end] = record
+        # Written last, a record cut by a crash reads as the end of the segment
+        HEADER.pack_into(self.buffer, self.offset, len(record))
+        self.offset = end
+        return True
+
+    def sync(self) -> None:
+        self.buffer.flush()
+
+    def close(self) -> None:
+        self.buffer.flush()
+        self.buffer.close()
+
+
+class ClickSpool:
+    """The spool of the current process, with its database circuit breaker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._segment: Segment | None = None
+        self._unsynced = 0
+        self._synced_at = 0.0
+        self._database_down_until = 0.0
+        self._flusher: threading.Thread | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(settings.CLICK_SPOOL_DIR)
+
+    def bypass_database(self) -> bool:
+        """Whether clicks go straight to the spool, the database having failed."""
+        return self.enabled and time.monotonic() < self._database_down_until
+
+    def database_failed(self) -> None:
+        self._database_down_until = time.monotonic() + settings.CLICK_SPOOL_RETRY_AFTER
+
+    def append(self, event: ClickEvent) -> None:
+        record = json.dumps(
+            {
+                "link_id": event.link_id,
+                "ip_address": event.ip_address,
+                "user_agent": event.user_agent,
+                "referrer": event.referrer,
+                "clicked_at": (event.clicked_at or timezone.now()).isoformat(),
+            },
+            separators=(",", ":"),
+        ).encode()
+
+        with self._lock:
+            segment = self._segment
+            if (
+                segment is not None
+                and time.monotonic() - segment.created_at
+                >= settings.CLICK_SPOOL_SEGMENT_MAX_AGE
+            ):
+                self._seal()
+                segment = None
+            if segment is None or not segment.append(record):
+                self._seal()
+                segment = self._segment = self._open()
+                if not segment.append(record):
+                    logger.error("Click of %s bytes dropped, too large.", len(record))
+                    return
+
+            self._unsynced += 1
+            now = time.monotonic()
+            if (
+                self._unsynced >= settings.CLICK_SPOOL_SYNC_EVERY
+                or now - self._synced_at >= settings.CLICK_SPOOL_SYNC_INTERVAL
+            ):
+                segment.sync()
+                self._unsynced = 0
+                self._synced_at = now
+        SPOOLED_CLICKS.inc(stage="spooled")
+
+    def seal(self) -> None:
+        """Hand the open segment, if any, over to the replay."""
+        if self._segment is None:
+            return
+        with self._lock:
+            self._seal()
+
+    def reset(self) -> None:
+        """Forget the segment of the parent process in a forked child."""
+        self._lock = threading.Lock()
+        self._segment = None
+        self._unsynced = 0
+        self._flusher = None
+
+    def flush_idle(self) -> None:
+        """Sync the clicks of the open segment, or seal it once too old."""
+        with self._lock:
+            segment = self._segment
+            if segment is None:
+                return
+            now = time.monotonic()
+            if now - segment.created_at >= settings.CLICK_SPOOL_SEGMENT_MAX_AGE:
+                self._seal()
+            elif self._unsynced:
+                segment.sync()
+                self._unsynced = 0
+                self._synced_at = now
+
+    def _run_flusher(self) -> None:
+        # Appends only check the age and sync of the segment, a process that
+        # stops spooling would otherwise keep its clicks until abandoned
+        while True:
+            time.sleep(settings.CLICK_SPOOL_SYNC_INTERVAL)
+            try:
+                self.flush_idle()
+            except OSError:
+                logger.exception("Error flushing the click spool.")
+
+    def _open(self) -> Segment:
+        if self._flusher is None:
+            self._flusher = threading.Thread(
+                target=self._run_flusher,
+                name="click-spool-flusher",
+                daemon=True,
+            )
+            self._flusher.start()
+        directory = Path(settings.CLICK_SPOOL_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        # Names sort by creation time, the replay loads the oldest first
+        name = f"{time.time_ns()}-{socket.gethostname()}-{os.getpid()}"
+        return Segment(
+            directory / f"{name}{ACTIVE_SUFFIX}",
+            settings.CLICK_SPOOL_SEGMENT_SIZE,
+        )
+
+    def _seal(self) -> None:
+        segment, self._segment = self._segment, None
+        if segment is None:
+            return
+        segment.close()
+        self._unsynced = 0
+        # Missing when left idle long enough to be replayed as abandoned
+        with contextlib.suppress(FileNotFoundError):
+            segment.path.replace(segment.path.with_suffix(SEALED_SUFFIX))
+
+
+SPOOL = ClickSpool()
+os.register_at_fork(after_in_child=SPOOL.reset)
+atexit.register(SPOOL.seal)
+
+
+def record_click(link: ShortenedLink, request: HttpRequest) -> None:
+    """
+    Store the click of a redirect, or spool it while the database is
+    unavailable so the redirect neither waits for the database nor loses it.
+    """
+    if not SPOOL.bypass_database():
+        try:
+            LinkClick.create_from_request(link, request)
+        except OperationalError, InterfaceError:
+            logger.exception("Database unavailable, spooling link click.")
+            if not SPOOL.enabled:
+                return
+            SPOOL.database_failed()
+        except Exception:
+            logger.exception("Error creating link click.")
+            return
+        else:
+            SPOOL.seal()
+            return
+
+    try:
+        SPOOL.append(
+            ClickEvent(
+                link_id=link.pk,
+                ip_address=get_client_ip(request),
+                user_agent=request.headers.get("User-Agent", ""),
+                referrer=request.headers.get("Referer", ""),
+                clicked_at=timezone.now(),
+            ),
+        )
+    except OSError:
+        logger.exception("Error spooling link click.")
+
+
+def read_segment(path: Path) -> list[ClickEvent]:
+    data = path.read_bytes()
+    events = []
+    offset = 0
+    while offset + HEADER.size <= len(data):
+        (length,) = HEADER.unpack_from(data, offset)
+        start = offset + HEADER.size
+        if not length or start + length > len(data):
+            break
+        offset = start + length
+        try:
+            record = json.loads(data[start:offset])
+            events.append(
+                ClickEvent(
+                    link_id=record["link_id"],
+                    ip_address=record["ip_address"],
+                    user_agent=record["user_agent"],
+                    referrer=record["referrer"],
+                    clicked_at=datetime.fromisoformat(record["clicked_at"]),
+                ),
+            )
+        except KeyError, ValueError:
+            logger.warning("Skipping an unreadable click in %s.", path.name)
+    return events
+
+
+def claim_segment() -> Path | None:
+    """
+    Take the oldest sealed or abandoned segment by renaming it, so that
+    concurrent replays never load the same segment.
+    """
+    directory = Path(settings.CLICK_SPOOL_DIR)
+    if not directory.is_dir():
+        return None
+    abandoned_before = time.time() - settings.CLICK_SPOOL_ABANDONED_AFTER
+    for path in sorted(directory.iterdir()):
+        try:
+            if path.suffix != SEALED_SUFFIX and (
+                path.suffix not in {ACTIVE_SUFFIX, REPLAYING_SUFFIX}
+                or path.stat().st_mtime >= abandoned_before
+            ):
+                continue
+            claimed = path.replace(path.with_suffix(REPLAYING_SUFFIX))
+            # Mark the claim as fresh for the abandoned check
+            os.utime(claimed)
+        except FileNotFoundError:
+            # Claimed by another replay
+            continue
+        return claimed
+    return None
+
+
+def replay_segment(path: Path) -> int:
+    """Store the clicks of a segment in one transaction, return their count."""
+    events = read_segment(path)
+    # Links deleted since the click lose it, as they would have lost its row
+    link_ids = set(
+        ShortenedLink.objects.filter(
+            pk__in={event.link_id for event in events},
+        ).values_list("pk", flat=True),
+    )
+    clicks = []
+    bot_clicks = Counter()
+    for event in events:
+        if event.link_id not in link_ids:
+            continue
+        if reason := classify_click(event.ip_address, event.user_agent):
+            BOT_CLICKS.inc(reason=reason)
+            bot_clicks[event.link_id, timezone.localdate(event.clicked_at)] += 1
+        else:
+            clicks.append(event)
+
+    with transaction.atomic():
+        for (link_id, day), count in bot_clicks.items():
+            BotClickCount.increment(link_id, day=day, count=count)
+        if clicks:
+            LinkClick.bulk_load(enrich_clicks(clicks))
+    SPOOLED_CLICKS.inc(len(events), stage="replayed")
+    return len(clicks)
+
+
+def replay_spool() -> tuple[int, int]:
+    """Replay every segment ready, return the segments and clicks loaded."""
+    segments = clicks = 0
+    while (path := claim_segment()) is not None:
+        try:
+            clicks += replay_segment(path)
+        except Exception:
+            # Back in line for the next run
+            path.replace(path.with_suffix(SEALED_SUFFIX))
+            raise
+        path.unlink()
+        segments += 1
+    return segments, clicks
+
+
+def spool_status() -> dict[str, tuple[int, int, float]]:
+    """Segments, bytes on disk and oldest creation time per state."""
+    directory = Path(settings.CLICK_SPOOL_DIR)
+    if not settings.CLICK_SPOOL_DIR or not directory.is_dir():
+        return {}
+    states = {
+        ACTIVE_SUFFIX: "active",
+        SEALED_SUFFIX: "sealed",
+        REPLAYING_SUFFIX: "replaying",
+    }
+    status = {}
+    for path in directory.iterdir():
+        if (state := states.get(path.suffix)) is None:
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        created_at = int(path.name.split("-", 1)[0]) / 1e9
+        count, size, oldest = status.get(state, (0, 0, created_at))
+        # Segments are sparse until written, count the blocks in use
+        status[state] = (
+            count + 1,
+            size + stat.st_blocks * 512,
+            min(oldest, created_at),
+        )
+    return status
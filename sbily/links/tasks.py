@@ -1,11 +1,19 @@
+from pathlib import Path
+
 from celery import shared_task
+from django.conf import settings
 from django.utils.timezone import now
 from django.utils.timezone import timedelta
 
 from sbily.utils.tasks import default_task_params
 from sbily.utils.tasks import task_response
 
+from .models import BotClickCount
 from .models import LinkClick
+from .models import RepeatClickCount
+from .models import SampledClickCount
+from .snapshot import export_snapshot
+from .spool import replay_spool
 
 
 @shared_task(**default_task_params("clean_up_analytics_data", acks_late=True))
@@ -19,8 +27,37 @@ def clean_up_analytics_data(self) -> dict:
     count, _ = LinkClick.objects.filter(
         clicked_at__lt=current_time - five_year_ago,
     ).delete()
+    for counter in (BotClickCount, RepeatClickCount, SampledClickCount):
+        counter_count, _ = counter.objects.filter(
+            day__lt=(current_time - five_year_ago).date(),
+        ).delete()
+        count += counter_count
 
     return task_response(
         "COMPLETED",
         f"A total of {count} analytics data were successfully removed.",
     )
+
+
+@shared_task(**default_task_params("replay_click_spool", acks_late=True))
+def replay_click_spool(self) -> dict:
+    """Store the clicks spooled while the database was unavailable."""
+
+    segments, clicks = replay_spool()
+
+    return task_response(
+        "COMPLETED",
+        f"{clicks} clicks replayed from {segments} spool segments.",
+    )
+
+
+@shared_task(**default_task_params("export_link_snapshot", acks_late=True))
+def export_link_snapshot(self) -> dict:
+    """Export the active links for the redirect workers."""
+
+    if not settings.LINK_SNAPSHOT_PATH:
+        return task_response("SKIPPED", "The link snapshot is disabled.")
+
+    count = export_snapshot(Path(settings.LINK_SNAPSHOT_PATH))
+
+    return task_response("COMPLETED", f"{count} links exported to the snapshot.")
@@ -0,0 +1,64 @@
+from django.test import SimpleTestCase
+
+from .bots import is_bot_user_agent
+
+HUMAN_USER_AGENTS = [
+    # CUBOT phones
+    (
+        "Mozilla/5.0 (Linux; Android 10; CUBOT X30 Build/QP1A.190711.020; wv) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) Version/4.0 "
+        "Chrome/120.0.6099.144 Mobile Safari/537.36"
+    ),
+    (
+        "Mozilla/5.0 (Linux; Android 12; CUBOT_NOTE_20) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/121.0.6167.101 Mobile Safari/537.36"
+    ),
+    # Pinterest in-app browsers
+    (
+        "Mozilla/5.0 (iPhone; CPU iPhone OS 17_2 like Mac OS X) "
+        "AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148 [Pinterest/iOS]"
+    ),
+    (
+        "Mozilla/5.0 (Linux; Android 13; SM-S911B Build/TP1A.220624.014; wv) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) Version/4.0 "
+        "Chrome/120.0.6099.144 Mobile Safari/537.36 [Pinterest/Android]"
+    ),
+    # Desktop browsers
+    (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
+    ),
+    (
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 14.2; rv:122.0) Gecko/20100101 "
+        "Firefox/122.0"
+    ),
+]
+
+BOT_USER_AGENTS = [
+    "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
+    "Mozilla/5.0 (compatible; bingbot/2.0; +http://www.bing.com/bingbot.htm)",
+    "Mozilla/5.0 (compatible; Pinterestbot/1.0; +http://www.pinterest.com/bot.html)",
+    "Pinterest/0.2 (+https://www.pinterest.com/bot.html)",
+    "Slackbot-LinkExpanding 1.0 (+https://api.slack.com/robots)",
+    "Slackbot 1.0 (+https://api.slack.com/robots)",
+    "TelegramBot (like TwitterBot)",
+    "Twitterbot/1.0",
+    "Discordbot/2.0; +https://discordapp.com",
+    "facebookexternalhit/1.1 (+http://www.facebook.com/externalhit_uatext.php)",
+    "WhatsApp/2.23.20.0 A",
+    "curl/8.5.0",
+    "python-requests/2.31.0",
+    "",
+]
+
+
+class BotUserAgentTests(SimpleTestCase):
+    def test_human_user_agents(self):
+        for user_agent in HUMAN_USER_AGENTS:
+            with self.subTest(user_agent=user_agent):
+                assert not is_bot_user_agent(user_agent)
+
+    def test_bot_user_agents(self):
+        for user_agent in BOT_USER_AGENTS:
+            with self.subTest(user_agent=user_agent):
+                assert is_bot_user_agent(user_agent)
@@ -7,15 +7,21 @@ from typing import TYPE_CHECKING
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.shortcuts import redirect
 from django.shortcuts import render
 from django.urls import reverse
 from django.utils import timezone
 
+from sbily.monitoring.metrics import REDIRECTS
 from sbily.utils.data import validate
+from sbily.utils.db import pin_to_primary
+from sbily.utils.ratelimit import rate_limit
 
-from .models import LinkClick
+from .lookup import get_link
+from .lookup import invalidate_links
 from .models import ShortenedLink
+from .spool import record_click
 
 if TYPE_CHECKING:
     from django.http import HttpRequest
@@ -33,30 +39,37 @@ def plans(request: HttpRequest):
     return render(request, "plans.html")
 
 
+# Outside of a request transaction, so a primary outage doesn't fail redirects
+# before the link is even looked up on a replica
+@transaction.non_atomic_requests
+@rate_limit("redirect", ip="600/m")
 def redirect_link(request: HttpRequest, shortened_path: str):
     try:
-        link = ShortenedLink.objects.get(shortened_path=shortened_path)
+        link = get_link(shortened_path)
 
         if link.is_expired():
+            REDIRECTS.inc(outcome="expired")
             return render(request, "expired.html")
 
         if not link.is_active:
+            REDIRECTS.inc(outcome="inactive")
             messages.error(request, "Link not found")
             return redirect("home")
 
-        try:
-            LinkClick.create_from_request(link, request)
-        except Exception as e:
-            logger.exception("Error creating link click.", exc_info=e)
+        record_click(link, request)
 
+        REDIRECTS.inc(outcome="redirected")
         return redirect(link.destination_url)
     except ShortenedLink.DoesNotExist:
+        REDIRECTS.inc(outcome="not_found")
         messages.error(request, "Link not found")
         return redirect("home")
     except Exception:
+        REDIRECTS.inc(outcome="error")
         return redirect("home")
 
 
+@rate_limit("create_link", methods=("POST",), ip="30/m", user="20/m")
 def create_link(request: HttpRequest):
     if request.method != "POST":
         return redirect("dashboard")
@@ -161,6 +174,8 @@ def update_link(request: HttpRequest, shortened_path: str):
             )
         link.is_active = form_data["is_active"]
         link.save()
+        pin_to_primary(f"link:{shortened_path}")
+        invalidate_links(shortened_path)
 
         messages.success(request, "Link updated successfully")
         return redirect(current_path)
@@ -256,6 +271,14 @@ def handle_link_actions(request: HttpRequest):
         return redirect(current_path)
 
     try:
+        shortened_paths = list(
+            shortened_links.values_list("shortened_path", flat=True),
+        )
+        pin_to_primary(
+            f"user:{user.pk}",
+            *(f"link:{path}" for path in shortened_paths),
+        )
+        invalidate_links(*shortened_paths)
         if action in ("activate_selected", "deactivate_selected"):
             actions[action](is_active=action == "activate_selected")
         else:
@@ -0,0 +1,153 @@
+import json
+
+from django.contrib import admin
+from django.http import FileResponse
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path
+from django.urls import reverse
+from django.utils.html import format_html
+from django.utils.translation import gettext_lazy as _
+
+from .models import RequestProfile
+from .models import SlowQuery
+from .profiling import PROFILE_HEADER
+from .profiling import PROFILE_PARAM
+from .profiling import make_profiling_token
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    change_list_template = "admin/monitoring/requestprofile/change_list.html"
+    list_display = (
+        "view_name",
+        "method",
+        "status_code",
+        "duration_display",
+        "sql_count",
+        "sql_duration_display",
+        "trigger",
+        "user",
+        "created_at",
+    )
+    list_filter = ("view_name", "trigger", "created_at")
+    search_fields = ("view_name", "path", "user__username")
+    date_hierarchy = "created_at"
+    sortable_by = (
+        "duration_display",
+        "sql_count",
+        "sql_duration_display",
+        "created_at",
+    )
+    fields = (
+        "view_name",
+        "method",
+        "path",
+        "status_code",
+        "user",
+        "trigger",
+        "duration",
+        "sql_count",
+        "sql_duration",
+        "download",
+        "stats_display",
+        "queries_display",
+        "created_at",
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description=_("duration (ms)"), ordering="duration")
+    def duration_display(self, obj):
+        return f"{obj.duration:.1f}"
+
+    @admin.display(description=_("SQL time (ms)"), ordering="sql_duration")
+    def sql_duration_display(self, obj):
+        return f"{obj.sql_duration:.1f}"
+
+    @admin.display(description=_("stats"))
+    def stats_display(self, obj):
+        return format_html("<pre>{}</pre>", obj.stats)
+
+    @admin.display(description=_("queries"))
+    def queries_display(self, obj):
+        queries = sorted(obj.queries, key=lambda query: -query["duration"])
+        return format_html("<pre>{}</pre>", json.dumps(queries, indent=2))
+
+    @admin.display(description=_("profile file"))
+    def download(self, obj):
+        if not obj.profile_file:
+            return "-"
+        url = reverse("admin:monitoring_requestprofile_download", args=[obj.pk])
+        return format_html('<a href="{}">{}</a>', url, _("Download .prof"))
+
+    def get_urls(self):
+        return [
+            path(
+                "<int:pk>/download/",
+                self.admin_site.admin_view(self.download_view),
+                name="monitoring_requestprofile_download",
+            ),
+            *super().get_urls(),
+        ]
+
+    def download_view(self, request, pk):
+        if not self.has_view_permission(request):
+            raise Http404
+        request_profile = get_object_or_404(RequestProfile, pk=pk)
+        if not request_profile.profile_file:
+            raise Http404
+        return FileResponse(
+            request_profile.profile_file.open("rb"),
+            as_attachment=True,
+            filename=f"profile-{pk}.prof",
+        )
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {
+            **(extra_context or {}),
+            "profiling_token": make_profiling_token(),
+            "profiling_header": PROFILE_HEADER,
+            "profiling_param": PROFILE_PARAM,
+        }
+        return super().changelist_view(request, extra_context)
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ("fingerprint", "source", "duration", "database", "created_at")
+    list_filter = ("source", "database", "created_at")
+    search_fields = ("fingerprint", "stack_fingerprint", "sql", "source")
+    date_hierarchy = "created_at"
+    fields = (
+        "fingerprint",
+        "stack_fingerprint",
+        "source",
+        "database",
+        "duration",
+        "sql",
+        "params",
+        "stack_display",
+        "explain_display",
+        "created_at",
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description=_("stack"))
+    def stack_display(self, obj):
+        return format_html("<pre>{}</pre>", obj.stack)
+
+    @admin.display(description=_("EXPLAIN"))
+    def explain_display(self, obj):
+        return format_html("<pre>{}</pre>", obj.explain) if obj.explain else "-"
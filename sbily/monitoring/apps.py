@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class MonitoringConfig(AppConfig):
+    name = "sbily.monitoring"
+
+    def ready(self):
+        from . import collectors  # noqa: F401, PLC0415
+        from . import signals  # noqa: F401, PLC0415
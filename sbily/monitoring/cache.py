@@ -0,0 +1,67 @@
+import pickle
+
+from django.core.cache.backends import locmem
+from django_redis import cache as django_redis
+from django_redis.exceptions import ConnectionInterrupted
+from redis.exceptions import RedisError
+
+from .metrics import current_measurement
+
+_MISSING = object()
+
+# Deletes KEYS[1] only while it holds ARGV[1]
+DELETE_IF_EQUAL_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class InstrumentedCacheMixin:
+    """Count cache hits and misses of the current view or Celery task."""
+
+    def get(self, key, default=None, version=None, **kwargs):
+        value = super().get(key, _MISSING, version=version, **kwargs)
+        if measurement := current_measurement():
+            hit = value is not _MISSING
+            measurement.add_cache_lookups(hits=int(hit), misses=int(not hit))
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, *args, **kwargs):
+        keys = list(keys)
+        values = super().get_many(keys, *args, **kwargs)
+        if measurement := current_measurement():
+            measurement.add_cache_lookups(
+                hits=len(values),
+                misses=len(keys) - len(values),
+            )
+        return values
+
+
+class LocMemCache(InstrumentedCacheMixin, locmem.LocMemCache):
+    def delete_if_equal(self, key, value, version=None) -> bool:
+        """Delete `key` only while it holds `value`, in one step."""
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            if self._has_expired(key) or pickle.loads(self._cache[key]) != value:  # noqa: S301
+                return False
+            return self._delete(key)
+
+
+class RedisCache(InstrumentedCacheMixin, django_redis.RedisCache):
+    @django_redis.omit_exception(return_value=False)
+    def delete_if_equal(self, key, value, version=None) -> bool:
+        """Delete `key` only while it holds `value`, in one step."""
+        client = self.client.get_client(write=True)
+        try:
+            deleted = client.eval(
+                DELETE_IF_EQUAL_SCRIPT,
+                1,
+                self.client.make_key(key, version=version),
+                self.client.encode(value),
+            )
+        except RedisError as e:
+            # Ignored like the errors of the other methods, when configured to
+            raise ConnectionInterrupted(connection=client) from e
+        return bool(deleted)
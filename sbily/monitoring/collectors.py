@@ -0,0 +1,109 @@
+"""Gauges computed when the metrics are scraped."""
+
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection
+from kombu.exceptions import ChannelError
+
+from .metrics import REGISTRY
+
+logger = logging.getLogger("monitoring.collectors")
+
+
+def celery_queue_lengths() -> dict[tuple[str, ...], float]:
+    from config.celery_app import app  # noqa: PLC0415
+
+    queues = {"celery"} | {
+        route["queue"] for route in settings.CELERY_TASK_ROUTES.values()
+    }
+    lengths = {}
+    with app.connection_for_read() as conn:
+        # Don't hold the scrape for the broker's full retry policy
+        conn.ensure_connection(max_retries=1)
+        channel = conn.default_channel
+        for queue in sorted(queues):
+            try:
+                _, message_count, _ = channel.queue_declare(queue, passive=True)
+            except ChannelError:
+                # The broker creates queues on first use
+                message_count = 0
+            lengths[(queue,)] = message_count
+    return lengths
+
+
+def pending_stripe_events() -> dict[tuple[str, ...], float]:
+    from sbily.payments.models import StripeEvent  # noqa: PLC0415
+
+    pending = StripeEvent.objects.filter(status=StripeEvent.STATUS_PENDING).count()
+    return {(): pending}
+
+
+def database_connections() -> dict[tuple[str, ...], float]:
+    if connection.vendor != "postgresql":
+        return {}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT COALESCE(state, 'unknown'), count(*) FROM pg_stat_activity "
+            "WHERE datname = current_database() GROUP BY 1",
+        )
+        return {(state,): count for state, count in cursor.fetchall()}
+
+
+def click_spool_segments() -> dict[tuple[str, ...], float]:
+    from sbily.links.spool import spool_status  # noqa: PLC0415
+
+    return {(state,): count for state, (count, _, _) in spool_status().items()}
+
+
+def click_spool_bytes() -> dict[tuple[str, ...], float]:
+    from sbily.links.spool import spool_status  # noqa: PLC0415
+
+    return {(state,): size for state, (_, size, _) in spool_status().items()}
+
+
+def click_spool_age() -> dict[tuple[str, ...], float]:
+    from sbily.links.spool import spool_status  # noqa: PLC0415
+
+    if not (status := spool_status()):
+        return {(): 0}
+    return {(): time.time() - min(oldest for _, _, oldest in status.values())}
+
+
+REGISTRY.gauge(
+    "sbily_celery_queue_length",
+    "Messages waiting in each Celery queue.",
+    ("queue",),
+    celery_queue_lengths,
+)
+REGISTRY.gauge(
+    "sbily_stripe_events_pending",
+    "Stripe webhook events waiting in the inbox.",
+    (),
+    pending_stripe_events,
+)
+REGISTRY.gauge(
+    "sbily_db_connections",
+    "Connections to the primary database per state.",
+    ("state",),
+    database_connections,
+)
+REGISTRY.gauge(
+    "sbily_click_spool_segments",
+    "Click spool segments per state.",
+    ("state",),
+    click_spool_segments,
+)
+REGISTRY.gauge(
+    "sbily_click_spool_bytes",
+    "Disk used by the click spool segments per state.",
+    ("state",),
+    click_spool_bytes,
+)
+REGISTRY.gauge(
+    "sbily_click_spool_oldest_age_seconds",
+    "Age of the oldest click spool segment waiting for the replay.",
+    (),
+    click_spool_age,
+)
@@ -0,0 +1,62 @@
+import hmac
+
+from django.conf import settings
+
+from .metrics import REGISTRY
+from .metrics import Histogram
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_labels(names, values, **extra) -> str:
+    pairs = [*zip(names, values, strict=True), *extra.items()]
+    if not pairs:
+        return ""
+    labels = ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs)
+    return f"{{{labels}}}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics() -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric, values in REGISTRY.collect():
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for key, value in sorted(values.items()):
+            if not isinstance(metric, Histogram):
+                labels = _format_labels(metric.labels, key)
+                lines.append(f"{metric.name}{labels} {_format_value(value)}")
+                continue
+
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(
+                (*metric.buckets, float("inf")),
+                counts,
+                strict=True,
+            ):
+                cumulative += bucket_count
+                labels = _format_labels(metric.labels, key, le=_format_value(bound))
+                lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(metric.labels, key)
+            lines.append(f"{metric.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{metric.name}_count{labels} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def has_metrics_token(authorization: str) -> bool:
+    """Check an `Authorization: Bearer <token>` header against METRICS_TOKEN."""
+    if not settings.METRICS_TOKEN:
+        return False
+    expected = f"Bearer {settings.METRICS_TOKEN}"
+    return hmac.compare_digest(authorization.encode(), expected.encode())
@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Avg
+from django.db.models import Count
+from django.db.models import Max
+from django.db.models import Sum
+from django.utils.timezone import now
+from django.utils.timezone import timedelta
+
+from sbily.monitoring.models import SlowQuery
+
+ORDERINGS = {
+    "total": "-total",
+    "avg": "-avg",
+    "max": "-max",
+    "count": "-count",
+}
+
+
+class Command(BaseCommand):
+    help = "Summarize the worst recorded slow queries by fingerprint."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=7,
+            help="Only consider queries recorded in the last N days.",
+        )
+        parser.add_argument("--limit", type=int, default=10)
+        parser.add_argument(
+            "--order",
+            choices=ORDERINGS,
+            default="total",
+            help="Rank fingerprints by total, average or max time, or count.",
+        )
+        parser.add_argument(
+            "--explain",
+            action="store_true",
+            help="Print the latest EXPLAIN plan of each fingerprint.",
+        )
+
+    def handle(self, *args, **options):
+        slow_queries = SlowQuery.objects.filter(
+            created_at__gte=now() - timedelta(days=options["days"]),
+        )
+        offenders = (
+            slow_queries.values("fingerprint")
+            .annotate(
+                count=Count("id"),
+                total=Sum("duration"),
+                avg=Avg("duration"),
+                max=Max("duration"),
+            )
+            .order_by(ORDERINGS[options["order"]])[: options["limit"]]
+        )
+
+        if not offenders:
+            self.stdout.write("No slow queries recorded.")
+            return
+
+        for rank, offender in enumerate(offenders, start=1):
+            queries = slow_queries.filter(fingerprint=offender["fingerprint"])
+            latest = queries.first()
+            sources = sorted(
+                set(queries.exclude(source="").values_list("source", flat=True)),
+            )
+
+            self.stdout.write(
+                self.style.MIGRATE_HEADING(
+                    f"#{rank} {offender['fingerprint']}: {offender['count']} "
+                    f"queries, total {offender['total']:.0f} ms, "
+                    f"avg {offender['avg']:.0f} ms, max {offender['max']:.0f} ms",
+                ),
+            )
+            self.stdout.write(f"  sources: {', '.join(sources) or '-'}")
+            self.stdout.write(f"  sql: {latest.sql}")
+            if latest.stack:
+                self.stdout.write(f"  called from: {latest.stack.splitlines()[-1]}")
+
+            if options["explain"]:
+                plan = queries.exclude(explain="").values_list("explain", flat=True)
+                self.stdout.write(f"  plan:\n{plan.first() or '  (none sampled)'}")
@@ -0,0 +1,484 @@
+import atexit
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from dataclasses import field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+
+from .slow_queries import capture_slow_query
+from .slow_queries import record_slow_queries
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from collections.abc import Iterator
+
+logger = logging.getLogger("monitoring.metrics")
+
+# Seconds, same defaults as the Prometheus client libraries
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels[label]) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> dict[tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values = {}
+
+    def snapshot(self) -> list:
+        return [[list(key), value] for key, value in self.collect().items()]
+
+    @staticmethod
+    def merge(values: dict, snapshot: list) -> None:
+        for key, value in snapshot:
+            values[tuple(key)] = values.get(tuple(key), 0) + value
+
+
+class Histogram:
+    """Bucketed observations per label set, kept in process memory."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per bucket counts, with +Inf last; sum; count)
+        self._values: dict[tuple[str, ...], tuple[list[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[label]) for label in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total, count = self._values.get(
+                key,
+                ([0] * (len(self.buckets) + 1), 0.0, 0),
+            )
+            counts[index] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def collect(self) -> dict[tuple[str, ...], tuple[list[int], float, int]]:
+        with self._lock:
+            return {
+                key: (list(counts), total, count)
+                for key, (counts, total, count) in self._values.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values = {}
+
+    def snapshot(self) -> list:
+        return [[list(key), *value] for key, value in self.collect().items()]
+
+    @staticmethod
+    def merge(values: dict, snapshot: list) -> None:
+        for key, counts, total, count in snapshot:
+            key = tuple(key)  # noqa: PLW2901
+            if key not in values:
+                values[key] = (counts, total, count)
+                continue
+            merged_counts, merged_total, merged_count = values[key]
+            values[key] = (
+                [a + b for a, b in zip(merged_counts, counts, strict=True)],
+                merged_total + total,
+                merged_count + count,
+            )
+
+
+class Gauge:
+    """A value computed by a callback when the metrics are scraped.
+
+    Used for shared state, such as queue lengths, that any process can read,
+    so gauges are not written to the multiprocess directory.
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...],
+        callback: Callable[[], dict[tuple[str, ...], float]],
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.callback = callback
+
+    def collect(self) -> dict[tuple[str, ...], float]:
+        try:
+            return self.callback()
+        except Exception:
+            logger.exception("Error collecting gauge %s", self.name)
+            return {}
+
+
+class MetricsRegistry:
+    """Metrics of this process, shared with sibling processes through files.
+
+    When `METRICS_MULTIPROC_DIR` is set every process (gunicorn or Celery
+    worker child) periodically writes its counters and histograms to
+    `<dir>/<pid>.json` and `collect` sums the files of all processes.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, Counter | Histogram | Gauge] = {}
+        self._lock = threading.Lock()
+        self._flushed_at = 0.0
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, *args, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name: str, documentation: str, labels=()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labels)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels=(),
+        buckets=DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labels, buckets)
+
+    def gauge(self, name: str, documentation: str, labels, callback) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labels, callback)
+
+    def metrics(self) -> list[Counter | Histogram | Gauge]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def reset(self) -> None:
+        for metric in self.metrics():
+            if not isinstance(metric, Gauge):
+                metric.reset()
+        self._flushed_at = 0.0
+
+    def _process_file(self, pid: int | None = None) -> Path:
+        return Path(settings.METRICS_MULTIPROC_DIR) / f"{pid or os.getpid()}.json"
+
+    def flush(self) -> None:
+        """Write the metrics of this process to the multiprocess directory."""
+        if not settings.METRICS_MULTIPROC_DIR:
+            return
+
+        snapshot = {
+            metric.name: metric.snapshot()
+            for metric in self.metrics()
+            if not isinstance(metric, Gauge)
+        }
+        path = self._process_file()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(snapshot))
+        tmp_path.replace(path)
+        self._flushed_at = time.monotonic()
+
+    def maybe_flush(self) -> None:
+        if time.monotonic() - self._flushed_at < settings.METRICS_FLUSH_INTERVAL:
+            return
+        try:
+            self.flush()
+        except OSError:
+            logger.exception("Error writing metrics of process %s", os.getpid())
+
+    def collect(self) -> list[tuple[Counter | Histogram | Gauge, dict]]:
+        """Return every metric with its values summed over all processes."""
+        snapshots = []
+        if settings.METRICS_MULTIPROC_DIR:
+            own_file = self._process_file()
+            for path in Path(settings.METRICS_MULTIPROC_DIR).glob("*.json"):
+                if path == own_file:
+                    continue
+                try:
+                    snapshots.append(json.loads(path.read_text()))
+                except OSError, ValueError:
+                    logger.warning("Skipping unreadable metrics file %s", path)
+
+        collected = []
+        for metric in self.metrics():
+            values = metric.collect()
+            if not isinstance(metric, Gauge):
+                for snapshot in snapshots:
+                    metric.merge(values, snapshot.get(metric.name, []))
+            collected.append((metric, values))
+        return collected
+
+
+REGISTRY = MetricsRegistry()
+# Forked children (Celery prefork pool) start counting from zero
+os.register_at_fork(after_in_child=REGISTRY.reset)
+atexit.register(REGISTRY.flush)
+
+DURATION = REGISTRY.histogram(
+    "sbily_duration_seconds",
+    "Wall time of views and Celery tasks.",
+    ("kind", "name"),
+)
+SQL_QUERIES = REGISTRY.histogram(
+    "sbily_sql_queries",
+    "SQL queries executed per view or Celery task.",
+    ("kind", "name"),
+    buckets=COUNT_BUCKETS,
+)
+SQL_DURATION = REGISTRY.histogram(
+    "sbily_sql_duration_seconds",
+    "Time spent in SQL per view or Celery task.",
+    ("kind", "name"),
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "sbily_cache_lookups_total",
+    "Cache lookups per view or Celery task and result.",
+    ("kind", "name", "result"),
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    "sbily_http_requests_total",
+    "HTTP requests per view, method and status code.",
+    ("view", "method", "status"),
+)
+REDIRECTS = REGISTRY.counter(
+    "sbily_redirects_total",
+    "Short link lookups per outcome.",
+    ("outcome",),
+)
+BOT_CLICKS = REGISTRY.counter(
+    "sbily_bot_clicks_total",
+    "Clicks classified as bots, per reason.",
+    ("reason",),
+)
+COALESCED_LOADS = REGISTRY.counter(
+    "sbily_coalesced_loads_total",
+    "Cache misses per key kind, by how their value was obtained.",
+    ("name", "result"),
+)
+LINK_SNAPSHOT_LOOKUPS = REGISTRY.counter(
+    "sbily_link_snapshot_lookups_total",
+    "Redirect lookups in the link snapshot per result.",
+    ("result",),
+)
+SPOOLED_CLICKS = REGISTRY.counter(
+    "sbily_spooled_clicks_total",
+    "Clicks written to the local spool and replayed from it.",
+    ("stage",),
+)
+RATE_LIMITED = REGISTRY.counter(
+    "sbily_rate_limited_total",
+    "Requests refused with a 429 per rate limit scope.",
+    ("scope",),
+)
+STRIPE_WEBHOOK_EVENTS = REGISTRY.counter(
+    "sbily_stripe_webhook_events_total",
+    "Stripe events handled per type and outcome.",
+    ("type", "outcome"),
+)
+STRIPE_WEBHOOK_DURATION = REGISTRY.histogram(
+    "sbily_stripe_webhook_duration_seconds",
+    "Time spent in handle_stripe_webhook per event type.",
+    ("type",),
+)
+ENRICHMENT_DURATION = REGISTRY.histogram(
+    "sbily_enrichment_duration_seconds",
+    "Time spent enriching clicks with GeoIP and user agent data.",
+    ("step",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+
+
+@dataclass(slots=True)
+class Measurement:
+    """Resource usage of a single view or Celery task."""
+
+    kind: str
+    name: str
+    started_at: float = field(default_factory=time.perf_counter)
+    sql_count: int = 0
+    sql_time: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    timings: dict[str, float] = field(default_factory=dict)
+    # (sql, duration) of every query, only collected when set to a list
+    queries: list[tuple[str, float]] | None = None
+    slow_queries: list[dict] = field(default_factory=list)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add_query(self, sql: str, duration: float) -> None:
+        # Queries may come from the pool threads of gather_queries
+        with self._lock:
+            self.sql_count += 1
+            self.sql_time += duration
+            if self.queries is not None:
+                self.queries.append((sql, duration))
+
+    def add_slow_query(self, record: dict) -> None:
+        with self._lock:
+            self.slow_queries.append(record)
+
+    def add_cache_lookups(self, hits: int, misses: int) -> None:
+        with self._lock:
+            self.cache_hits += hits
+            self.cache_misses += misses
+
+    def add_timing(self, step: str, duration: float) -> None:
+        with self._lock:
+            self.timings[step] = self.timings.get(step, 0.0) + duration
+
+    def finish(self) -> float:
+        """Record the measurement in the registry and return its wall time."""
+        duration = time.perf_counter() - self.started_at
+        DURATION.observe(duration, kind=self.kind, name=self.name)
+        SQL_QUERIES.observe(self.sql_count, kind=self.kind, name=self.name)
+        SQL_DURATION.observe(self.sql_time, kind=self.kind, name=self.name)
+        if self.cache_hits:
+            CACHE_LOOKUPS.inc(
+                self.cache_hits,
+                kind=self.kind,
+                name=self.name,
+                result="hit",
+            )
+        if self.cache_misses:
+            CACHE_LOOKUPS.inc(
+                self.cache_misses,
+                kind=self.kind,
+                name=self.name,
+                result="miss",
+            )
+        if self.slow_queries:
+            for record in self.slow_queries:
+                record["source"] = f"{self.kind}:{self.name}"
+            record_slow_queries(self.slow_queries)
+        REGISTRY.maybe_flush()
+        return duration
+
+    def as_log_line(self, duration: float, **extra) -> str:
+        fields = {
+            "kind": self.kind,
+            "name": self.name,
+            **extra,
+            "duration_ms": f"{duration * 1000:.1f}",
+            "sql_count": self.sql_count,
+            "sql_ms": f"{self.sql_time * 1000:.1f}",
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
+        fields.update(
+            {
+                f"{step}_ms": f"{value * 1000:.1f}"
+                for step, value in self.timings.items()
+            },
+        )
+        return " ".join(f"{key}={value}" for key, value in fields.items())
+
+
+_current: ContextVar[Measurement | None] = ContextVar("measurement", default=None)
+
+
+def current_measurement() -> Measurement | None:
+    return _current.get()
+
+
+@contextmanager
+def measure(kind: str, name: str) -> Iterator[Measurement]:
+    """Collect SQL, cache and enrichment stats of the block into a measurement."""
+    measurement = Measurement(kind, name)
+    token = _current.set(measurement)
+    try:
+        yield measurement
+    finally:
+        _current.reset(token)
+
+
+def start_measurement(kind: str, name: str):
+    """Start a measurement that is ended with `end_measurement(token)`.
+
+    For hooks, such as Celery signals, that can't wrap the work in `measure`.
+    """
+    return _current.set(Measurement(kind, name))
+
+
+def end_measurement(token) -> Measurement | None:
+    measurement = _current.get()
+    _current.reset(token)
+    return measurement
+
+
+@contextmanager
+def track_enrichment(step: str) -> Iterator[None]:
+    """Time a click enrichment step, such as the GeoIP lookup."""
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started_at
+        ENRICHMENT_DURATION.observe(duration, step=step)
+        if measurement := _current.get():
+            measurement.add_timing(step, duration)
+
+
+def sql_execute_wrapper(execute, sql, params, many, context):
+    """`connection.execute_wrapper` hook timing queries.
+
+    Counts the queries of the current measurement and captures the ones
+    slower than SLOW_QUERY_THRESHOLD milliseconds.
+    """
+    measurement = _current.get()
+    threshold = settings.SLOW_QUERY_THRESHOLD
+    if measurement is None and not threshold:
+        return execute(sql, params, many, context)
+
+    started_at = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started_at
+        if measurement is not None:
+            measurement.add_query(sql, duration)
+        if threshold and duration * 1000 >= threshold and not sql.startswith("EXPLAIN"):
+            capture_slow_query(
+                sql,
+                params,
+                duration,
+                context["connection"].alias,
+                many=many,
+                measurement=measurement,
+            )
@@ -0,0 +1,70 @@
+import logging
+
+from .metrics import HTTP_REQUESTS
+from .metrics import current_measurement
+from .metrics import measure
+from .profiling import get_profiling_trigger
+from .profiling import profile
+from .profiling import save_profile
+
+logger = logging.getLogger("monitoring.requests")
+
+
+class InstrumentationMiddleware:
+    """Record wall time, SQL, cache and enrichment stats of every view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with measure("view", "unresolved") as measurement:
+            response = self.get_response(request)
+
+            resolver_match = getattr(request, "resolver_match", None)
+            if resolver_match is not None:
+                measurement.name = resolver_match.view_name
+            HTTP_REQUESTS.inc(
+                view=measurement.name,
+                method=request.method,
+                status=response.status_code,
+            )
+            duration = measurement.finish()
+
+        logger.info(
+            measurement.as_log_line(
+                duration,
+                method=request.method,
+                status=response.status_code,
+            ),
+        )
+        return response
+
+
+class ProfilingMiddleware:
+    """Profile sampled requests, or requests of staff asking for it.
+
+    Must come last in MIDDLEWARE, after InstrumentationMiddleware, so that
+    mostly the view is profiled and its SQL is collected.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        measurement = current_measurement()
+        trigger = get_profiling_trigger(request)
+        if measurement is None or trigger is None:
+            return self.get_response(request)
+
+        with profile() as profiler:
+            if profiler is None:
+                return self.get_response(request)
+
+            measurement.queries = []
+            response = self.get_response(request)
+
+        try:
+            save_profile(request, response, profiler, trigger)
+        except Exception:
+            logger.exception("Error saving profile of %s", request.path)
+        return response
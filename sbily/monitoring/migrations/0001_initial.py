@@ -0,0 +1,42 @@
+# Generated by Django 6.0.6 on 2026-10-19 17:03
+
+import django.db.models.deletion
+import sbily.monitoring.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view_name', models.CharField(db_index=True, max_length=200, verbose_name='view')),
+                ('method', models.CharField(max_length=10, verbose_name='method')),
+                ('path', models.CharField(max_length=2000, verbose_name='path')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='status code')),
+                ('trigger', models.CharField(choices=[('sampled', 'Sampled'), ('staff', 'Staff'), ('token', 'Signed token')], max_length=10, verbose_name='trigger')),
+                ('duration', models.FloatField(verbose_name='duration (ms)')),
+                ('sql_count', models.PositiveIntegerField(verbose_name='SQL queries')),
+                ('sql_duration', models.FloatField(verbose_name='SQL time (ms)')),
+                ('queries', models.JSONField(default=list, help_text='SQL executed by the request with its duration in ms.', verbose_name='queries')),
+                ('stats', models.TextField(help_text='Top functions by cumulative time.', verbose_name='stats')),
+                ('profile_file', models.FileField(blank=True, help_text='Raw pstats dump, open it with pstats or snakeviz.', storage=sbily.monitoring.models.profiles_storage, upload_to='%Y/%m/%d', verbose_name='profile file')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='created at')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'request profile',
+                'verbose_name_plural': 'request profiles',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
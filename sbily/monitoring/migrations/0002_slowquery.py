@@ -0,0 +1,34 @@
+# Generated by Django 6.0.6 on 2026-10-19 17:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(db_index=True, help_text='Hash of the statement with its literals stripped.', max_length=16, verbose_name='fingerprint')),
+                ('stack_fingerprint', models.CharField(max_length=16, verbose_name='stack fingerprint')),
+                ('sql', models.TextField(verbose_name='SQL')),
+                ('params', models.JSONField(blank=True, null=True, verbose_name='parameters')),
+                ('duration', models.FloatField(verbose_name='duration (ms)')),
+                ('database', models.CharField(max_length=100, verbose_name='database')),
+                ('source', models.CharField(blank=True, help_text='View or Celery task that ran the statement.', max_length=200, verbose_name='source')),
+                ('stack', models.TextField(blank=True, verbose_name='stack')),
+                ('explain', models.TextField(blank=True, help_text='EXPLAIN (ANALYZE, BUFFERS) output, collected for a sample.', verbose_name='EXPLAIN')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='created at')),
+            ],
+            options={
+                'verbose_name': 'slow query',
+                'verbose_name_plural': 'slow queries',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
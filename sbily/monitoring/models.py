@@ -0,0 +1,103 @@
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+def profiles_storage() -> FileSystemStorage:
+    # Profiles hold SQL parameters and stack data, they are kept on local disk
+    # instead of the public (S3) media storage
+    return FileSystemStorage(location=settings.PROFILING_ROOT)
+
+
+class RequestProfile(models.Model):
+    """cProfile output and SQL of a single profiled request."""
+
+    TRIGGER_SAMPLED = "sampled"
+    TRIGGER_STAFF = "staff"
+    TRIGGER_TOKEN = "token"  # noqa: S105
+
+    TRIGGER_CHOICES = [
+        (TRIGGER_SAMPLED, _("Sampled")),
+        (TRIGGER_STAFF, _("Staff")),
+        (TRIGGER_TOKEN, _("Signed token")),
+    ]
+
+    view_name = models.CharField(_("view"), max_length=200, db_index=True)
+    method = models.CharField(_("method"), max_length=10)
+    path = models.CharField(_("path"), max_length=2000)
+    status_code = models.PositiveSmallIntegerField(_("status code"))
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name=_("user"),
+    )
+    trigger = models.CharField(_("trigger"), max_length=10, choices=TRIGGER_CHOICES)
+    duration = models.FloatField(_("duration (ms)"))
+    sql_count = models.PositiveIntegerField(_("SQL queries"))
+    sql_duration = models.FloatField(_("SQL time (ms)"))
+    queries = models.JSONField(
+        _("queries"),
+        default=list,
+        help_text=_("SQL executed by the request with its duration in ms."),
+    )
+    stats = models.TextField(
+        _("stats"),
+        help_text=_("Top functions by cumulative time."),
+    )
+    profile_file = models.FileField(
+        _("profile file"),
+        storage=profiles_storage,
+        upload_to="%Y/%m/%d",
+        blank=True,
+        help_text=_("Raw pstats dump, open it with pstats or snakeviz."),
+    )
+    created_at = models.DateTimeField(_("created at"), auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = _("request profile")
+        verbose_name_plural = _("request profiles")
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.view_name} ({self.duration:.0f} ms)"
+
+
+class SlowQuery(models.Model):
+    """A statement slower than SLOW_QUERY_THRESHOLD, capped at SLOW_QUERY_MAX_ROWS."""
+
+    fingerprint = models.CharField(
+        _("fingerprint"),
+        max_length=16,
+        db_index=True,
+        help_text=_("Hash of the statement with its literals stripped."),
+    )
+    stack_fingerprint = models.CharField(_("stack fingerprint"), max_length=16)
+    sql = models.TextField(_("SQL"))
+    params = models.JSONField(_("parameters"), null=True, blank=True)
+    duration = models.FloatField(_("duration (ms)"))
+    database = models.CharField(_("database"), max_length=100)
+    source = models.CharField(
+        _("source"),
+        max_length=200,
+        blank=True,
+        help_text=_("View or Celery task that ran the statement."),
+    )
+    stack = models.TextField(_("stack"), blank=True)
+    explain = models.TextField(
+        _("EXPLAIN"),
+        blank=True,
+        help_text=_("EXPLAIN (ANALYZE, BUFFERS) output, collected for a sample."),
+    )
+    created_at = models.DateTimeField(_("created at"), auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = _("slow query")
+        verbose_name_plural = _("slow queries")
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.fingerprint} ({self.duration:.0f} ms)"
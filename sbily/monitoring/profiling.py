@@ -0,0 +1,125 @@
+import cProfile
+import io
+import logging
+import marshal
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.base import ContentFile
+
+from .metrics import current_measurement
+from .models import RequestProfile
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from django.http import HttpRequest
+    from django.http import HttpResponse
+
+logger = logging.getLogger("monitoring.profiling")
+
+PROFILE_HEADER = "X-Sbily-Profile"
+PROFILE_PARAM = "_profile"
+TOKEN_SALT = "sbily.monitoring.profiling"  # noqa: S105
+STATS_LIMIT = 60
+
+# Only one profiler can be active per process, concurrent requests skip it
+_profiler_lock = threading.Lock()
+
+
+def make_profiling_token() -> str:
+    """Signed token that enables profiling of requests sending it."""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign("profile")
+
+
+def _has_valid_token(value: str) -> bool:
+    try:
+        signing.TimestampSigner(salt=TOKEN_SALT).unsign(
+            value,
+            max_age=settings.PROFILING_TOKEN_MAX_AGE,
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def get_profiling_trigger(request: HttpRequest) -> str | None:
+    """Return why the request should be profiled, or None to skip it."""
+    value = request.headers.get(PROFILE_HEADER) or request.GET.get(PROFILE_PARAM)
+    if value:
+        if _has_valid_token(value):
+            return RequestProfile.TRIGGER_TOKEN
+        if request.user.is_staff:
+            return RequestProfile.TRIGGER_STAFF
+
+    sample_rate = settings.PROFILING_SAMPLE_RATE
+    if sample_rate and random.randrange(sample_rate) == 0:  # noqa: S311
+        return RequestProfile.TRIGGER_SAMPLED
+    return None
+
+
+@contextmanager
+def profile() -> Iterator[cProfile.Profile | None]:
+    """Run the block under cProfile, yields None if a profile is running."""
+    if not _profiler_lock.acquire(blocking=False):
+        yield None
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+    finally:
+        _profiler_lock.release()
+
+
+def save_profile(
+    request: HttpRequest,
+    response: HttpResponse,
+    profiler: cProfile.Profile,
+    trigger: str,
+) -> RequestProfile:
+    """Store the profile with the SQL of the current measurement."""
+    measurement = current_measurement()
+    duration = time.perf_counter() - measurement.started_at
+
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(STATS_LIMIT)
+
+    resolver_match = getattr(request, "resolver_match", None)
+    view_name = resolver_match.view_name if resolver_match else "unresolved"
+    user = request.user if request.user.is_authenticated else None
+
+    request_profile = RequestProfile(
+        view_name=view_name,
+        method=request.method,
+        path=request.get_full_path()[:2000],
+        status_code=response.status_code,
+        user=user,
+        trigger=trigger,
+        duration=duration * 1000,
+        sql_count=measurement.sql_count,
+        sql_duration=measurement.sql_time * 1000,
+        queries=[
+            {"sql": sql, "duration": query_duration * 1000}
+            for sql, query_duration in measurement.queries or []
+        ],
+        stats=stream.getvalue(),
+    )
+    request_profile.profile_file.save(
+        f"{view_name.replace(':', '_')}.prof",
+        ContentFile(marshal.dumps(stats.stats)),  # type: ignore[attr-defined]
+        save=False,
+    )
+    request_profile.save()
+    return request_profile
@@ -0,0 +1,87 @@
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+from celery.signals import task_postrun
+from celery.signals import task_prerun
+from celery.signals import worker_ready
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .exposition import CONTENT_TYPE
+from .exposition import has_metrics_token
+from .exposition import render_metrics
+from .metrics import end_measurement
+from .metrics import sql_execute_wrapper
+from .metrics import start_measurement
+
+logger = logging.getLogger("monitoring.tasks")
+
+# task id -> context var token of the running measurement
+_task_tokens = {}
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # Connections are reopened on the same wrapper, install the hook only once
+    if sql_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_execute_wrapper)
+
+
+@task_prerun.connect
+def start_task_measurement(task_id=None, task=None, **kwargs):
+    _task_tokens[task_id] = start_measurement("task", task.name)
+
+
+@task_postrun.connect
+def finish_task_measurement(task_id=None, state=None, **kwargs):
+    token = _task_tokens.pop(task_id, None)
+    if token is None:
+        return
+
+    measurement = end_measurement(token)
+    duration = measurement.finish()
+    logger.info(measurement.as_log_line(duration, state=state))
+
+
+class WorkerMetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if not has_metrics_token(self.headers.get("Authorization", "")):
+            self.send_error(403)
+            return
+
+        try:
+            body = render_metrics().encode()
+        finally:
+            # Every scrape runs in a new thread, close its connections rather
+            # than leave them open until CONN_MAX_AGE
+            connections.close_all()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # noqa: A002
+        logger.debug(format, *args)
+
+
+@worker_ready.connect
+def start_worker_metrics_server(**kwargs):
+    """Serve the metrics of the worker and its pool processes over HTTP."""
+    if not settings.CELERY_WORKER_METRICS_PORT:
+        return
+
+    server = ThreadingHTTPServer(
+        ("0.0.0.0", settings.CELERY_WORKER_METRICS_PORT),  # noqa: S104
+        WorkerMetricsHandler,
+    )
+    threading.Thread(
+        target=server.serve_forever,
+        name="metrics-server",
+        daemon=True,
+    ).start()
+    logger.info("Serving metrics on port %s", settings.CELERY_WORKER_METRICS_PORT)
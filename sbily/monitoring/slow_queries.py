@@ -0,0 +1,115 @@
+import hashlib
+import json
+import logging
+import re
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from .metrics import Measurement
+
+logger = logging.getLogger("monitoring.slow_queries")
+
+APPS_DIR = str(Path(settings.BASE_DIR) / "sbily")
+MONITORING_DIR = str(Path(__file__).parent)
+STACK_DEPTH = 8
+MAX_SQL_LENGTH = 10_000
+
+_IN_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)+\s*\)")
+_NUMBER = re.compile(r"\b\d+\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_WHITESPACE = re.compile(r"\s+")
+
+_capture_paused: ContextVar[bool] = ContextVar("slow_queries_paused", default=False)
+
+
+def normalize_sql(sql: str) -> str:
+    """Replace literals and variable IN lists so equivalent queries match."""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("(...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def fingerprint(value: str) -> str:
+    return hashlib.sha1(value.encode(), usedforsecurity=False).hexdigest()[:16]
+
+
+def get_app_stack() -> list[str]:
+    """Innermost project frames calling the database, outside this app."""
+    frames = [
+        f"{Path(frame.filename).relative_to(settings.BASE_DIR)}:{frame.lineno} "
+        f"in {frame.name}"
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(APPS_DIR)
+        and not frame.filename.startswith(MONITORING_DIR)
+    ]
+    return frames[-STACK_DEPTH:]
+
+
+def _serialize_params(params) -> list | dict | None:
+    if params is None:
+        return None
+    try:
+        return json.loads(json.dumps(params, cls=DjangoJSONEncoder))
+    except TypeError:
+        return [repr(param) for param in params]
+
+
+def capture_slow_query(  # noqa: PLR0913
+    sql: str,
+    params,
+    duration: float,
+    alias: str,
+    *,
+    many: bool,
+    measurement: Measurement | None,
+) -> None:
+    """Queue a query slower than SLOW_QUERY_THRESHOLD for recording."""
+    if _capture_paused.get():
+        return
+
+    stack = get_app_stack()
+    record = {
+        "fingerprint": fingerprint(normalize_sql(sql)),
+        "stack_fingerprint": fingerprint("\n".join(stack)),
+        "sql": sql[:MAX_SQL_LENGTH],
+        "params": None if many else _serialize_params(params),
+        "duration": duration * 1000,
+        "database": alias,
+        # Set by the measurement once finished, views are only named by then
+        "source": "",
+        "stack": stack,
+    }
+    if measurement is not None:
+        measurement.add_slow_query(record)
+    else:
+        record_slow_queries([record])
+
+
+@contextmanager
+def pause_capture() -> Iterator[None]:
+    """Ignore slow queries made inside the block, e.g. while storing them."""
+    token = _capture_paused.set(True)
+    try:
+        yield
+    finally:
+        _capture_paused.reset(token)
+
+
+def record_slow_queries(records: list[dict]) -> None:
+    from .tasks import store_slow_queries  # noqa: PLC0415
+
+    # Never let the recorder break the query or request it observes
+    try:
+        store_slow_queries.delay(records)
+    except Exception:
+        logger.exception("Error queueing %s slow queries", len(records))
@@ -0,0 +1,104 @@
+import random
+
+from celery import shared_task
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db import DatabaseError
+from django.db import connections
+from django.db import transaction
+from django.utils.timezone import now
+from django.utils.timezone import timedelta
+
+from sbily.utils.tasks import default_task_params
+from sbily.utils.tasks import task_response
+
+from .models import RequestProfile
+from .models import SlowQuery
+from .slow_queries import pause_capture
+
+
+@shared_task(**default_task_params("prune_request_profiles", acks_late=True))
+def prune_request_profiles(self) -> dict:
+    """Delete request profiles, and their files, past the retention period."""
+
+    cutoff = now() - timedelta(days=settings.PROFILING_RETENTION_DAYS)
+    count, _ = RequestProfile.objects.filter(created_at__lt=cutoff).delete()
+
+    return task_response(
+        "COMPLETED",
+        f"A total of {count} request profiles were successfully removed.",
+    )
+
+
+def explain_query(sql: str, params, alias: str) -> str:
+    """Run EXPLAIN (ANALYZE, BUFFERS) for a SELECT, rolling back its effects."""
+    if alias not in settings.DATABASES:
+        alias = DEFAULT_DB_ALIAS
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        return ""
+
+    timeout = int(settings.SLOW_QUERY_EXPLAIN_TIMEOUT * 1000)
+    try:
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            cursor.execute(f"SET LOCAL statement_timeout = {timeout}")
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", params)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+            transaction.set_rollback(True, using=alias)
+    except DatabaseError as e:
+        return f"EXPLAIN failed: {e}"
+    return plan
+
+
+@shared_task(
+    **default_task_params("store_slow_queries", autoretry_for=(), max_retries=0),
+)
+def store_slow_queries(self, records: list[dict]) -> dict:
+    """
+    Store captured slow queries, EXPLAIN a sample of the SELECTs and trim the
+    table to the newest `SLOW_QUERY_MAX_ROWS` rows.
+    """
+
+    with pause_capture():
+        count = _store_slow_queries(records)
+
+    return task_response(
+        "COMPLETED",
+        f"A total of {count} slow queries were stored.",
+    )
+
+
+def _store_slow_queries(records: list[dict]) -> int:
+    sample_rate = settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE
+    slow_queries = []
+    for record in records:
+        slow_query = SlowQuery(
+            fingerprint=record["fingerprint"],
+            stack_fingerprint=record["stack_fingerprint"],
+            sql=record["sql"],
+            params=record["params"],
+            duration=record["duration"],
+            database=record["database"],
+            source=record["source"],
+            stack="\n".join(record["stack"]),
+        )
+        is_select = slow_query.sql.lstrip().upper().startswith("SELECT")
+        if is_select and sample_rate and random.randrange(sample_rate) == 0:  # noqa: S311
+            slow_query.explain = explain_query(
+                slow_query.sql,
+                slow_query.params,
+                slow_query.database,
+            )
+        slow_queries.append(slow_query)
+
+    SlowQuery.objects.bulk_create(slow_queries)
+
+    oldest_kept = (
+        SlowQuery.objects.order_by("-id")
+        .values_list("id", flat=True)[settings.SLOW_QUERY_MAX_ROWS - 1 :]
+        .first()
+    )
+    if oldest_kept is not None:
+        SlowQuery.objects.filter(id__lt=oldest_kept).delete()
+
+    return len(slow_queries)
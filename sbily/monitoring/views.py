@@ -0,0 +1,19 @@
+from typing import TYPE_CHECKING
+
+from django.http import HttpResponse
+from django.http import HttpResponseForbidden
+
+from .exposition import CONTENT_TYPE
+from .exposition import has_metrics_token
+from .exposition import render_metrics
+
+if TYPE_CHECKING:
+    from django.http import HttpRequest
+
+
+def metrics(request: HttpRequest):
+    """Expose metrics to Prometheus, scrapers authenticate with METRICS_TOKEN"""
+    authorization = request.headers.get("Authorization", "")
+    if not (request.user.is_staff or has_metrics_token(authorization)):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
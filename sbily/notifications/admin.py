@@ -1,10 +1,12 @@
 from django.contrib import admin
 
+from sbily.utils.admin import ReplicaChangelistMixin
+
 from .models import Notification
 
 
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(ReplicaChangelistMixin):
     list_display = ("title", "type", "user", "is_read", "created_at")
     list_filter = ("type", "user__username", "is_read", "created_at")
     search_fields = ("user__username", "title")
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.6 on 2026-10-19 16:46
+
+from django.db import migrations
+
+from sbily.notifications.utils import render_markdown
+
+
+def populate_content_html(apps, schema_editor):
+    Notification = apps.get_model("notifications", "Notification")
+    notifications = Notification.objects.filter(content_html="").only("id", "content")
+    batch = []
+    for notification in notifications.iterator(chunk_size=1000):
+        notification.content_html = render_markdown(notification.content)
+        batch.append(notification)
+        if len(batch) >= 1000:
+            Notification.objects.bulk_update(batch, ["content_html"])
+            batch = []
+    if batch:
+        Notification.objects.bulk_update(batch, ["content_html"])
+
+def reverse_population(apps, schema_editor):
+    pass
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_notification_content_html_and_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_content_html, reverse_population),
+    ]
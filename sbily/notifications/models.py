@@ -1,7 +1,54 @@
 from django.conf import settings
+from django.core.cache import cache
 from django.db import models
+from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 
+from .utils import render_markdown
+
+UNREAD_COUNT_CACHE_KEY = "notifications:unread_count:{user_id}"
+UNREAD_COUNT_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def get_unread_count(user_id: int) -> int:
+    """Return the cached number of unread notifications for a user."""
+    return cache.get_or_set(
+        UNREAD_COUNT_CACHE_KEY.format(user_id=user_id),
+        lambda: Notification.objects.filter(user_id=user_id, is_read=False).count(),
+        UNREAD_COUNT_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_unread_count(*user_ids: int) -> None:
+    """Drop the cached unread counters once the current transaction commits."""
+    keys = [UNREAD_COUNT_CACHE_KEY.format(user_id=user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class NotificationQuerySet(models.QuerySet):
+    def _user_ids(self) -> list[int]:
+        return list(self.order_by().values_list("user_id", flat=True).distinct())
+
+    def update(self, **kwargs):
+        user_ids = self._user_ids()
+        rows = super().update(**kwargs)
+        invalidate_unread_count(*user_ids)
+        return rows
+
+    def delete(self):
+        user_ids = self._user_ids()
+        deleted = super().delete()
+        invalidate_unread_count(*user_ids)
+        return deleted
+
+    def bulk_create(self, objs, *args, **kwargs):
+        for obj in objs:
+            obj.render_content()
+        created = super().bulk_create(objs, *args, **kwargs)
+        invalidate_unread_count(*{obj.user_id for obj in created})
+        return created
+
 
 class Notification(models.Model):
     SUCCESS = "success"
@@ -29,6 +76,12 @@ class Notification(models.Model):
         help_text=_("Type of notification"),
     )
     content = models.TextField(_("Content"), help_text=_("Notification content"))
+    content_html = models.TextField(
+        _("Content HTML"),
+        blank=True,
+        editable=False,
+        help_text=_("Notification content rendered to HTML"),
+    )
     is_read = models.BooleanField(_("Is Read"), default=False, db_index=True)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -38,14 +91,42 @@ class Notification(models.Model):
     )
     created_at = models.DateTimeField(_("Created At"), auto_now_add=True, db_index=True)
 
+    objects = NotificationQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("Notification")
         verbose_name_plural = _("Notifications")
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["user", "is_read", "created_at"]),
+            models.Index(
+                fields=["user", "-created_at", "-id"],
+                name="notif_user_inbox_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.user.username}"
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "content" in update_fields:
+            self.render_content()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "content_html"}
+        super().save(*args, **kwargs)
+        invalidate_unread_count(self.user_id)
+
+    def delete(self, *args, **kwargs):
+        user_id = self.user_id
+        deleted = super().delete(*args, **kwargs)
+        invalidate_unread_count(user_id)
+        return deleted
+
+    def render_content(self) -> None:
+        """Render the markdown content to sanitized HTML."""
+        self.content_html = render_markdown(self.content)
+
     def mark_as_read(self):
         """Mark notification as read and save."""
         if not self.is_read:
@@ -0,0 +1,42 @@
+from celery import shared_task
+from django.utils.timezone import now
+from django.utils.timezone import timedelta
+
+from sbily.utils.tasks import default_task_params
+from sbily.utils.tasks import task_response
+
+from .models import Notification
+
+READ_NOTIFICATIONS_RETENTION = timedelta(days=90)
+PRUNE_CHUNK_SIZE = 1000
+PRUNE_MAX_CHUNKS = 50
+
+
+@shared_task(**default_task_params("prune_read_notifications", acks_late=True))
+def prune_read_notifications(self) -> dict:
+    """
+    Delete read notifications older than the retention period in chunks.
+
+    If there is still work left after `PRUNE_MAX_CHUNKS` chunks, the task
+    schedules itself again instead of running past its time limit.
+    """
+
+    cutoff = now() - READ_NOTIFICATIONS_RETENTION
+    notifications = Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+
+    total = 0
+    for _ in range(PRUNE_MAX_CHUNKS):
+        ids = list(
+            notifications.order_by().values_list("id", flat=True)[:PRUNE_CHUNK_SIZE],
+        )
+        if not ids:
+            break
+        count, _ = Notification.objects.filter(id__in=ids).delete()
+        total += count
+    else:
+        prune_read_notifications.delay()
+
+    return task_response(
+        "COMPLETED",
+        f"A total of {total} read notifications were successfully removed.",
+    )
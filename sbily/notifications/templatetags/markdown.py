@@ -1,11 +1,12 @@
-import markdown as md
 from django import template
 from django.template.defaultfilters import stringfilter
 
+from sbily.notifications.utils import render_markdown
+
 register = template.Library()
 
 
 @register.filter
 @stringfilter
 def markdown(value):
-    return md.markdown(value, extensions=["markdown.extensions.fenced_code"])
+    return render_markdown(value)
@@ -0,0 +1,35 @@
+import markdown as md
+from django.utils.dateparse import parse_datetime
+
+MARKDOWN_EXTENSIONS = ["markdown.extensions.fenced_code"]
+CURSOR_SEPARATOR = "_"
+
+
+def render_markdown(value: str) -> str:
+    """Render markdown to HTML, escaping any raw HTML in the source."""
+    renderer = md.Markdown(extensions=MARKDOWN_EXTENSIONS)
+    renderer.preprocessors.deregister("html_block")
+    renderer.inlinePatterns.deregister("html")
+    return renderer.convert(value)
+
+
+def encode_cursor(created_at, notification_id: int) -> str:
+    """Encode a `(created_at, id)` position in the inbox as a cursor string."""
+    return f"{created_at.isoformat()}{CURSOR_SEPARATOR}{notification_id}"
+
+
+def decode_cursor(cursor: str | None):
+    """Decode a cursor into a `(created_at, id)` tuple, or None if invalid."""
+    if not cursor:
+        return None
+
+    created_at, _, notification_id = cursor.rpartition(CURSOR_SEPARATOR)
+    try:
+        parsed_created_at = parse_datetime(created_at)
+        parsed_id = int(notification_id)
+    except ValueError:
+        return None
+
+    if parsed_created_at is None:
+        return None
+    return parsed_created_at, parsed_id
@@ -3,10 +3,15 @@ from typing import TYPE_CHECKING
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.db.models import Q
 from django.shortcuts import redirect
 from django.shortcuts import render
 
 from .models import Notification
+from .utils import decode_cursor
+from .utils import encode_cursor
+
+NOTIFICATIONS_PAGE_SIZE = 20
 
 if TYPE_CHECKING:
     from django.http import HttpRequest
@@ -14,8 +19,32 @@ if TYPE_CHECKING:
 
 @login_required
 def my_notifications(request: HttpRequest):
-    notifications = Notification.objects.filter(user=request.user)
-    return render(request, "my_notifications.html", {"notifications": notifications})
+    cursor = request.GET.get("cursor")
+    notifications = Notification.objects.filter(user=request.user).order_by(
+        "-created_at",
+        "-id",
+    )
+
+    if position := decode_cursor(cursor):
+        created_at, notification_id = position
+        notifications = notifications.filter(
+            Q(created_at__lt=created_at)
+            | Q(created_at=created_at, id__lt=notification_id),
+        )
+    else:
+        cursor = None
+
+    page = list(notifications[: NOTIFICATIONS_PAGE_SIZE + 1])
+    next_cursor = None
+    if len(page) > NOTIFICATIONS_PAGE_SIZE:
+        page = page[:NOTIFICATIONS_PAGE_SIZE]
+        next_cursor = encode_cursor(page[-1].created_at, page[-1].id)
+
+    return render(
+        request,
+        "my_notifications.html",
+        {"notifications": page, "cursor": cursor, "next_cursor": next_cursor},
+    )
 
 
 @login_required
@@ -1,7 +1,11 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
 
+from sbily.utils.admin import ReplicaChangelistMixin
+
 from .models import Payment
+from .models import StripeCustomer
+from .models import StripeEvent
 from .models import Subscription
 
 
@@ -53,7 +57,7 @@ class SubscriptionAdmin(admin.ModelAdmin):
 
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(ReplicaChangelistMixin):
     list_display = (
         "user",
         "amount",
@@ -86,3 +90,58 @@ class PaymentAdmin(admin.ModelAdmin):
     def mark_as_refunded(self, request, queryset):
         queryset.update(status=Payment.STATUS_REFUNDED)
         self.message_user(request, _("Selected payments have been marked as refunded."))
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = (
+        "event_id",
+        "type",
+        "customer_id",
+        "status",
+        "attempts",
+        "stripe_created_at",
+        "processed_at",
+    )
+    list_filter = ("status", "type", "stripe_created_at")
+    search_fields = ("event_id", "customer_id")
+    date_hierarchy = "stripe_created_at"
+    readonly_fields = (
+        "event_id",
+        "type",
+        "customer_id",
+        "payload",
+        "stripe_created_at",
+        "received_at",
+        "processed_at",
+        "claimed_until",
+    )
+    actions = ["reprocess_events"]
+
+    @admin.action(description=_("Reprocess selected events"))
+    def reprocess_events(self, request, queryset):
+        from .tasks import process_stripe_event  # noqa: PLC0415
+
+        for event_id in queryset.values_list("event_id", flat=True):
+            process_stripe_event.delay_on_commit(event_id)
+        queryset.update(
+            status=StripeEvent.STATUS_PENDING,
+            attempts=0,
+            claimed_until=None,
+        )
+        self.message_user(request, _("Selected events have been queued."))
+
+
+@admin.register(StripeCustomer)
+class StripeCustomerAdmin(admin.ModelAdmin):
+    list_display = (
+        "user",
+        "customer_id",
+        "card_brand",
+        "card_last4",
+        "balance",
+        "synced_at",
+    )
+    search_fields = ("user__username", "user__email", "customer_id")
+    raw_id_fields = ("user",)
+    readonly_fields = ("synced_at",)
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class PaymentsConfig(AppConfig):
     name = "sbily.payments"
+
+    def ready(self):
+        from .utils import configure_stripe  # noqa: PLC0415
+
+        configure_stripe()
@@ -0,0 +1,249 @@
+"""
+Stub Stripe API and timings behind the `benchmark_stripe` command.
+
+The stub answers every call after a fixed delay, so the latency of a flow
+shows how many of its calls wait on each other: close to one delay when its
+independent calls overlap, close to the sum of its calls when they don't.
+"""
+
+import contextlib
+import json
+import re
+import statistics
+import threading
+import time
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import TYPE_CHECKING
+
+import stripe
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.base import SessionBase
+from django.test import RequestFactory
+from django.utils import timezone
+
+from sbily.users.models import User
+from sbily.users.roles import UserRole
+
+from .models import StripeCustomer
+from .models import Subscription
+from .utils import PlanCycle
+from .utils import PlanType
+from .views import checkout_page
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from collections.abc import Iterator
+
+USERNAME = "benchmark-stripe"
+CUSTOMER_ID = "cus_benchmark"
+PAYMENT_METHOD_ID = "pm_benchmark"
+SUBSCRIPTION_ID = "sub_benchmark"
+PERIOD_DAYS = 30
+
+PAYMENT_METHOD = {
+    "id": PAYMENT_METHOD_ID,
+    "object": "payment_method",
+    "card": {"brand": "visa", "last4": "4242", "exp_month": 12, "exp_year": 2040},
+}
+CUSTOMER = {
+    "id": CUSTOMER_ID,
+    "object": "customer",
+    "balance": 0,
+    "invoice_settings": {"default_payment_method": PAYMENT_METHOD_ID},
+}
+SETUP_INTENT = {
+    "id": "seti_benchmark",
+    "object": "setup_intent",
+    "client_secret": "seti_benchmark_secret",
+}
+
+
+def stub_subscription() -> dict:
+    period_end = timezone.now() + timezone.timedelta(days=PERIOD_DAYS)
+    return {
+        "id": SUBSCRIPTION_ID,
+        "object": "subscription",
+        "status": "active",
+        "items": {
+            "object": "list",
+            "data": [
+                {
+                    "id": "si_benchmark",
+                    "object": "subscription_item",
+                    "current_period_end": int(period_end.timestamp()),
+                    "plan": {"object": "plan", "amount": 1_000},
+                },
+            ],
+        },
+        "latest_invoice": {
+            "object": "invoice",
+            "payments": {"object": "list", "data": []},
+        },
+    }
+
+
+ROUTES: dict[tuple[str, re.Pattern], Callable[[], dict]] = {
+    ("GET", re.compile(r"^/v1/customers/[\w-]+$")): lambda: CUSTOMER,
+    ("GET", re.compile(r"^/v1/payment_methods/[\w-]+$")): lambda: PAYMENT_METHOD,
+    ("GET", re.compile(r"^/v1/subscriptions/[\w-]+$")): stub_subscription,
+    ("POST", re.compile(r"^/v1/subscriptions/[\w-]+$")): stub_subscription,
+    ("POST", re.compile(r"^/v1/setup_intents$")): lambda: SETUP_INTENT,
+}
+
+
+class StubStripeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes, don't wait on delayed ACKs
+    disable_nagle_algorithm = True
+    server: StubStripeServer
+
+    def do_GET(self):
+        self.answer()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.answer()
+
+    def answer(self):
+        self.server.count_call()
+        time.sleep(self.server.delay)
+
+        path = self.path.partition("?")[0]
+        status, body = 404, {"error": {"type": "invalid_request_error"}}
+        for (method, pattern), respond in ROUTES.items():
+            if method == self.command and pattern.match(path):
+                status, body = 200, respond()
+                break
+
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):  # noqa: A002
+        pass
+
+
+class StubStripeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, delay: float):
+        super().__init__(("127.0.0.1", 0), StubStripeHandler)
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def count_call(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+
+@contextlib.contextmanager
+def stub_stripe(delay: float) -> Iterator[StubStripeServer]:
+    """Point the Stripe client at a local stub answering after `delay` seconds."""
+    server = StubStripeServer(delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_base = stripe.api_base
+    stripe.api_base = f"http://127.0.0.1:{server.server_port}"
+    try:
+        yield server
+    finally:
+        stripe.api_base = api_base
+        server.shutdown()
+        server.server_close()
+
+
+def create_customer() -> User:
+    user = User.objects.create(
+        username=USERNAME,
+        email=f"{USERNAME}@example.com",
+        password="!",  # noqa: S106
+        role=UserRole.PREMIUM.value,
+        stripe_customer_id=CUSTOMER_ID,
+    )
+    StripeCustomer.objects.create(
+        user=user,
+        customer_id=CUSTOMER_ID,
+        default_payment_method_id=PAYMENT_METHOD_ID,
+    )
+    Subscription.objects.create(
+        user=user,
+        level=PlanType.PREMIUM.value,
+        stripe_subscription_id=SUBSCRIPTION_ID,
+        status=Subscription.STATUS_ACTIVE,
+        end_date=timezone.now() + timezone.timedelta(days=PERIOD_DAYS),
+        price=Decimal(10),
+    )
+    return user
+
+
+def delete_customer() -> None:
+    User.objects.filter(username=USERNAME).delete()
+
+
+def get_flows(user: User) -> dict[str, Callable[[], object]]:
+    """The checkout and plan change flows to time, as argument-less calls."""
+    factory = RequestFactory()
+
+    def checkout():
+        request = factory.get("/", {"plan": PlanType.BUSINESS.value})
+        request.user = user
+        request.session = SessionBase()
+        request._messages = FallbackStorage(request)  # noqa: SLF001
+        response = checkout_page(request)
+        if response.status_code != 200:  # noqa: PLR2004
+            msg = f"Checkout page answered {response.status_code}"
+            raise RuntimeError(msg)
+
+    def change_subscription():
+        # Back to the plan the flow upgrades from, without calling Stripe
+        Subscription.objects.filter(user=user).update(level=PlanType.PREMIUM.value)
+        result = Subscription.change_subscription(
+            user,
+            PAYMENT_METHOD_ID,
+            PlanType.BUSINESS.value,
+            PlanCycle.MONTHLY.value,
+        )
+        if result["status"] != "success":
+            raise RuntimeError(result.get("error", result["status"]))
+
+    return {
+        "checkout_page": checkout,
+        "update_card_details": lambda: user.update_card_details(PAYMENT_METHOD_ID),
+        "change_subscription": change_subscription,
+    }
+
+
+def time_flow(
+    server: StubStripeServer,
+    name: str,
+    flow: Callable[[], object],
+    repeat: int,
+) -> dict:
+    """Time a flow after a warm-up call, with the Stripe calls it made."""
+    flow()
+    durations = []
+    calls = []
+    for _ in range(repeat):
+        calls_before = server.calls
+        started_at = time.perf_counter()
+        flow()
+        durations.append(time.perf_counter() - started_at)
+        calls.append(server.calls - calls_before)
+
+    delay_ms = server.delay * 1000
+    return {
+        "flow": name,
+        "runs": repeat,
+        "stripe_calls": max(calls),
+        "min_ms": round(min(durations) * 1000, 2),
+        "median_ms": round(statistics.median(durations) * 1000, 2),
+        "max_ms": round(max(durations) * 1000, 2),
+        # What the flow would take with every call waiting on the previous one
+        "sequential_ms": round(max(calls) * delay_ms, 2),
+        "call_ms": round(delay_ms, 2),
+    }
@@ -0,0 +1,77 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+from sbily.payments.benchmark import USERNAME
+from sbily.payments.benchmark import create_customer
+from sbily.payments.benchmark import delete_customer
+from sbily.payments.benchmark import get_flows
+from sbily.payments.benchmark import stub_stripe
+from sbily.payments.benchmark import time_flow
+from sbily.users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the checkout and plan change flows against a local Stripe stub "
+        "answering every call after a fixed delay, and save the results as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--delay",
+            type=int,
+            default=100,
+            help="Milliseconds the stub takes to answer each Stripe call.",
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--output",
+            type=Path,
+            help="JSON file for the results, defaults to a timestamped name.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Run even when DEBUG is off.",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["force"]:
+            msg = "Refusing to create a benchmark customer with DEBUG off, use --force."
+            raise CommandError(msg)
+        if User.objects.filter(username=USERNAME).exists():
+            msg = f"The {USERNAME} user of a previous run exists, delete it first."
+            raise CommandError(msg)
+
+        report = {
+            "created_at": timezone.now().isoformat(),
+            "delay_ms": options["delay"],
+            "repeat": options["repeat"],
+            "max_concurrent_calls": settings.STRIPE_MAX_CONCURRENT_CALLS,
+            "results": [],
+        }
+
+        user = create_customer()
+        try:
+            with stub_stripe(options["delay"] / 1000) as server:
+                for name, flow in get_flows(user).items():
+                    timing = time_flow(server, name, flow, options["repeat"])
+                    report["results"].append(timing)
+                    self.stdout.write(
+                        f"  {name}: {timing['median_ms']} ms median, "
+                        f"{timing['stripe_calls']} Stripe calls "
+                        f"({timing['sequential_ms']} ms one after another)",
+                    )
+        finally:
+            delete_customer()
+
+        output = options["output"] or Path(
+            f"benchmark-stripe-{timezone.now():%Y%m%d-%H%M%S}.json",
+        )
+        output.write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Results saved to {output}"))
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.6 on 2026-10-19 16:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0008_payment_invoice_url'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=255, unique=True, verbose_name='event ID')),
+                ('type', models.CharField(max_length=100, verbose_name='type')),
+                ('customer_id', models.CharField(blank=True, help_text='Customer the event belongs to, used to order processing.', max_length=100, verbose_name='Stripe customer ID')),
+                ('payload', models.JSONField(verbose_name='payload')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processed', 'Processed'), ('failed', 'Failed')], default='pending', max_length=10, verbose_name='status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='attempts')),
+                ('error', models.TextField(blank=True, verbose_name='error')),
+                ('stripe_created_at', models.DateTimeField(verbose_name='Stripe created at')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='received at')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='processed at')),
+            ],
+            options={
+                'verbose_name': 'Stripe event',
+                'verbose_name_plural': 'Stripe events',
+                'ordering': ['-stripe_created_at'],
+                'indexes': [models.Index(fields=['customer_id', 'status', 'stripe_created_at'], name='payments_st_custome_59333e_idx')],
+            },
+        ),
+    ]
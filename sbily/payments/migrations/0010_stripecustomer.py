@@ -0,0 +1,36 @@
+# Generated by Django 6.0.6 on 2026-10-19 16:49
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0009_stripeevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeCustomer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('customer_id', models.CharField(max_length=100, unique=True, verbose_name='Stripe customer ID')),
+                ('default_payment_method_id', models.CharField(blank=True, max_length=100, verbose_name='default payment method ID')),
+                ('card_brand', models.CharField(blank=True, max_length=20, verbose_name='card brand')),
+                ('card_last4', models.CharField(blank=True, max_length=4, verbose_name='card last four digits')),
+                ('card_exp_month', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='card expiration month')),
+                ('card_exp_year', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='card expiration year')),
+                ('balance', models.IntegerField(default=0, help_text='Customer balance in cents.', verbose_name='balance')),
+                ('synced_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='synced at')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stripe_customer_mirror', to=settings.AUTH_USER_MODEL, verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'Stripe customer',
+                'verbose_name_plural': 'Stripe customers',
+            },
+        ),
+    ]
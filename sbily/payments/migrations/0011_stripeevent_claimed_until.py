@@ -0,0 +1,18 @@
+# Generated by Django 6.0.6 on 2026-10-19 18:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0010_stripecustomer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stripeevent',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, help_text='Until when a worker handles the event, others skip it.', null=True, verbose_name='claimed until'),
+        ),
+    ]
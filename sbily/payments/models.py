@@ -1,3 +1,4 @@
+import contextlib
 import logging
 from datetime import datetime
 from decimal import Decimal
@@ -5,10 +6,12 @@ from decimal import Decimal
 import stripe
 from django.db import models
 from django.db import transaction
+from django.db.models import Q
 from django.utils.timezone import now
 from django.utils.timezone import timedelta
 from django.utils.translation import gettext_lazy as _
 
+from sbily.users.entitlements import invalidate_entitlements
 from sbily.users.models import User
 
 from .utils import PlanCycle
@@ -17,6 +20,7 @@ from .utils import current_cycle_is_yearly
 from .utils import get_stripe_price
 from .utils import is_upgrade
 from .utils import one_month_left_until_plan_end
+from .utils import submit_stripe_call
 
 logger = logging.getLogger("payments.models")
 
@@ -104,6 +108,12 @@ class Subscription(models.Model):
             self.user.downgrade_to_free()
 
         super().save(*args, **kwargs)
+        invalidate_entitlements(self.user)
+
+    def delete(self, *args, **kwargs):
+        deleted = super().delete(*args, **kwargs)
+        invalidate_entitlements(self.user)
+        return deleted
 
     @property
     def cycle(self):
@@ -155,7 +165,7 @@ class Subscription(models.Model):
     ):
         """Create a subscription"""
 
-        customer = user.get_stripe_customer()
+        customer_id = StripeCustomer.for_user(user).customer_id
         try:
             user.update_card_details(payment_method_id)
 
@@ -177,7 +187,7 @@ class Subscription(models.Model):
             )
 
             subscription = stripe.Subscription.create(
-                customer=customer.id,
+                customer=customer_id,
                 items=[{"price": price}],
                 metadata={"user_id": user.id, "plan": plan},
                 expand=["latest_invoice.payments"],
@@ -275,13 +285,19 @@ class Subscription(models.Model):
             return {"status": "error", "error": "No active subscription"}
 
         try:
-            user.update_card_details(payment_method_id)
-
             price = get_stripe_price(new_plan, new_plan_cycle)
             if not price:
                 return {"status": "error", "error": "Invalid plan or cycle"}
 
-            stripe_sub = stripe.Subscription.retrieve(sub.stripe_subscription_id)
+            # The current subscription does not depend on the card update,
+            # fetch it while the payment method is being attached.
+            stripe_sub_future = submit_stripe_call(
+                stripe.Subscription.retrieve,
+                sub.stripe_subscription_id,
+            )
+            user.update_card_details(payment_method_id)
+
+            stripe_sub = stripe_sub_future.result()
             stripe_sub_data = stripe_sub.get("items", {}).data[0]
 
             cycle_changed_only = (
@@ -514,3 +530,256 @@ class Payment(models.Model):
         if description:
             self.description = description
         self.save(update_fields=["status", "description"])
+
+
+class StripeEvent(models.Model):
+    """Inbox of verified Stripe webhook events, processed asynchronously."""
+
+    MAX_ATTEMPTS = 5
+
+    STATUS_PENDING = "pending"
+    STATUS_PROCESSED = "processed"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, _("Pending")),
+        (STATUS_PROCESSED, _("Processed")),
+        (STATUS_FAILED, _("Failed")),
+    ]
+
+    event_id = models.CharField(_("event ID"), max_length=255, unique=True)
+    type = models.CharField(_("type"), max_length=100)
+    customer_id = models.CharField(
+        _("Stripe customer ID"),
+        max_length=100,
+        blank=True,
+        help_text=_("Customer the event belongs to, used to order processing."),
+    )
+    payload = models.JSONField(_("payload"))
+    status = models.CharField(
+        _("status"),
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(_("attempts"), default=0)
+    error = models.TextField(_("error"), blank=True)
+    claimed_until = models.DateTimeField(
+        _("claimed until"),
+        null=True,
+        blank=True,
+        help_text=_("Until when a worker handles the event, others skip it."),
+    )
+    stripe_created_at = models.DateTimeField(_("Stripe created at"))
+    received_at = models.DateTimeField(_("received at"), auto_now_add=True)
+    processed_at = models.DateTimeField(_("processed at"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Stripe event")
+        verbose_name_plural = _("Stripe events")
+        ordering = ["-stripe_created_at"]
+        indexes = [
+            models.Index(fields=["customer_id", "status", "stripe_created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.type} - {self.event_id}"
+
+    @classmethod
+    def record(cls, payload: dict) -> tuple[StripeEvent, bool]:
+        """Store a verified event payload, returning (event, created)."""
+        data_object = payload.get("data", {}).get("object", {})
+        customer_id = (
+            data_object.get("id")
+            if data_object.get("object") == "customer"
+            else data_object.get("customer")
+        )
+
+        return cls.objects.get_or_create(
+            event_id=payload["id"],
+            defaults={
+                "type": payload.get("type", ""),
+                "customer_id": customer_id or "",
+                "payload": payload,
+                "stripe_created_at": datetime.fromtimestamp(
+                    payload.get("created", 0),
+                    tz=now().tzinfo,
+                ),
+            },
+        )
+
+    def has_pending_predecessors(self) -> bool:
+        """
+        Check if older events for the same customer still need processing.
+
+        Stripe timestamps have a one-second resolution, events of the same
+        second are processed in the order they were received.
+        """
+        if not self.customer_id:
+            return False
+
+        return (
+            StripeEvent.objects.filter(
+                Q(stripe_created_at__lt=self.stripe_created_at)
+                | Q(stripe_created_at=self.stripe_created_at, pk__lt=self.pk),
+                customer_id=self.customer_id,
+                status__in=[self.STATUS_PENDING, self.STATUS_FAILED],
+                attempts__lt=self.MAX_ATTEMPTS,
+            )
+            .exclude(pk=self.pk)
+            .exists()
+        )
+
+    def is_claimed(self) -> bool:
+        return self.claimed_until is not None and self.claimed_until > now()
+
+    def claim(self, lease: timedelta):
+        """Keep other workers off the event while it is handled"""
+        self.claimed_until = now() + lease
+        self.save(update_fields=["claimed_until"])
+
+    def mark_processed(self):
+        """Mark event as processed"""
+        self.status = self.STATUS_PROCESSED
+        self.attempts += 1
+        self.error = ""
+        self.processed_at = now()
+        self.claimed_until = None
+        self.save(
+            update_fields=[
+                "status",
+                "attempts",
+                "error",
+                "processed_at",
+                "claimed_until",
+            ],
+        )
+
+    def mark_failed(self, error: str):
+        """Mark event as failed"""
+        self.status = self.STATUS_FAILED
+        self.attempts += 1
+        self.error = error
+        self.claimed_until = None
+        self.save(update_fields=["status", "attempts", "error", "claimed_until"])
+
+
+class StripeCustomer(models.Model):
+    """Local mirror of a user's Stripe customer and default payment method."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name="stripe_customer_mirror",
+        verbose_name=_("user"),
+    )
+    customer_id = models.CharField(
+        _("Stripe customer ID"),
+        max_length=100,
+        unique=True,
+    )
+    default_payment_method_id = models.CharField(
+        _("default payment method ID"),
+        max_length=100,
+        blank=True,
+    )
+    card_brand = models.CharField(_("card brand"), max_length=20, blank=True)
+    card_last4 = models.CharField(_("card last four digits"), max_length=4, blank=True)
+    card_exp_month = models.PositiveSmallIntegerField(
+        _("card expiration month"),
+        null=True,
+        blank=True,
+    )
+    card_exp_year = models.PositiveSmallIntegerField(
+        _("card expiration year"),
+        null=True,
+        blank=True,
+    )
+    balance = models.IntegerField(
+        _("balance"),
+        default=0,
+        help_text=_("Customer balance in cents."),
+    )
+    synced_at = models.DateTimeField(_("synced at"), default=now, db_index=True)
+
+    class Meta:
+        verbose_name = _("Stripe customer")
+        verbose_name_plural = _("Stripe customers")
+
+    def __str__(self):
+        return f"{self.user.username} - {self.customer_id}"
+
+    @property
+    def has_payment_method(self) -> bool:
+        """Check if the customer has a default payment method"""
+        return bool(self.default_payment_method_id)
+
+    @classmethod
+    def for_user(cls, user: User, *, refresh: bool = False) -> StripeCustomer:
+        """Return the local mirror of the user's Stripe customer.
+
+        Stripe is only consulted when there is no mirror yet or when
+        `refresh` is set.
+        """
+        if not refresh:
+            with contextlib.suppress(cls.DoesNotExist):
+                return cls.objects.get(user=user)
+
+        return cls.sync_from_stripe(user, user.get_stripe_customer())
+
+    @classmethod
+    def sync_from_stripe(
+        cls,
+        user: User,
+        customer: stripe.Customer,
+        payment_method: stripe.PaymentMethod | None = None,
+    ) -> StripeCustomer:
+        """Create or update the mirror from a Stripe customer object"""
+        default_payment_method = (customer.get("invoice_settings") or {}).get(
+            "default_payment_method",
+        )
+        if default_payment_method and not isinstance(default_payment_method, str):
+            default_payment_method = default_payment_method.id
+
+        defaults = {
+            "customer_id": customer.id,
+            "default_payment_method_id": default_payment_method or "",
+            "balance": customer.get("balance") or 0,
+            "synced_at": now(),
+        }
+
+        current = cls.objects.filter(user=user).first()
+        card_changed = (
+            not current
+            or current.default_payment_method_id
+            != defaults["default_payment_method_id"]
+        )
+        if not default_payment_method:
+            defaults |= {
+                "card_brand": "",
+                "card_last4": "",
+                "card_exp_month": None,
+                "card_exp_year": None,
+            }
+        elif card_changed or payment_method:
+            try:
+                payment_method = payment_method or stripe.PaymentMethod.retrieve(
+                    default_payment_method,
+                )
+            except stripe.StripeError as e:
+                logger.exception(
+                    "Stripe error retrieving payment method: %s",
+                    default_payment_method,
+                    exc_info=e,
+                )
+            else:
+                card = payment_method.get("card") or {}
+                defaults |= {
+                    "card_brand": card.get("brand") or "",
+                    "card_last4": card.get("last4") or "",
+                    "card_exp_month": card.get("exp_month"),
+                    "card_exp_year": card.get("exp_year"),
+                }
+
+        mirror, _ = cls.objects.update_or_create(user=user, defaults=defaults)
+        return mirror
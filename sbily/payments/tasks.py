@@ -0,0 +1,196 @@
+import time
+
+import stripe
+from celery import shared_task
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import now
+from django.utils.timezone import timedelta
+
+from sbily.monitoring.metrics import STRIPE_WEBHOOK_DURATION
+from sbily.monitoring.metrics import STRIPE_WEBHOOK_EVENTS
+from sbily.users.models import User
+from sbily.utils.tasks import default_task_params
+from sbily.utils.tasks import task_response
+
+from .models import StripeCustomer
+from .models import StripeEvent
+from .webhook import handle_stripe_webhook
+
+logger = get_task_logger(__name__)
+
+PREDECESSOR_RETRY_DELAY = 5
+PREDECESSOR_MAX_WAITS = 60
+# Longest a worker handles an event before others may claim it, handlers make
+# a few Stripe calls bounded by the client timeouts
+EVENT_LEASE = timedelta(minutes=5)
+# Events left unprocessed longer than the predecessor wait are queued again
+STALE_EVENT_AGE = timedelta(minutes=10)
+
+CUSTOMER_MIRROR_MAX_AGE = timedelta(days=1)
+CUSTOMER_RECONCILE_BATCH_SIZE = 100
+
+
+@shared_task(
+    **default_task_params(
+        "process_stripe_event",
+        acks_late=True,
+        max_retries=StripeEvent.MAX_ATTEMPTS,
+    ),
+)
+def process_stripe_event(self, event_id: str, waits: int = 0) -> dict:
+    """
+    Process a Stripe event stored in the webhook inbox.
+
+    Events already processed are skipped, and events of a customer wait for
+    that customer's older events, so retries and duplicate deliveries are safe.
+    The row lock is only held to claim the event, the Stripe calls of the
+    handlers run without it.
+    """
+    error = None
+
+    with transaction.atomic():
+        try:
+            event = StripeEvent.objects.select_for_update(skip_locked=True).get(
+                event_id=event_id,
+            )
+        except StripeEvent.DoesNotExist:
+            return task_response(
+                "SKIPPED",
+                "Event not found or being processed by another worker.",
+                event_id=event_id,
+            )
+
+        if event.status == StripeEvent.STATUS_PROCESSED:
+            return task_response(
+                "SKIPPED",
+                "Event already processed.",
+                event_id=event_id,
+            )
+
+        if event.is_claimed():
+            return task_response(
+                "SKIPPED",
+                "Event being processed by another worker.",
+                event_id=event_id,
+            )
+
+        if event.has_pending_predecessors():
+            if waits >= PREDECESSOR_MAX_WAITS:
+                return task_response(
+                    "SKIPPED",
+                    "Older events of the customer still pending, left to requeue.",
+                    event_id=event_id,
+                )
+            # Queued again rather than retried, waiting must not use up the
+            # retries of failed attempts
+            process_stripe_event.apply_async(
+                (event_id,),
+                {"waits": waits + 1},
+                countdown=PREDECESSOR_RETRY_DELAY,
+            )
+            return task_response(
+                "SKIPPED",
+                "Waiting for older events of the customer.",
+                event_id=event_id,
+            )
+
+        event.claim(EVENT_LEASE)
+
+    stripe_event = stripe.Event.construct_from(
+        event.payload,
+        settings.STRIPE_SECRET_KEY,
+    )
+    started_at = time.perf_counter()
+    # Handlers call Stripe and are written to be run again, their writes are
+    # not rolled back when a later call fails
+    try:
+        handle_stripe_webhook(stripe_event)
+    except Exception as e:
+        logger.exception("Error handling Stripe event %s", event_id)
+        event.mark_failed(str(e))
+        error = e
+    else:
+        event.mark_processed()
+    STRIPE_WEBHOOK_DURATION.observe(
+        time.perf_counter() - started_at,
+        type=event.type,
+    )
+    STRIPE_WEBHOOK_EVENTS.inc(
+        type=event.type,
+        outcome="failed" if error else "processed",
+    )
+
+    if error:
+        raise error
+
+    return task_response(
+        "COMPLETED",
+        f"Stripe event {event.type} processed.",
+        event_id=event_id,
+    )
+
+
+@shared_task(**default_task_params("requeue_stripe_events", acks_late=True))
+def requeue_stripe_events(self) -> dict:
+    """
+    Queue again the events left pending or failed, either never queued because
+    the broker was unreachable or given up on while waiting for predecessors.
+    """
+    event_ids = list(
+        StripeEvent.objects.filter(
+            status__in=[StripeEvent.STATUS_PENDING, StripeEvent.STATUS_FAILED],
+            attempts__lt=StripeEvent.MAX_ATTEMPTS,
+            received_at__lt=now() - STALE_EVENT_AGE,
+        )
+        .order_by("stripe_created_at", "pk")
+        .values_list("event_id", flat=True),
+    )
+    for event_id in event_ids:
+        process_stripe_event.delay(event_id)
+
+    return task_response(
+        "COMPLETED",
+        f"A total of {len(event_ids)} Stripe events were queued again.",
+    )
+
+
+@shared_task(**default_task_params("reconcile_stripe_customers", acks_late=True))
+def reconcile_stripe_customers(self) -> dict:
+    """
+    Refresh stale or missing Stripe customer mirrors from Stripe.
+
+    Webhooks keep the mirrors current; this catches any event that was missed.
+    At most `CUSTOMER_RECONCILE_BATCH_SIZE` customers are refreshed per run.
+    """
+    stale_before = now() - CUSTOMER_MIRROR_MAX_AGE
+    users = (
+        User.objects.exclude(stripe_customer_id="")
+        .filter(
+            Q(stripe_customer_mirror__isnull=True)
+            | Q(stripe_customer_mirror__synced_at__lt=stale_before),
+        )
+        .order_by("stripe_customer_mirror__synced_at")[:CUSTOMER_RECONCILE_BATCH_SIZE]
+    )
+
+    synced = 0
+    for user in users:
+        try:
+            customer = stripe.Customer.retrieve(user.stripe_customer_id)
+        except stripe.StripeError:
+            logger.exception("Failed to retrieve Stripe customer for %s", user.username)
+            continue
+
+        if customer.get("deleted"):
+            StripeCustomer.objects.filter(user=user).delete()
+            continue
+
+        StripeCustomer.sync_from_stripe(user, customer)
+        synced += 1
+
+    return task_response(
+        "COMPLETED",
+        f"A total of {synced} Stripe customers were successfully reconciled.",
+    )
@@ -1,6 +1,9 @@
+from concurrent.futures import ThreadPoolExecutor
 from enum import StrEnum
+from functools import cache
 from typing import TYPE_CHECKING
 
+import stripe
 from django.conf import settings
 from django.utils.timezone import now
 from django.utils.timezone import timedelta
@@ -10,6 +13,7 @@ from sbily.utils.errors import bad_request_error
 
 if TYPE_CHECKING:
     from collections.abc import Callable
+    from concurrent.futures import Future
 
     from sbily.users.models import User
 
@@ -31,6 +35,37 @@ class PlanCycle(StrEnum):
     YEARLY = "yearly"
 
 
+def configure_stripe():
+    """Configure the Stripe client shared by every request and task.
+
+    The requests based client keeps one keep-alive session per thread, so the
+    pool threads used by `submit_stripe_call` reuse their connections as well.
+    """
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    stripe.api_version = settings.STRIPE_API_VERSION
+    stripe.max_network_retries = settings.STRIPE_MAX_NETWORK_RETRIES
+    stripe.default_http_client = stripe.RequestsClient(
+        timeout=(settings.STRIPE_CONNECT_TIMEOUT, settings.STRIPE_READ_TIMEOUT),
+    )
+
+
+@cache
+def _stripe_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(
+        max_workers=settings.STRIPE_MAX_CONCURRENT_CALLS,
+        thread_name_prefix="stripe",
+    )
+
+
+def submit_stripe_call(fn: Callable, *args, **kwargs) -> Future:
+    """Run a Stripe API call in the background and return its future.
+
+    Only pass calls that talk to Stripe: the pool threads have their own
+    database connections and would run outside the caller's transaction.
+    """
+    return _stripe_executor().submit(fn, *args, **kwargs)
+
+
 def is_upgrade(current_plan: str, new_plan: str) -> bool:
     """Check if the new plan is an upgrade from the current plan."""
     plan_hierarchy = {
@@ -1,3 +1,4 @@
+import json
 import logging
 from typing import TYPE_CHECKING
 
@@ -17,21 +18,21 @@ from sbily.utils.errors import BadRequestError
 from sbily.utils.errors import bad_request_error
 from sbily.utils.urls import redirect_with_tab
 
+from .models import StripeCustomer
+from .models import StripeEvent
 from .models import Subscription
+from .tasks import process_stripe_event
 from .utils import PlanCycle
 from .utils import PlanType
 from .utils import calculate_unused_time_discount
 from .utils import current_cycle_is_yearly
 from .utils import is_upgrade
+from .utils import submit_stripe_call
 from .utils import validate_plan_selection
-from .webhook import handle_stripe_webhook
 
 if TYPE_CHECKING:
     from sbily.users.models import User
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
-stripe.api_version = settings.STRIPE_API_VERSION
-
 logger = logging.getLogger("users.views")
 
 
@@ -49,11 +50,12 @@ def checkout_page(request: HttpRequest):
         user: User = request.user
         validate_plan_selection(plan, plan_cycle, user)
 
-        customer = user.get_stripe_customer()
-        default_payment_method = customer.invoice_settings.default_payment_method
+        customer = StripeCustomer.for_user(user)
+        default_payment_method = customer.default_payment_method_id
 
-        setup_intent = stripe.SetupIntent.create(
-            customer=customer.id,
+        setup_intent = submit_stripe_call(
+            stripe.SetupIntent.create,
+            customer=customer.customer_id,
             payment_method_types=["card"],
         )
 
@@ -70,7 +72,6 @@ def checkout_page(request: HttpRequest):
         current_cycle = current_cycle if plan == user.user_level else None
 
         context = {
-            "client_secret": setup_intent.client_secret,
             "redirect_url": request.build_absolute_uri(reverse("finalize_checkout")),
             "plan": plan,
             "plan_cycle": plan_cycle,
@@ -80,6 +81,7 @@ def checkout_page(request: HttpRequest):
             "discount_amount": calculate_unused_time_discount(user, plan),
             "default_payment_method": default_payment_method,
         }
+        context["client_secret"] = setup_intent.result().client_secret
         return render(request, "checkout.html", context)
     except BadRequestError as e:
         messages.error(request, e.message)
@@ -289,9 +291,9 @@ def resume_plan(request: HttpRequest):
 def add_payment_method(request: HttpRequest):
     """Add a new payment method to the user's account"""
     try:
-        customer = request.user.get_stripe_customer()
+        customer = StripeCustomer.for_user(request.user)
         setup_intent = stripe.SetupIntent.create(
-            customer=customer.id,
+            customer=customer.customer_id,
             payment_method_types=["card"],
         )
 
@@ -328,12 +330,12 @@ def payment_method_added(request: HttpRequest):
 
 @csrf_exempt
 def stripe_webhook(request):
-    """Handle Stripe webhook events"""
+    """Verify Stripe webhook events and queue them for processing"""
     payload = request.body
     sig_header = request.headers.get("stripe-signature")
 
     try:
-        event = stripe.Webhook.construct_event(
+        stripe.Webhook.construct_event(
             payload,
             sig_header,
             settings.STRIPE_WEBHOOK_SECRET,
@@ -346,8 +348,12 @@ def stripe_webhook(request):
         return HttpResponse(status=400)
 
     try:
-        handle_stripe_webhook(event)
+        stripe_event, _ = StripeEvent.record(json.loads(payload))
+        # Redeliveries queue the event again, in case the first one never
+        # reached the broker
+        if stripe_event.status != StripeEvent.STATUS_PROCESSED:
+            process_stripe_event.delay_on_commit(stripe_event.event_id)
         return JsonResponse({"status": "success"})
     except Exception as e:
-        logger.exception("Error handling Stripe webhook", exc_info=e)
+        logger.exception("Error storing Stripe webhook event", exc_info=e)
         return JsonResponse({"status": "error", "message": str(e)}, status=500)
@@ -9,6 +9,7 @@ from django.utils.timezone import now
 from sbily.users.models import User
 
 from .models import Payment
+from .models import StripeCustomer
 from .models import Subscription
 from .utils import PlanType
 
@@ -252,6 +253,7 @@ def handle_customer_updated(customer: Customer):
             )
             user.customer_balance = customer.balance or 0
             user.save(update_fields=["customer_balance"])
+            StripeCustomer.sync_from_stripe(user, customer)
         except User.DoesNotExist:
             logger.warning(
                 "Customer updated event received for non-existent user: %s",
@@ -275,6 +277,7 @@ def handle_customer_deleted(customer: Customer):
                     "customer_balance",
                 ],
             )
+            StripeCustomer.objects.filter(user=user).delete()
         except User.DoesNotExist:
             logger.warning(
                 "Customer deleted event received for non-existent user: %s",
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class UsersConfig(AppConfig):
     name = "sbily.users"
+
+    def ready(self):
+        from . import signals  # noqa: F401, PLC0415
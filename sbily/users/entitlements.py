@@ -0,0 +1,94 @@
+from dataclasses import asdict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.timezone import now
+
+from .roles import UserRole
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from .models import User
+
+# Versioned, entries cached by an older release have other fields
+ENTITLEMENTS_CACHE_KEY = "users:entitlements:v2:{user_id}"
+ENTITLEMENTS_CACHE_TIMEOUT = 60 * 60
+
+DEFAULT_RETENTION_DAYS = 30
+RETENTION_DAYS = {
+    UserRole.PREMIUM.value: 365,
+    UserRole.BUSINESS.value: 365 * 3,
+    UserRole.ADVANCED.value: 365 * 5,
+}
+
+
+@dataclass(frozen=True, slots=True)
+class Entitlements:
+    """Snapshot of what a user is allowed to do on their current plan."""
+
+    plan: str
+    subscription_active: bool
+    retention_days: int | None
+    advanced_statistics: bool
+
+
+def compute_entitlements(user: User) -> tuple[Entitlements, int]:
+    """Compute the entitlements of a user and how long they stay valid."""
+    subscription_active = user.subscription_active
+    retention_days = (
+        None
+        if user.role == UserRole.ADMIN.value
+        else RETENTION_DAYS.get(user.role, DEFAULT_RETENTION_DAYS)
+    )
+
+    timeout = ENTITLEMENTS_CACHE_TIMEOUT
+    if subscription_active:
+        seconds_left = int((user.subscription.end_date - now()).total_seconds())
+        timeout = max(1, min(timeout, seconds_left))
+
+    entitlements = Entitlements(
+        plan=(subscription_active and user.subscription.level) or user.role,
+        subscription_active=subscription_active,
+        retention_days=retention_days,
+        advanced_statistics=user.has_perm("links.view_advanced_statistics"),
+    )
+    return entitlements, timeout
+
+
+def get_entitlements(user: User) -> Entitlements:
+    """Return the entitlements of a user.
+
+    The snapshot is memoized on the user instance and cached across requests,
+    so checking it costs at most one cache read per request.
+    """
+    if (entitlements := getattr(user, "_entitlements", None)) is not None:
+        return entitlements
+
+    key = ENTITLEMENTS_CACHE_KEY.format(user_id=user.pk)
+    if data := cache.get(key):
+        entitlements = Entitlements(**data)
+    else:
+        entitlements, timeout = compute_entitlements(user)
+        cache.set(key, asdict(entitlements), timeout)
+
+    user._entitlements = entitlements  # noqa: SLF001
+    return entitlements
+
+
+def invalidate_entitlements(user: User) -> None:
+    """Drop the cached entitlements of a user once the transaction commits."""
+    user.__dict__.pop("_entitlements", None)
+    user.__dict__.pop("_perm_cache", None)
+    user.__dict__.pop("_user_perm_cache", None)
+    key = ENTITLEMENTS_CACHE_KEY.format(user_id=user.pk)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def invalidate_entitlements_of(user_ids: Iterable[int]) -> None:
+    """Drop the cached entitlements of users by id, for changes made in bulk."""
+    keys = [ENTITLEMENTS_CACHE_KEY.format(user_id=user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -14,6 +14,9 @@ from django.utils.timezone import now
 from django.utils.timezone import timedelta
 from django.utils.translation import gettext_lazy as _
 
+from .entitlements import Entitlements
+from .entitlements import get_entitlements
+from .entitlements import invalidate_entitlements
 from .roles import ROLE_CHOICES
 from .roles import LinkLimitMapping
 from .roles import UserLinkLimit
@@ -94,20 +97,25 @@ class User(AbstractUser):
         """Returns the user's level"""
         return (self.subscription_active and self.subscription.level) or self.role
 
+    @property
+    def entitlements(self) -> Entitlements:
+        """Returns the cached entitlements snapshot for the user"""
+        return get_entitlements(self)
+
     @property
     def is_premium(self) -> bool:
         """Check if the user has a premium subscription"""
-        return self.user_level == UserRole.PREMIUM.value
+        return self.entitlements.plan == UserRole.PREMIUM.value
 
     @property
     def is_business(self) -> bool:
         """Check if the user has a business subscription"""
-        return self.user_level == UserRole.BUSINESS.value
+        return self.entitlements.plan == UserRole.BUSINESS.value
 
     @property
     def is_advanced(self) -> bool:
         """Check if the user has an advanced subscription"""
-        return self.user_level == UserRole.ADVANCED.value
+        return self.entitlements.plan == UserRole.ADVANCED.value
 
     @property
     def remaining_monthly_link_limit(self) -> int:
@@ -164,6 +172,7 @@ class User(AbstractUser):
         self.user_permissions.add(
             Permission.objects.get(codename="view_advanced_statistics"),
         )
+        invalidate_entitlements(self)
 
     @transaction.atomic
     def downgrade_to_free(self) -> None:
@@ -183,6 +192,7 @@ class User(AbstractUser):
         self.user_permissions.remove(
             Permission.objects.get(codename="view_advanced_statistics"),
         )
+        invalidate_entitlements(self)
 
     def get_full_name(self) -> str:
         """Return user's full name or username if not set"""
@@ -215,20 +225,26 @@ class User(AbstractUser):
         )
 
     def get_unread_notifications_count(self) -> int:
-        """Get count of unread notifications for user."""
-        return self.notifications.filter(is_read=False).count()
+        """Get count of unread notifications for user.
+
+        The count is read from the cache and memoized on the instance, so it
+        costs at most one cache read per request.
+        """
+        if not hasattr(self, "_unread_notifications_count"):
+            from sbily.notifications.models import get_unread_count  # noqa: PLC0415
+
+            self._unread_notifications_count = get_unread_count(self.pk)
+        return self._unread_notifications_count
 
     def has_valid_payment_method(self) -> bool:
         """Check if user has a valid payment method in Stripe"""
+        from sbily.payments.models import StripeCustomer  # noqa: PLC0415
+
         if not self.stripe_customer_id:
             return False
 
         try:
-            payment_methods = stripe.PaymentMethod.list(
-                customer=self.stripe_customer_id,
-                type="card",
-            )
-            return len(payment_methods.data) > 0
+            return StripeCustomer.for_user(self).has_payment_method
         except stripe.StripeError as e:
             logger.exception(
                 "Stripe error checking payment methods: %s",
@@ -260,10 +276,22 @@ class User(AbstractUser):
 
     def update_card_details(self, payment_method_id: str) -> None | str:
         """Update user card details based on payment method"""
+        from sbily.payments.models import StripeCustomer  # noqa: PLC0415
+        from sbily.payments.utils import submit_stripe_call  # noqa: PLC0415
+
         try:
+            customer_future = (
+                submit_stripe_call(stripe.Customer.retrieve, self.stripe_customer_id)
+                if self.stripe_customer_id
+                else None
+            )
             pm = stripe.PaymentMethod.retrieve(payment_method_id)
 
-            customer = self.get_stripe_customer()
+            customer = None
+            if customer_future is not None:
+                with contextlib.suppress(stripe.StripeError):
+                    customer = customer_future.result()
+            customer = customer or self.get_stripe_customer()
             default_payment_method = customer.invoice_settings.get(
                 "default_payment_method",
             )
@@ -274,7 +302,7 @@ class User(AbstractUser):
                     payment_method_id,
                     customer=customer.id,
                 )
-                stripe.Customer.modify(
+                customer = stripe.Customer.modify(
                     customer.id,
                     invoice_settings={
                         "default_payment_method": payment_method_id,
@@ -283,6 +311,7 @@ class User(AbstractUser):
 
             self.card_last_four_digits = pm.card.last4
             self.save(update_fields=["card_last_four_digits"])
+            StripeCustomer.sync_from_stripe(self, customer, pm)
         except stripe.StripeError as e:
             logger.exception(
                 "Stripe error updating card details: %s",
@@ -0,0 +1,48 @@
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .entitlements import invalidate_entitlements
+from .entitlements import invalidate_entitlements_of
+from .models import User
+
+# Fields the entitlements are computed from, besides the permissions
+ENTITLEMENT_FIELDS = frozenset({"role", "is_active", "is_superuser"})
+
+
+@receiver(post_save, sender=User)
+def invalidate_saved_user_entitlements(sender, instance: User, **kwargs):
+    # The admin saves every field, plan changes name the ones they update
+    update_fields = kwargs["update_fields"]
+    if kwargs["created"] or (
+        update_fields is not None and ENTITLEMENT_FIELDS.isdisjoint(update_fields)
+    ):
+        return
+    invalidate_entitlements(instance)
+
+
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_user_permissions_entitlements(sender, instance, action, **kwargs):
+    if kwargs["reverse"]:
+        # A permission or group given to or taken from users
+        if action in {"post_add", "post_remove"}:
+            invalidate_entitlements_of(kwargs["pk_set"])
+        elif action == "pre_clear":
+            invalidate_entitlements_of(
+                instance.user_set.values_list("pk", flat=True),
+            )
+    elif action in {"post_add", "post_remove", "post_clear"}:
+        invalidate_entitlements(instance)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_group_permissions_entitlements(sender, instance, action, **kwargs):
+    if action not in {"post_add", "post_remove", "post_clear"}:
+        return
+    groups = kwargs["pk_set"] if kwargs["reverse"] else [instance.pk]
+    if groups:
+        invalidate_entitlements_of(
+            User.objects.filter(groups__in=groups).values_list("pk", flat=True),
+        )
@@ -1,5 +1,11 @@
+from datetime import datetime
+
+from celery import group
 from celery import shared_task
 from celery.utils.log import get_task_logger
+from django.db import transaction
+from django.db.models import Max
+from django.db.models import Min
 from django.template.loader import render_to_string
 from django.utils.timezone import now
 from django.utils.timezone import timedelta
@@ -11,9 +17,12 @@ from sbily.utils.tasks import task_response
 from .models import Token
 from .models import User
 from .utils.emails import send_email
+from .utils.emails import send_email_to_users
 
 logger = get_task_logger(__name__)
 
+MONTHLY_RESET_CHUNK_SIZE = 500
+
 
 @shared_task(**default_task_params("send_welcome_email"))
 def send_welcome_email(self, user_id: int):
@@ -186,43 +195,138 @@ def send_deleted_account_email(self, user_email: int, username: str):
 
 @shared_task(**default_task_params("reset_monthly_link_limits", acks_late=True))
 def reset_user_monthly_link_limits(self) -> dict:
-    """Reset users monthly link limits and update last reset timestamp."""
+    """
+    Fan out the monthly link limit reset over chunks of user ids.
+
+    Each chunk is handled by `reset_user_monthly_link_limits_chunk`, so a retry
+    only touches the users of that chunk.
+    """
 
     current_time = now()
 
-    users = User.objects.filter(
+    bounds = User.objects.filter(
         last_monthly_limit_reset__lte=current_time - timedelta(days=30),
-    )
-    users_list = list(users)
+    ).aggregate(min_id=Min("id"), max_id=Max("id"))
+    if bounds["min_id"] is None:
+        return task_response("COMPLETED", "No users to reset monthly link limits.")
+
+    chunks = [
+        reset_user_monthly_link_limits_chunk.s(
+            start_id,
+            start_id + MONTHLY_RESET_CHUNK_SIZE,
+            current_time.isoformat(),
+        )
+        for start_id in range(
+            bounds["min_id"],
+            bounds["max_id"] + 1,
+            MONTHLY_RESET_CHUNK_SIZE,
+        )
+    ]
+    group(chunks).apply_async()
 
-    count = users.update(
-        monthly_limit_links_used=0,
-        last_monthly_limit_reset=current_time,
+    return task_response(
+        "COMPLETED",
+        f"Monthly link limits reset dispatched in {len(chunks)} chunks.",
+        chunks=len(chunks),
     )
 
-    for user in users_list:
-        try:
-            user.email_user(
-                "Your monthly link limit has been reset",
-                "emails/monthly-link-limit-reset.html",
-            )
 
-            notification_content = render_to_string(
-                "notifications/monthly-link-limit-reset.md",
-                {"name": user.get_short_name()},
-            )
-            Notification.objects.create(
-                user=user,
-                title="Monthly link limit reset",
-                content=notification_content,
+@shared_task(
+    **default_task_params("reset_monthly_link_limits_chunk", acks_late=True),
+)
+def reset_user_monthly_link_limits_chunk(
+    self,
+    start_id: int,
+    end_id: int,
+    reset_at: str,
+) -> dict:
+    """
+    Reset monthly link limits for users with ids in [start_id, end_id).
+
+    Users are reset and notified in a single transaction, and only users that
+    are still due are selected, so retrying a chunk never notifies twice.
+    """
+
+    current_time = datetime.fromisoformat(reset_at)
+
+    with transaction.atomic():
+        users = list(
+            User.objects.select_for_update(skip_locked=True)
+            .filter(
+                id__gte=start_id,
+                id__lt=end_id,
+                last_monthly_limit_reset__lte=current_time - timedelta(days=30),
             )
-        except Exception:
-            logger.exception(
-                "Failed to create notification or send monthly link limit reset email to %s",  # noqa: E501
-                user.username,
+            .only("id", "username", "first_name"),
+        )
+        if not users:
+            return task_response(
+                "COMPLETED",
+                "No users to reset in this chunk.",
+                start_id=start_id,
+                end_id=end_id,
             )
 
+        user_ids = [user.id for user in users]
+        count = User.objects.filter(id__in=user_ids).update(
+            monthly_limit_links_used=0,
+            last_monthly_limit_reset=current_time,
+        )
+
+        Notification.objects.bulk_create(
+            [
+                Notification(
+                    user=user,
+                    title="Monthly link limit reset",
+                    content=render_to_string(
+                        "notifications/monthly-link-limit-reset.md",
+                        {"name": user.get_short_name()},
+                    ),
+                )
+                for user in users
+            ],
+        )
+
+        send_monthly_link_limit_reset_emails.delay_on_commit(user_ids)
+
     return task_response(
         "COMPLETED",
         f"Monthly link limits successfully reset for {count} users.",
+        start_id=start_id,
+        end_id=end_id,
+    )
+
+
+@shared_task(**default_task_params("send_monthly_link_limit_reset_emails"))
+def send_monthly_link_limit_reset_emails(self, user_ids: list[int]) -> dict:
+    """
+    Send the monthly link limit reset email to a batch of users.
+
+    The whole batch shares one backend connection. Failures are logged instead
+    of retrying the task, so a failing batch is never partially emailed twice.
+    """
+    users = User.objects.filter(id__in=user_ids).only(
+        "id",
+        "username",
+        "first_name",
+        "email",
+    )
+    try:
+        sent = send_email_to_users(
+            users,
+            "Your monthly link limit has been reset",
+            "emails/monthly-link-limit-reset.html",
+        )
+    except Exception as e:
+        logger.exception("Failed to send monthly link limit reset emails")
+        return task_response(
+            "FAILED",
+            "Failed to send monthly link limit reset emails.",
+            error=str(e),
+            user_ids=user_ids,
+        )
+
+    return task_response(
+        "COMPLETED",
+        f"Monthly link limit reset email sent to {sent} users.",
     )
@@ -1,16 +1,47 @@
+from functools import cache
 from typing import TYPE_CHECKING
 
 from django.conf import settings
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from django.core.mail import EmailMultiAlternatives
+from django.core.mail import get_connection
+from django.template.loader import get_template
 from django.utils.timezone import now
 
 if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from django.template.backends.django import Template
+
     from sbily.users.models import User
 
 BASE_URL: str = settings.BASE_URL or ""
 
 
+@cache
+def get_email_template(template: str) -> Template:
+    """Return the compiled email template, loading it once per process."""
+    return get_template(template)
+
+
+def get_base_context() -> dict[str, str]:
+    """Return the context shared by every email rendered at this moment."""
+    date_now = now().strftime("%B %d, %Y at %H:%M")
+    return {"BASE_URL": BASE_URL.rstrip("/"), "now": date_now}
+
+
+def build_email(
+    subject: str,
+    template: Template,
+    recipient_list: list[str],
+    context: dict,
+) -> EmailMultiAlternatives:
+    """Render a template into an email message ready to be sent."""
+    message = template.render(context)
+    email = EmailMultiAlternatives(subject=subject, body=message, to=recipient_list)
+    email.attach_alternative(message, "text/html")
+    return email
+
+
 def send_email(subject: str, template: str, recipient_list: list[str], **kwargs):
     """Send an email to a list of recipients.
 
@@ -21,18 +52,9 @@ def send_email(subject: str, template: str, recipient_list: list[str], **kwargs)
         **kwargs: Additional context data for the email template.
     """
 
-    date_now = now().strftime("%B %d, %Y at %H:%M")
-    context = {"BASE_URL": BASE_URL.rstrip("/"), "now": date_now} | kwargs
-    message = render_to_string(template, context)
-
-    send_mail(
-        subject=subject,
-        message=message,
-        from_email=None,
-        recipient_list=recipient_list,
-        fail_silently=False,
-        html_message=message,
-    )
+    context = get_base_context() | kwargs
+    email = build_email(subject, get_email_template(template), recipient_list, context)
+    email.send(fail_silently=False)
 
 
 def send_email_to_user(user: User, subject: str, template: str, **kwargs):
@@ -51,3 +73,43 @@ def send_email_to_user(user: User, subject: str, template: str, **kwargs):
     context = {"user": user, "name": user.get_short_name()} | kwargs
 
     send_email(subject, template, [user.email], **context)
+
+
+def send_email_to_users(
+    users: Iterable[User],
+    subject: str,
+    template: str,
+    **kwargs,
+) -> int:
+    """Send the same email to many users over a single backend connection.
+
+    The template is compiled once and the shared context is built once for the
+    whole batch; only the per-user context is rendered for each message.
+
+    Args:
+        users: Users to send the email to. Users without an email are skipped.
+        subject: Email subject line.
+        template: Path to the email template.
+        **kwargs: Additional context data for the email template.
+
+    Returns:
+        int: The number of messages sent.
+    """
+    compiled_template = get_email_template(template)
+    base_context = get_base_context() | kwargs
+
+    emails = [
+        build_email(
+            subject,
+            compiled_template,
+            [user.email],
+            base_context | {"user": user, "name": user.get_short_name()},
+        )
+        for user in users
+        if user.email
+    ]
+    if not emails:
+        return 0
+
+    with get_connection(fail_silently=False) as connection:
+        return connection.send_messages(emails) or 0
@@ -4,7 +4,6 @@ import contextlib
 import logging
 
 import stripe
-from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
@@ -30,8 +29,6 @@ from .tasks import send_email_changed_email
 from .tasks import send_email_verification
 from .tasks import send_password_changed_email
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
-
 logger = logging.getLogger("users.views")
 
 
@@ -48,10 +45,10 @@ def my_account(request: HttpRequest):
     if form.is_valid():
         if form.has_changed():
             form.save()
-            if customer := user.get_stripe_customer():
+            if customer_id := user.stripe_customer_id:
                 with contextlib.suppress(stripe.StripeError):
-                    customer.modify(
-                        customer.id,
+                    stripe.Customer.modify(
+                        customer_id,
                         name=user.get_full_name(),
                         metadata={"username": user.username},
                     )
@@ -118,9 +115,9 @@ def change_email(request: HttpRequest, token: str):
             user.save(update_fields=["email", "email_verified"])
             token_obj.mark_as_used()
 
-        if customer := user.get_stripe_customer():
+        if customer_id := user.stripe_customer_id:
             with contextlib.suppress(stripe.StripeError):
-                customer.modify(customer.id, email=new_email)
+                stripe.Customer.modify(customer_id, email=new_email)
 
         token, _ = Token.get_or_create_for_user(user, Token.TYPE_EMAIL_VERIFICATION)
         send_email_changed_email.delay_on_commit(token.id, old_email)
@@ -242,15 +239,15 @@ def delete_account(request: HttpRequest):
         if user.username != username or not user.check_password(password):
             bad_request_error("Incorrect username or password")
 
-        customer = user.get_stripe_customer()
+        customer_id = user.stripe_customer_id
 
         user_email = user.email
         send_deleted_account_email.delay_on_commit(user_email, username)
         user.delete()
 
-        if customer:
+        if customer_id:
             try:
-                customer.delete()
+                stripe.Customer.delete(customer_id)
             except stripe.StripeError as e:
                 logger.warning(
                     "StripeError encountered while deleting customer's account for user %s: %s",  # noqa: E501
@@ -0,0 +1,17 @@
+from django.contrib import admin
+
+from .db import use_replica
+
+
+class ReplicaChangelistMixin(admin.ModelAdmin):
+    """Render changelists from a read replica.
+
+    Only GET requests are routed, bulk actions are posted to the changelist
+    and must keep reading what they are about to change from the primary.
+    """
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != "GET":
+            return super().changelist_view(request, extra_context)
+        with use_replica(f"user:{request.user.pk}"):
+            return super().changelist_view(request, extra_context)
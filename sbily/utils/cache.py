@@ -0,0 +1,210 @@
+"""
+Cached loads that run once per key, however many requests miss together.
+
+Concurrent misses in a process share one load, and processes take a short
+cache lock so a single one runs the loader while the others wait for the
+value it stores. Entries are refreshed before they expire with a probability
+growing as expiry nears (XFetch), so a hot key never expires for everyone at
+the same time. Invalidating a key changes its generation, and loads started
+under an older generation don't store what they read.
+"""
+
+import math
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import TYPE_CHECKING
+
+from django.core.cache import cache
+from django.db import transaction
+
+from sbily.monitoring.metrics import COALESCED_LOADS
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from typing import Any
+
+# How early entries are refreshed, 1 is the usual XFetch setting
+EARLY_REFRESH_BETA = 1.0
+# Seconds between cache reads of processes waiting for another one's load
+WAIT_POLL_INTERVAL = 0.02
+# Generations only need to outlive the loads running when they change
+GENERATION_TIMEOUT = 24 * 60 * 60
+
+# key -> load in progress in this process
+_loads: dict[str, Future] = {}
+_loads_lock = threading.Lock()
+
+
+def _lock_key(key: str) -> str:
+    return f"{key}:lock"
+
+
+def _generation_key(key: str) -> str:
+    return f"{key}:generation"
+
+
+def _acquire_lock(key: str, wait: float) -> str | None:
+    """Take the cache lock of `key`, returning its token, or None if it's taken."""
+    token = uuid.uuid4().hex
+    # None when the cache is unavailable and its errors are ignored, waiting
+    # for a value that can't be stored would only slow every request down
+    added = cache.add(_lock_key(key), token, timeout=max(1, math.ceil(wait)))
+    return None if added is False else token
+
+
+def _release_lock(key: str, token: str) -> None:
+    # The lock may have expired and been taken by another process since
+    if (delete_if_equal := getattr(cache, "delete_if_equal", None)) is not None:
+        delete_if_equal(_lock_key(key), token)
+    elif cache.get(_lock_key(key)) == token:
+        cache.delete(_lock_key(key))
+
+
+def _should_refresh_early(delta: float, expires_at: float) -> bool:
+    # -log(random) is an exponential draw, scaled by how long a load takes
+    jitter = -delta * EARLY_REFRESH_BETA * math.log(1 - random.random())  # noqa: S311
+    return time.time() + jitter >= expires_at
+
+
+def _store(
+    key: str,
+    loader: Callable[[], Any],
+    timeout: int,
+    missing_timeout: int | None,
+) -> Any:
+    generation_key = _generation_key(key)
+    generation = cache.get(generation_key)
+    started_at = time.perf_counter()
+    value = loader()
+    delta = time.perf_counter() - started_at
+    if value is None and missing_timeout is not None:
+        timeout = missing_timeout
+    # Invalidated during the load, the value may predate the change
+    if cache.get(generation_key) != generation:
+        return value
+    cache.set(key, (value, delta, time.time() + timeout), timeout=timeout)
+    # Or invalidated since the check, its delete may have run before the set
+    if cache.get(generation_key) != generation:
+        cache.delete(key)
+    return value
+
+
+def _load_once(key: str, load: Callable[[], Any], name: str, wait: float) -> Any:
+    """Run `load`, or wait for the same load already running in this process."""
+    with _loads_lock:
+        future = _loads.get(key)
+        leader = future is None
+        if leader:
+            future = _loads[key] = Future()
+
+    if not leader:
+        try:
+            value = future.result(timeout=wait)
+        except TimeoutError:
+            COALESCED_LOADS.inc(name=name, result="timeout")
+            return load()
+        COALESCED_LOADS.inc(name=name, result="shared")
+        return value
+
+    try:
+        value = load()
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(value)
+        return value
+    finally:
+        with _loads_lock:
+            del _loads[key]
+
+
+def _load_or_wait(  # noqa: PLR0913
+    key: str,
+    loader: Callable[[], Any],
+    *,
+    timeout: int,
+    missing_timeout: int | None,
+    name: str,
+    wait: float,
+) -> Any:
+    """Load under the cache lock, or wait for the process holding it."""
+    if (token := _acquire_lock(key, wait)) is not None:
+        try:
+            COALESCED_LOADS.inc(name=name, result="loaded")
+            return _store(key, loader, timeout, missing_timeout)
+        finally:
+            _release_lock(key, token)
+
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_POLL_INTERVAL)
+        if (entry := cache.get(key)) is not None:
+            COALESCED_LOADS.inc(name=name, result="waited")
+            return entry[0]
+    # The loading process is too slow or died, don't keep the request waiting
+    COALESCED_LOADS.inc(name=name, result="timeout")
+    return _store(key, loader, timeout, missing_timeout)
+
+
+def get_or_load(  # noqa: PLR0913
+    key: str,
+    loader: Callable[[], Any],
+    timeout: int,
+    *,
+    name: str,
+    missing_timeout: int | None = None,
+    wait: float = 1.0,
+) -> Any:
+    """
+    Return the cached value of `key`, calling `loader` once for all the
+    threads and processes missing it together. Waiters give up after `wait`
+    seconds and call the loader themselves. `loader` may return None, it is
+    cached for `missing_timeout` seconds when given.
+    """
+    if (entry := cache.get(key)) is not None:
+        value, delta, expires_at = entry
+        if not _should_refresh_early(delta, expires_at):
+            return value
+        # A single request refreshes, the others keep serving the value
+        if (token := _acquire_lock(key, wait)) is None:
+            return value
+        try:
+            COALESCED_LOADS.inc(name=name, result="refreshed")
+            return _store(key, loader, timeout, missing_timeout)
+        finally:
+            _release_lock(key, token)
+
+    return _load_once(
+        key,
+        lambda: _load_or_wait(
+            key,
+            loader,
+            timeout=timeout,
+            missing_timeout=missing_timeout,
+            name=name,
+            wait=wait,
+        ),
+        name,
+        wait,
+    )
+
+
+def invalidate(*keys: str) -> None:
+    """Delete cache keys, and keep loads already running from storing them."""
+    # Generations first: loads checking them afterwards don't store, and the
+    # values stored before are deleted right after
+    cache.set_many(
+        {_generation_key(key): uuid.uuid4().hex for key in keys},
+        timeout=GENERATION_TIMEOUT,
+    )
+    cache.delete_many(keys)
+
+
+def delete_on_commit(*keys: str) -> None:
+    """Invalidate cache keys once the current transaction commits."""
+    if keys:
+        transaction.on_commit(lambda: invalidate(*keys))
@@ -0,0 +1,200 @@
+import functools
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from contextvars import copy_context
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.db import close_old_connections
+from django.db import connections
+from django.db import transaction
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from collections.abc import Iterator
+    from collections.abc import Mapping
+    from typing import Any
+
+    from django.http import HttpRequest
+
+logger = logging.getLogger("utils.db")
+
+PRIMARY_DATABASE = "default"
+STICKY_CACHE_KEY = "db:sticky:{scope}"
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+        )
+    END
+"""
+
+_replica_reads: ContextVar[bool] = ContextVar("replica_reads", default=False)
+# alias -> (checked_at, healthy), kept per process
+_replica_health: dict[str, tuple[float, bool]] = {}
+
+
+def _sticky_keys(scopes: tuple[str, ...]) -> list[str]:
+    return [STICKY_CACHE_KEY.format(scope=scope) for scope in scopes]
+
+
+def pin_to_primary(*scopes: str) -> None:
+    """Read the given scopes from the primary for a short window after commit.
+
+    Scopes are strings such as `user:<id>` or `link:<shortened_path>`, the
+    window is `DATABASE_REPLICA_STICKY_SECONDS`.
+    """
+    if not settings.DATABASE_REPLICAS or not scopes:
+        return
+    keys = _sticky_keys(scopes)
+    transaction.on_commit(
+        lambda: cache.set_many(
+            dict.fromkeys(keys, 1),
+            timeout=settings.DATABASE_REPLICA_STICKY_SECONDS,
+        ),
+    )
+
+
+def is_pinned_to_primary(*scopes: str) -> bool:
+    if not scopes:
+        return False
+    return bool(cache.get_many(_sticky_keys(scopes)))
+
+
+def _replica_lag(alias: str) -> float:
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(REPLICA_LAG_SQL)
+        (lag,) = cursor.fetchone()
+    return float(lag or 0)
+
+
+def _replica_is_healthy(alias: str) -> bool:
+    checked_at, healthy = _replica_health.get(alias, (0.0, True))
+    if time.monotonic() - checked_at < settings.DATABASE_REPLICA_CHECK_INTERVAL:
+        return healthy
+
+    try:
+        lag = _replica_lag(alias)
+    except DatabaseError as e:
+        logger.warning("Replica %s is unavailable: %s", alias, e)
+        connections[alias].close()
+        healthy = False
+    else:
+        healthy = lag <= settings.DATABASE_REPLICA_MAX_LAG
+        if not healthy:
+            logger.warning("Replica %s is lagging by %.1fs", alias, lag)
+
+    _replica_health[alias] = (time.monotonic(), healthy)
+    return healthy
+
+
+def get_read_replica() -> str | None:
+    """Return a healthy replica alias, or None to fall back to the primary."""
+    replicas = [
+        alias for alias in settings.DATABASE_REPLICAS if _replica_is_healthy(alias)
+    ]
+    return random.choice(replicas) if replicas else None  # noqa: S311
+
+
+@contextmanager
+def use_replica(*scopes: str) -> Iterator[None]:
+    """Route reads inside the block to a replica.
+
+    Reads stay on the primary while any of the scopes is pinned by
+    `pin_to_primary`. Writes and `select_for_update` always go to the primary.
+    """
+    if not settings.DATABASE_REPLICAS or is_pinned_to_primary(*scopes):
+        yield
+        return
+
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_reads(view: Callable) -> Callable:
+    """Serve a read-only view from a replica.
+
+    Authenticated users stay on the primary for a short window after they
+    change their links, so they always see their own writes.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request: HttpRequest, *args, **kwargs):
+        scopes = ()
+        if request.user.is_authenticated:
+            scopes = (f"user:{request.user.pk}",)
+        with use_replica(*scopes):
+            return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+@functools.cache
+def _query_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(
+        max_workers=settings.DATABASE_MAX_CONCURRENT_QUERIES,
+        thread_name_prefix="db-query",
+    )
+
+
+def _run_query_unit(unit: Callable[[], Any]) -> Any:
+    # Pool threads keep their own connections across requests, recycle them
+    # the same way Django does at the start and end of every request.
+    close_old_connections()
+    try:
+        return unit()
+    finally:
+        close_old_connections()
+
+
+def gather_queries(units: Mapping[str, Callable[[], Any]]) -> dict[str, Any]:
+    """Run independent query units concurrently and return their results.
+
+    Every unit runs on a pool thread with its own database connection, so it
+    must fully evaluate its queryset and must not rely on uncommitted writes
+    of the caller. `use_replica` routing is carried over to the pool threads.
+    With `DATABASE_MAX_CONCURRENT_QUERIES` set to 1 the units run inline.
+    """
+    if settings.DATABASE_MAX_CONCURRENT_QUERIES <= 1:
+        return {name: unit() for name, unit in units.items()}
+
+    executor = _query_executor()
+    futures = {
+        name: executor.submit(copy_context().run, _run_query_unit, unit)
+        for name, unit in units.items()
+    }
+    return {name: future.result() for name, future in futures.items()}
+
+
+class ReplicaRouter:
+    """Send reads made inside `use_replica` to a healthy replica."""
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get():
+            return get_read_replica()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_DATABASE
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY_DATABASE, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:  # noqa: SLF001
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,205 @@
+"""
+Token-bucket rate limiting of views.
+
+A policy such as `"10/m"` gives every client a bucket of 10 tokens, refilled
+at 10 tokens a minute, and every request takes a token. Buckets live in Redis,
+checked and updated by a single Lua script per request, or in process memory
+when `RATE_LIMIT_BACKEND` is `"memory"`, for tests and local development.
+"""
+
+import functools
+import logging
+import math
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.http import HttpResponse
+from redis.exceptions import RedisError
+
+from sbily.monitoring.metrics import RATE_LIMITED
+
+from .http import get_client_ip
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from django.http import HttpRequest
+
+logger = logging.getLogger("utils.ratelimit")
+
+KEY_PREFIX = "ratelimit"
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# Takes a token from every bucket, or from none when one of them is empty.
+# KEYS are the buckets, ARGV their rate (tokens per second) and capacity.
+# Returns the seconds until the request would be allowed, 0 when it is.
+BUCKET_SCRIPT = """
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local tokens = {}
+local retry_after = 0
+for index, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[index * 2 - 1])
+    local capacity = tonumber(ARGV[index * 2])
+    local bucket = redis.call("HMGET", key, "tokens", "at")
+    local available = tonumber(bucket[1]) or capacity
+    local elapsed = math.max(0, now - (tonumber(bucket[2]) or now))
+    available = math.min(capacity, available + elapsed * rate)
+    if available < 1 then
+        retry_after = math.max(retry_after, (1 - available) / rate)
+    end
+    tokens[index] = available
+end
+for index, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[index * 2 - 1])
+    local capacity = tonumber(ARGV[index * 2])
+    local available = tokens[index]
+    if retry_after == 0 then
+        available = available - 1
+    end
+    redis.call("HSET", key, "tokens", tostring(available), "at", tostring(now))
+    redis.call("PEXPIRE", key, math.ceil(capacity / rate * 1000))
+end
+return tostring(retry_after)
+"""
+
+
+def parse_rate(rate: str) -> tuple[float, int]:
+    """Return the tokens per second and capacity of a `"<count>/<s|m|h|d>"`."""
+    count, _, period = rate.partition("/")
+    return int(count) / PERIODS[period], int(count)
+
+
+def _by_ip(request: HttpRequest, **kwargs) -> str | None:
+    return get_client_ip(request) or None
+
+
+def _by_user(request: HttpRequest, **kwargs) -> str | None:
+    # Anonymous clients are left to the per-IP bucket
+    return str(request.user.pk) if request.user.is_authenticated else None
+
+
+def _by_link(request: HttpRequest, **kwargs) -> str | None:
+    return kwargs.get("shortened_path")
+
+
+KEY_FUNCTIONS: dict[str, Callable[..., str | None]] = {
+    "ip": _by_ip,
+    "user": _by_user,
+    "link": _by_link,
+}
+
+
+@functools.cache
+def _get_script():
+    from django_redis import get_redis_connection  # noqa: PLC0415
+
+    return get_redis_connection("default").register_script(BUCKET_SCRIPT)
+
+
+class MemoryBuckets:
+    """The buckets of the current process, for tests and local development."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> (tokens, updated at)
+        self._buckets: dict[str, tuple[float, float]] = {}
+
+    def take(self, buckets: list[tuple[str, float, int]]) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens = []
+            retry_after = 0.0
+            for key, rate, capacity in buckets:
+                available, at = self._buckets.get(key, (capacity, now))
+                available = min(capacity, available + (now - at) * rate)
+                if available < 1:
+                    retry_after = max(retry_after, (1 - available) / rate)
+                tokens.append(available)
+            for (key, _, _), available in zip(buckets, tokens, strict=True):
+                self._buckets[key] = (available - (not retry_after), now)
+            return retry_after
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+MEMORY_BUCKETS = MemoryBuckets()
+
+
+def take_token(buckets: list[tuple[str, float, int]]) -> float:
+    """
+    Take a token from each (key, rate, capacity) bucket, return 0 when the
+    request is allowed or the seconds until it would be.
+    """
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        return MEMORY_BUCKETS.take(buckets)
+
+    args = []
+    for _, rate, capacity in buckets:
+        args += [rate, capacity]
+    try:
+        return float(_get_script()(keys=[key for key, _, _ in buckets], args=args))
+    except RedisError as e:
+        # Let requests through rather than fail them all with Redis
+        logger.warning("Rate limiting unavailable: %s", e)
+        return 0.0
+
+
+def too_many_requests(retry_after: float) -> HttpResponse:
+    return HttpResponse(
+        "Too many requests, please try again later.",
+        status=429,
+        content_type="text/plain",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def rate_limit(
+    scope: str,
+    methods: tuple[str, ...] | None = None,
+    **policies: str,
+) -> Callable:
+    """Limit a view per client IP, user or link.
+
+    Args:
+        scope: Name of the limits, `RATE_LIMITS[scope]` overrides the policies.
+        methods: HTTP methods limited, all of them when None.
+        **policies: A rate such as `"10/m"` per key, among `ip`, `user` (the
+            authenticated user) and `link` (the `shortened_path` argument).
+
+    Returns:
+        The decorator, answering 429 with a Retry-After header once any of
+        the buckets is empty, before the view runs.
+    """
+    unknown = policies.keys() - KEY_FUNCTIONS.keys()
+    if unknown:
+        msg = f"Unknown rate limit keys: {', '.join(sorted(unknown))}"
+        raise ValueError(msg)
+
+    def decorator(view: Callable) -> Callable:
+        @functools.wraps(view)
+        def wrapper(request: HttpRequest, *args, **kwargs):
+            if not settings.RATE_LIMIT_ENABLED or (
+                methods is not None and request.method not in methods
+            ):
+                return view(request, *args, **kwargs)
+
+            buckets = []
+            for name, rate in (policies | settings.RATE_LIMITS.get(scope, {})).items():
+                if (identity := KEY_FUNCTIONS[name](request, **kwargs)) is None:
+                    continue
+                buckets.append(
+                    (f"{KEY_PREFIX}:{scope}:{name}:{identity}", *parse_rate(rate)),
+                )
+            if buckets and (retry_after := take_token(buckets)):
+                RATE_LIMITED.inc(scope=scope)
+                return too_many_requests(retry_after)
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator